@@ -0,0 +1,9 @@
+from utils.local_cache import LocalCache
+
+system_user_cache = LocalCache('system_user')
+
+
+def get_system_user():
+    """The System Administrator that owns automatically created alerts, cached per process"""
+    from .models import User
+    return system_user_cache.get('system_user', lambda: User.objects.filter(role='System Administrator').first())
@@ -223,6 +223,10 @@ class UserLoginHistory(models.Model):
     class Meta:
         db_table = 'user_login_history'
         ordering = ['-login_time']
+        indexes = [
+            # Keyset pagination order
+            models.Index(fields=['user', '-login_time', '-history_id'], name='login_history_keyset_idx'),
+        ]
     
     def __str__(self):
         status = "Success" if self.success else f"Failed: {self.failure_reason}"
@@ -0,0 +1,14 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .cache import system_user_cache
+from .models import User
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_system_user(sender, instance, update_fields=None, **kwargs):
+    """Drop the cached system user when a user may have gained or lost the role"""
+    # Logins only touch last_login
+    if update_fields is not None and set(update_fields) <= {'last_login', 'last_login_ip'}:
+        return
+    system_user_cache.invalidate()
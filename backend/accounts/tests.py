@@ -0,0 +1,68 @@
+"""
+Tests for the login history endpoint, which pages with keyset cursors
+(next/previous/results) instead of page numbers.
+"""
+from datetime import timedelta
+
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from .models import User, UserLoginHistory
+
+URL = '/api/auth/login-history/'
+
+
+class LoginHistoryTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(
+            username='officer', email='officer@example.com', full_name='Officer', department='fire'
+        )
+        now = timezone.now()
+        for n in range(7):
+            entry = UserLoginHistory.objects.create(user=cls.user, ip_address='127.0.0.1', user_agent=f'agent {n}')
+            # Two logins share each time so the history id breaks the tie
+            UserLoginHistory.objects.filter(pk=entry.pk).update(login_time=now - timedelta(minutes=n // 2))
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def test_response_shape(self):
+        response = self.client.get(URL, {'page_size': 3})
+        self.assertEqual(response.status_code, 200)
+        # The page/page_size/has_next keys were replaced by cursor links
+        self.assertEqual(list(response.data), ['next', 'previous', 'results'])
+        self.assertIsNone(response.data['previous'])
+        self.assertIn('cursor=', response.data['next'])
+        self.assertEqual(len(response.data['results']), 3)
+        self.assertEqual(
+            set(response.data['results'][0]),
+            {'ip_address', 'user_agent', 'login_time', 'logout_time', 'success', 'failure_reason'}
+        )
+
+    def test_pages_follow_login_time(self):
+        url, agents = f'{URL}?page_size=3', []
+        while url:
+            response = self.client.get(url)
+            agents += [entry['user_agent'] for entry in response.data['results']]
+            url = response.data['next']
+
+        expected = UserLoginHistory.objects.filter(user=self.user).order_by('-login_time', '-history_id')
+        self.assertEqual(agents, list(expected.values_list('user_agent', flat=True)))
+        self.assertIsNotNone(response.data['previous'])
+
+    def test_previous_returns_the_page_before(self):
+        first = self.client.get(URL, {'page_size': 3})
+        second = self.client.get(first.data['next'])
+        self.assertEqual(self.client.get(second.data['previous']).data['results'], first.data['results'])
+
+    def test_page_parameter_is_ignored(self):
+        # Old clients sending ?page=2 get the first page rather than an error
+        self.assertEqual(
+            self.client.get(URL, {'page': 2, 'page_size': 3}).data['results'],
+            self.client.get(URL, {'page_size': 3}).data['results']
+        )
+
+    def test_invalid_cursor_is_not_found(self):
+        self.assertEqual(self.client.get(URL, {'cursor': 'not-a-cursor'}).status_code, 404)
@@ -14,6 +14,7 @@ from .serializers import (
     RegistrationRequestDetailSerializer, RegistrationRequestReviewSerializer
 )
 from utils.email_service import EmailService
+from utils.pagination import KeysetPagination
 import secrets
 import string
 from django.db import transaction
@@ -178,21 +179,13 @@ def login_history(request):
         # Return current user's history
         history = UserLoginHistory.objects.filter(user=request.user)
     
-    # Paginate results
-    page_size = int(request.query_params.get('page_size', 20))
-    page = int(request.query_params.get('page', 1))
-    start = (page - 1) * page_size
-    end = start + page_size
-    
-    history = history.order_by('-login_time')[start:end]
-    serializer = UserLoginHistorySerializer(history, many=True)
+    # Keyset pagination on (login_time, history_id)
+    paginator = KeysetPagination()
+    paginator.ordering = ('-login_time', '-history_id')
+    page = paginator.paginate_queryset(history, request)
+    serializer = UserLoginHistorySerializer(page, many=True)
     
-    return Response({
-        'results': serializer.data,
-        'page': page,
-        'page_size': page_size,
-        'has_next': len(serializer.data) == page_size
-    })
+    return paginator.get_paginated_response(serializer.data)
 
 class EmergencyContactListCreateView(generics.ListCreateAPIView):
     serializer_class = EmergencyContactSerializer
@@ -1,5 +1,11 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 class AlertsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'alerts'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .search import install_search_trigger
+        post_migrate.connect(install_search_trigger, sender=self)
@@ -0,0 +1,64 @@
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from .realtime import alert_group_name
+
+
+class AlertConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Live alert feed for one station, department or region.
+
+    Connect to ws/alerts/<station|department|region>/<id>/?token=<access token>.
+    Every message is {"event": "alert.routed" | "alert.created" | "alert.status_changed", "alert": {...}}.
+    """
+
+    async def connect(self):
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated:
+            await self.close(code=4401)
+            return
+
+        kwargs = self.scope['url_route']['kwargs']
+        scope_type, scope_id = kwargs['scope_type'], kwargs['scope_id']
+
+        if not await self.can_subscribe(user, scope_type, scope_id):
+            await self.close(code=4403)
+            return
+
+        self.group_name = alert_group_name(scope_type, scope_id)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, code):
+        if hasattr(self, 'group_name'):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def alert_event(self, event):
+        # Station groups carry every department's alerts at the station, send only what the alert list would show
+        from .views import alert_visible_to
+        alert = event['alert']
+        if not alert_visible_to(self.scope['user'], alert.get('department'), alert.get('assigned_station_id')):
+            return
+        await self.send_json({'event': event['event'], 'alert': event['alert']})
+
+    @database_sync_to_async
+    def can_subscribe(self, user, scope_type, scope_id):
+        """Apply the same role scoping as the alert list (alert_scope_filter)"""
+        if user.role == 'Admin':
+            return True
+
+        if scope_type == 'department':
+            # A field officer with a station only sees that station's alerts
+            if user.role == 'Field Officer' and user.station_id:
+                return False
+            return user.role in ['Station Manager', 'Field Officer'] and scope_id == user.department
+
+        if scope_type == 'station':
+            if user.role in ['Station Manager', 'Field Officer'] and user.station_id and str(user.station_id) == scope_id:
+                return True
+            if user.role == 'Station Manager':
+                # Department alerts routed to another station of the department
+                from geography.models import Station
+                return Station.objects.filter(station_id=scope_id, department=user.department).exists()
+
+        # Region groups carry every department, only admins see all of them
+        return False
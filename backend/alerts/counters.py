@@ -0,0 +1,109 @@
+from collections import Counter
+
+from django.db import IntegrityError, models, transaction
+
+from .load import StationLoad
+from .models import Alert, AlertCounter
+
+# Alert fields that decide which counter row an alert belongs to
+COUNTER_FIELDS = ('department', 'assigned_station_id', 'status', 'priority')
+
+
+def counter_key(alert):
+    """(department, station_id, status, priority) bucket of an alert"""
+    return (alert.department, alert.assigned_station_id, alert.status, alert.priority)
+
+
+def apply_counter_deltas(deltas):
+    """Add {counter_key: delta} to the counter table"""
+    # Keep this process's routing loads current without re-reading the table
+    committed = dict(deltas)
+    transaction.on_commit(lambda: StationLoad.apply_deltas(committed))
+
+    for (department, station_id, status, priority), delta in deltas.items():
+        if not delta:
+            continue
+
+        lookup = {
+            'department': department,
+            'station_id': station_id,
+            'status': status,
+            'priority': priority,
+        }
+        if AlertCounter.objects.filter(**lookup).update(count=models.F('count') + delta):
+            continue
+
+        try:
+            with transaction.atomic():
+                AlertCounter.objects.create(count=delta, **lookup)
+        except IntegrityError:
+            # Another writer created the row first
+            AlertCounter.objects.filter(**lookup).update(count=models.F('count') + delta)
+
+
+def record_alerts_created(alerts):
+    """Count alerts that were inserted without save signals (bulk_create)"""
+    apply_counter_deltas(Counter(counter_key(alert) for alert in alerts))
+    for alert in alerts:
+        alert._counter_key = counter_key(alert)
+
+
+def record_alert_changed(old_key, new_key):
+    """Move one alert between counter rows"""
+    if old_key == new_key:
+        return
+
+    deltas = {new_key: 1} if new_key else {}
+    if old_key:
+        deltas[old_key] = -1
+    apply_counter_deltas(deltas)
+
+
+def release_station_counters(station_id):
+    """
+    Move a deleted station's counts to the unassigned rows.
+
+    Deleting a station sets its alerts' station to NULL with a queryset
+    update, which sends no save signals.
+    """
+    deltas = Counter()
+    for department, status, priority, count in AlertCounter.objects.filter(station_id=station_id).values_list(
+        'department', 'status', 'priority', 'count'
+    ):
+        deltas[(department, station_id, status, priority)] -= count
+        deltas[(department, None, status, priority)] += count
+    apply_counter_deltas(deltas)
+    AlertCounter.objects.filter(station_id=station_id).delete()
+
+
+def rebuild_counters():
+    """Recompute every counter row from the alerts table"""
+    rows = (
+        Alert.objects.order_by()
+        .values('department', 'assigned_station_id', 'status', 'priority')
+        .annotate(total=models.Count('id'))
+    )
+    with transaction.atomic():
+        AlertCounter.objects.all().delete()
+        AlertCounter.objects.bulk_create([
+            AlertCounter(
+                department=row['department'],
+                station_id=row['assigned_station_id'],
+                status=row['status'],
+                priority=row['priority'],
+                count=row['total'],
+            )
+            for row in rows
+        ])
+        transaction.on_commit(StationLoad.invalidate)
+
+
+def counter_statistics(counters):
+    """Dashboard counts from a counter queryset in one conditional aggregate"""
+    totals = counters.aggregate(
+        total_alerts=models.Sum('count'),
+        active_alerts=models.Sum('count', filter=models.Q(status='active')),
+        resolved_alerts=models.Sum('count', filter=models.Q(status='resolved')),
+        high_priority=models.Sum('count', filter=models.Q(priority='high')),
+    )
+    return {name: value or 0 for name, value in totals.items()}
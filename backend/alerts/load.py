@@ -0,0 +1,72 @@
+import threading
+import time
+from typing import Dict, Iterable
+
+import numpy as np
+from django.conf import settings
+from django.db import models
+
+from .models import AlertCounter
+
+# Alerts a station is still working on
+OPEN_STATUSES = ('active', 'in_progress')
+
+
+class StationLoad:
+    """
+    Process-local snapshot of open alerts per station.
+
+    Read from the alert counter rows in one query at most every
+    STATION_LOAD_TTL seconds and adjusted in place as this process commits
+    alert changes, so load-aware routing reads loads without touching the
+    database.
+    """
+
+    _loads: Dict[str, int] = {}
+    _loaded_at = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def _snapshot(cls) -> Dict[str, int]:
+        loaded_at = cls._loaded_at
+        if loaded_at is not None and time.monotonic() - loaded_at < settings.STATION_LOAD_TTL:
+            return cls._loads
+
+        with cls._lock:
+            if cls._loaded_at is None or time.monotonic() - cls._loaded_at >= settings.STATION_LOAD_TTL:
+                rows = (
+                    AlertCounter.objects.filter(status__in=OPEN_STATUSES, station_id__isnull=False)
+                    .order_by()
+                    .values_list('station_id')
+                    .annotate(total=models.Sum('count'))
+                )
+                cls._loads = {str(station_id): total for station_id, total in rows}
+                cls._loaded_at = time.monotonic()
+        return cls._loads
+
+    @classmethod
+    def get(cls, station_id) -> int:
+        """Open alerts currently assigned to a station"""
+        return cls._snapshot().get(str(station_id), 0)
+
+    @classmethod
+    def many(cls, station_ids: Iterable) -> np.ndarray:
+        """Open alerts for each station, in the given order"""
+        loads = cls._snapshot()
+        return np.array([loads.get(str(station_id), 0) for station_id in station_ids], dtype=np.float64)
+
+    @classmethod
+    def apply_deltas(cls, deltas):
+        """Apply committed counter deltas ({counter_key: delta}) to the snapshot"""
+        with cls._lock:
+            for (department, station_id, status, priority), delta in deltas.items():
+                if station_id is None or status not in OPEN_STATUSES:
+                    continue
+                key = str(station_id)
+                cls._loads[key] = max(0, cls._loads.get(key, 0) + delta)
+
+    @classmethod
+    def invalidate(cls):
+        """Reload from the counter table on next use"""
+        with cls._lock:
+            cls._loaded_at = None
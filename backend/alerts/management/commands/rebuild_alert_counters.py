@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from alerts.counters import rebuild_counters
+from alerts.models import AlertCounter
+
+
+class Command(BaseCommand):
+    help = 'Recompute the alert counter table from the alerts table'
+
+    def handle(self, *args, **options):
+        rebuild_counters()
+        self.stdout.write(
+            self.style.SUCCESS(f'Rebuilt {AlertCounter.objects.count()} alert counter row(s)')
+        )
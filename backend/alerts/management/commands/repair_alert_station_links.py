@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+
+class Command(BaseCommand):
+    help = (
+        'Clear alert station links that point at stations which no longer exist. '
+        'Run before migrating Alert.assigned_station to a foreign key.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report the dangling links')
+
+    def handle(self, *args, **options):
+        # Raw SQL so this works both before and after the foreign key migration
+        alerts_table = 'alerts_alert'
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT COUNT(*) FROM {alerts_table} "
+                f"WHERE assigned_station_id IS NOT NULL AND assigned_station_id NOT IN "
+                f"(SELECT station_id FROM geography_stations)"
+            )
+            dangling = cursor.fetchone()[0]
+
+            if options['dry_run'] or not dangling:
+                self.stdout.write(f'Found {dangling} alert(s) linked to missing stations')
+                return
+
+            cursor.execute(
+                f"UPDATE {alerts_table} SET assigned_station_id = NULL "
+                f"WHERE assigned_station_id IS NOT NULL AND assigned_station_id NOT IN "
+                f"(SELECT station_id FROM geography_stations)"
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Cleared {dangling} alert(s) linked to missing stations')
+        )
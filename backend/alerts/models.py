@@ -1,5 +1,7 @@
 from django.db import models
 from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 
 class Alert(models.Model):
     PRIORITY_CHOICES = [
@@ -57,7 +59,17 @@ class Alert(models.Model):
     # Assignment information
     created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='created_alerts')
     assigned_to = models.CharField(max_length=100, blank=True)
-    assigned_station_id = models.UUIDField(null=True, blank=True, help_text="ID of assigned station")
+    assigned_station = models.ForeignKey(
+        'geography.Station',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='alerts',
+        db_column='assigned_station_id',
+        # Covered by the composite indexes that lead with the station
+        db_index=False,
+        help_text="Assigned station"
+    )
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -66,9 +78,35 @@ class Alert(models.Model):
     # Additional fields for history tracking
     response_time = models.CharField(max_length=50, blank=True)
     outcome = models.TextField(blank=True)
+
+    # Full-text search document, maintained by a database trigger (see alerts.search)
+    search_vector = SearchVectorField(null=True, editable=False)
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination order
+            models.Index(fields=['-created_at', '-id'], name='alert_created_keyset_idx'),
+            # Delta sync watermark (see alerts.sync)
+            models.Index(fields=['updated_at', 'id'], name='alert_updated_sync_idx'),
+            # Role scopes (see alerts.views.alerts_for_user) in keyset order, with and without a status filter
+            models.Index(fields=['department', '-created_at', '-id'], name='alert_dept_created_idx'),
+            models.Index(fields=['assigned_station', '-created_at', '-id'], name='alert_station_created_idx'),
+            models.Index(fields=['department', 'status', '-created_at', '-id'], name='alert_dept_status_idx'),
+            models.Index(fields=['assigned_station', 'status', '-created_at', '-id'], name='alert_station_status_idx'),
+            # Open alerts only, a small slice of the table: station load and dashboards
+            models.Index(
+                fields=['assigned_station', '-created_at'],
+                condition=models.Q(status__in=['active', 'in_progress']),
+                name='alert_station_open_idx'
+            ),
+            models.Index(
+                fields=['department', 'priority', '-created_at'],
+                condition=models.Q(status__in=['active', 'in_progress']),
+                name='alert_dept_open_idx'
+            ),
+            GinIndex(fields=['search_vector'], name='alert_search_vector_gin'),
+        ]
     
     def __str__(self):
         return f"{self.title} - {self.get_status_display()}"
@@ -79,17 +117,6 @@ class Alert(models.Model):
             return {'lat': float(self.latitude), 'lng': float(self.longitude)}
         return None
 
-    @property
-    def assigned_station(self):
-        """Get the assigned station object"""
-        if self.assigned_station_id:
-            try:
-                from geography.models import Station
-                return Station.objects.get(station_id=self.assigned_station_id)
-            except:
-                return None
-        return None
-
     @classmethod
     def get_department_for_alert_type(cls, alert_type):
         """Map alert types to departments"""
@@ -105,3 +132,56 @@ class Alert(models.Model):
             return 'medical'
         else:
             return 'police'  # Default to police for unknown types
+
+
+class AlertCounter(models.Model):
+    """
+    Running alert counts per department, station, status and priority.
+
+    Maintained incrementally on alert create/update/delete (see alerts.counters)
+    so dashboards read a handful of rows instead of counting the alerts table.
+    """
+    department = models.CharField(max_length=20)
+    station_id = models.UUIDField(null=True, blank=True, help_text="ID of assigned station")
+    status = models.CharField(max_length=20)
+    priority = models.CharField(max_length=10)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = 'alert_counters'
+        unique_together = ['department', 'station_id', 'status', 'priority']
+        constraints = [
+            # NULLs are distinct in unique constraints, so unassigned rows need their own
+            models.UniqueConstraint(
+                fields=['department', 'status', 'priority'],
+                condition=models.Q(station_id__isnull=True),
+                name='alert_counter_unassigned_uniq'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.department}/{self.station_id or '-'} {self.status}/{self.priority}: {self.count}"
+
+
+class AlertTombstone(models.Model):
+    """
+    Marker left behind when an alert is deleted, or leaves a department or
+    station (reassignment, station deletion).
+
+    Delta sync clients read these to drop deleted alerts from their local
+    cache. Department and station are the ones the alert left, so tombstones
+    can be scoped the same way as alerts.
+    """
+    alert_id = models.IntegerField()
+    department = models.CharField(max_length=20)
+    assigned_station_id = models.UUIDField(null=True, blank=True, help_text="ID of the station the alert was assigned to")
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'alert_tombstones'
+        indexes = [
+            models.Index(fields=['deleted_at', 'id'], name='alert_tombstone_sync_idx'),
+        ]
+
+    def __str__(self):
+        return f"Alert {self.alert_id} deleted at {self.deleted_at}"
@@ -0,0 +1,55 @@
+import json
+import logging
+import re
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+SCOPE_TYPES = ('station', 'department', 'region')
+
+
+def alert_group_name(scope_type, value):
+    """Channel group for one station, department or region"""
+    slug = re.sub(r'[^a-z0-9_.-]+', '-', str(value).strip().lower())
+    return f'alerts.{scope_type}.{slug}'[:99]
+
+
+def alert_groups(alert):
+    """Every group that should hear about an alert"""
+    groups = [alert_group_name('department', alert.department)]
+    station = alert.assigned_station if alert.assigned_station_id else None
+    if station is not None:
+        groups.append(alert_group_name('station', station.station_id))
+        if station.region:
+            groups.append(alert_group_name('region', station.region))
+    return groups
+
+
+def publish_alerts(alerts, event):
+    """Push alerts to their subscribers once the current transaction commits"""
+    channel_layer = get_channel_layer()
+    if channel_layer is None or not alerts:
+        return
+
+    from .serializers import AlertSerializer
+
+    # Channel layers need plain JSON types (no UUID/datetime/Decimal)
+    messages = []
+    for alert in alerts:
+        payload = json.loads(json.dumps(AlertSerializer(alert).data, cls=DjangoJSONEncoder))
+        for group in alert_groups(alert):
+            messages.append((group, {'type': 'alert.event', 'event': event, 'alert': payload}))
+
+    def send():
+        try:
+            for group, message in messages:
+                async_to_sync(channel_layer.group_send)(group, message)
+        except Exception as e:
+            # Real-time push is best effort, clients can still fetch /api/alerts/
+            logger.error(f"Error publishing {event} for {len(alerts)} alert(s): {e}")
+
+    transaction.on_commit(send)
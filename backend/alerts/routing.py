@@ -0,0 +1,9 @@
+from django.urls import re_path
+from . import consumers
+
+websocket_urlpatterns = [
+    re_path(
+        r'^ws/alerts/(?P<scope_type>station|department|region)/(?P<scope_id>[\w.-]+)/$',
+        consumers.AlertConsumer.as_asgi()
+    ),
+]
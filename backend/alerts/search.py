@@ -0,0 +1,66 @@
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection, models
+
+SEARCH_CONFIG = 'english'
+
+# Keeps alerts_alert.search_vector in sync with title (A), location (B) and description (C)
+SEARCH_TRIGGER_SQL = f"""
+CREATE OR REPLACE FUNCTION alerts_alert_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(NEW.title, '')), 'A') ||
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(NEW.location, '')), 'B') ||
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(NEW.description, '')), 'C');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS alerts_alert_search_vector_trigger ON alerts_alert;
+CREATE TRIGGER alerts_alert_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF title, location, description ON alerts_alert
+    FOR EACH ROW EXECUTE FUNCTION alerts_alert_search_vector_update();
+"""
+
+# Fill vectors for rows written before the trigger existed (fires the trigger)
+SEARCH_BACKFILL_SQL = "UPDATE alerts_alert SET title = title WHERE search_vector IS NULL"
+
+
+def install_search_trigger(sender, using='default', **kwargs):
+    """post_migrate hook: install the search trigger and backfill missing vectors"""
+    from django.db import connections
+
+    db = connections[using]
+    if db.vendor != 'postgresql':
+        return
+
+    with db.cursor() as cursor:
+        cursor.execute(SEARCH_TRIGGER_SQL)
+        cursor.execute(SEARCH_BACKFILL_SQL)
+
+
+def search_alerts(queryset, search):
+    """
+    Filter alerts matching every word of a search string (prefix matching).
+
+    Returns:
+        (queryset, ranked) - on PostgreSQL the queryset is annotated with
+        search_rank and ranked is True; elsewhere it falls back to icontains.
+    """
+    if connection.vendor != 'postgresql':
+        return queryset.filter(
+            models.Q(title__icontains=search) |
+            models.Q(location__icontains=search) |
+            models.Q(description__icontains=search)
+        ), False
+
+    terms = re.findall(r'\w+', search)
+    if not terms:
+        return queryset.none(), False
+
+    query = SearchQuery(' & '.join(f'{term}:*' for term in terms), search_type='raw', config=SEARCH_CONFIG)
+    queryset = queryset.filter(search_vector=query).annotate(
+        search_rank=SearchRank(models.F('search_vector'), query)
+    )
+    return queryset, True
@@ -1,9 +1,13 @@
 from rest_framework import serializers
+from geography.models import Station
 from .models import Alert
 
 class AlertSerializer(serializers.ModelSerializer):
     created_by_name = serializers.CharField(source='created_by.get_full_name', read_only=True)
     assigned_station_name = serializers.CharField(source='assigned_station.name', read_only=True)
+    assigned_station_id = serializers.PrimaryKeyRelatedField(
+        source='assigned_station', queryset=Station.objects.all(), required=False, allow_null=True
+    )
     coordinates = serializers.SerializerMethodField()
 
     class Meta:
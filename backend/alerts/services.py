@@ -1,6 +1,17 @@
 import math
+import numpy as np
+from collections import defaultdict
 from typing import Optional, Tuple, List, Dict
+from django.conf import settings
+from django.db import transaction
+from geography import distance
 from geography.models import Station, District, Region
+from geography.road_network import RoadNetwork
+from geography.spatial_index import StationSpatialIndex
+from geography.station_grid import StationGridRegistry
+from .counters import record_alerts_created
+from .load import StationLoad
+from .realtime import publish_alerts
 from .models import Alert
 
 
@@ -33,7 +44,8 @@ class StationFinderService:
         latitude: float, 
         longitude: float, 
         department: str,
-        max_distance_km: float = 100.0
+        max_distance_km: float = 100.0,
+        load_aware: Optional[bool] = None
     ) -> Optional[Station]:
         """
         Find the nearest station of the specified department to the given coordinates.
@@ -43,35 +55,104 @@ class StationFinderService:
             longitude: Alert longitude
             department: Department type ('fire', 'police', 'medical')
             max_distance_km: Maximum search radius in kilometers
+            load_aware: Pick among the k nearest by distance plus load
+                (defaults to STATION_ROUTING_MODE)
             
         Returns:
             Nearest Station object or None if no station found within range
         """
-        # Get all active stations of the specified department with coordinates
-        stations = Station.objects.filter(
-            department=department,
-            is_active=True,
-            latitude__isnull=False,
-            longitude__isnull=False
-        )
-        
-        if not stations.exists():
-            return None
+        if load_aware is None and settings.STATION_ROUTING_MODE == 'travel_time':
+            fastest = cls.find_fastest_station(latitude, longitude, department, max_distance_km)
+            return fastest[0] if fastest else None
+
+        k = cls.routing_candidates(load_aware)
+        nearest = None
+        if settings.STATION_LOOKUP_BACKEND == 'grid' and k == 1:
+            # Precomputed raster: one array read and an exact check of two candidates
+            grid = StationGridRegistry.for_department(department)
+            if grid is not None:
+                nearest = grid.nearest(latitude, longitude, max_distance_km=max_distance_km)
+
+        if nearest is None:
+            if settings.STATION_LOOKUP_BACKEND == 'database':
+                nearest = cls._stations_near(latitude, longitude, department, max_distance_km)[:k]
+            else:
+                # Nearest-neighbour query against the in-memory ball tree, no DB access
+                index = StationSpatialIndex.for_department(department)
+                nearest = index.nearest(latitude, longitude, k=k, max_distance_km=max_distance_km)
+
+        choice = cls.pick_station(nearest, load_aware)
+        return choice[0] if choice else None
+
+    @classmethod
+    def find_fastest_station(
+        cls,
+        latitude: float,
+        longitude: float,
+        department: str,
+        max_distance_km: float = 100.0
+    ) -> Optional[Tuple[Station, Optional[float]]]:
+        """
+        Find the station with the shortest road travel time to the given coordinates.
         
-        nearest_station = None
-        min_distance = float('inf')
+        Falls back to the nearest station by straight-line distance when no road
+        graph is configured or the location cannot be routed on it.
         
-        for station in stations:
-            distance = cls.calculate_distance(
-                latitude, longitude,
-                float(station.latitude), float(station.longitude)
+        Returns:
+            (station, eta_seconds), with eta_seconds None for the straight-line
+            fallback, or None if no station found within range
+        """
+        table = RoadNetwork.for_department(department)
+        fastest = table.fastest(latitude, longitude) if table else None
+        if fastest:
+            station, eta_seconds = fastest
+            straight_line_km = cls.calculate_distance(
+                latitude, longitude, float(station.latitude), float(station.longitude)
             )
-            
-            if distance < min_distance and distance <= max_distance_km:
-                min_distance = distance
-                nearest_station = station
-        
-        return nearest_station
+            if straight_line_km <= max_distance_km:
+                return station, eta_seconds
+
+        station = cls.find_nearest_station(latitude, longitude, department, max_distance_km, load_aware=False)
+        return (station, None) if station else None
+
+    @classmethod
+    def routing_candidates(cls, load_aware: Optional[bool] = None) -> int:
+        """How many nearest stations a routing decision looks at"""
+        if load_aware is None:
+            load_aware = settings.STATION_ROUTING_MODE == 'load_aware'
+        return settings.STATION_LOAD_CANDIDATES if load_aware else 1
+
+    @classmethod
+    def pick_station(
+        cls,
+        candidates: List[Tuple[Station, float]],
+        load_aware: Optional[bool] = None,
+        pending: Optional[Dict] = None
+    ) -> Optional[Tuple[Station, float]]:
+        """
+        Choose a station from (station, distance_km) candidates sorted by distance.
+
+        Load-aware scoring is distance + STATION_LOAD_PENALTY_KM per open alert,
+        with loads read from the in-process StationLoad snapshot. Ties go to the
+        nearer station.
+
+        Args:
+            pending: Extra open alerts per station_id not yet committed (bulk routing)
+        """
+        if not candidates:
+            return None
+        if load_aware is None:
+            load_aware = settings.STATION_ROUTING_MODE == 'load_aware'
+        if not load_aware or len(candidates) == 1:
+            return candidates[0]
+
+        loads = StationLoad.many(station.station_id for station, _ in candidates)
+        if pending:
+            loads += [pending.get(station.station_id, 0) for station, _ in candidates]
+
+        distances = np.array([station_distance for _, station_distance in candidates])
+        scores = distances + settings.STATION_LOAD_PENALTY_KM * loads
+        return candidates[int(np.argmin(scores))]
     
     @classmethod
     def find_stations_in_radius(
@@ -87,33 +168,96 @@ class StationFinderService:
         Returns:
             List of dictionaries with station info and distance
         """
-        stations = Station.objects.filter(
-            department=department,
-            is_active=True,
-            latitude__isnull=False,
-            longitude__isnull=False
-        )
-        
-        stations_with_distance = []
+        if settings.STATION_LOOKUP_BACKEND == 'database':
+            stations = cls._stations_near(latitude, longitude, department, radius_km)
+        else:
+            stations = StationSpatialIndex.for_department(department).within_radius(latitude, longitude, radius_km)
+
+        # Results come back sorted by distance
+        return [
+            {
+                'station': station,
+                'distance_km': round(station_distance, 2),
+                'department': station.department,
+                'region': station.region
+            }
+            for station, station_distance in stations
+        ]
+
+    @classmethod
+    def _stations_near(
+        cls,
+        latitude: float,
+        longitude: float,
+        department: str,
+        radius_km: float
+    ) -> List[Tuple[Station, float]]:
+        """
+        Database lookup: bounding-box prefilter on the composite station index,
+        then exact Haversine on the remaining candidates.
         
-        for station in stations:
-            distance = cls.calculate_distance(
-                latitude, longitude,
-                float(station.latitude), float(station.longitude)
-            )
-            
-            if distance <= radius_km:
-                stations_with_distance.append({
-                    'station': station,
-                    'distance_km': round(distance, 2),
-                    'department': station.department,
-                    'region': station.region
-                })
+        Returns:
+            List of (station, distance_km) tuples within radius_km, sorted by distance
+        """
+        candidates = list(Station.objects.routable(department).near(latitude, longitude, radius_km))
+        if not candidates:
+            return []
+
+        distances = distance.haversine_distances(
+            latitude, longitude,
+            [[float(station.latitude), float(station.longitude)] for station in candidates]
+        )
+        return [
+            (candidates[index], float(distances[index]))
+            for index in distance.within_radius(distances, radius_km)
+        ]
+
+    @classmethod
+    def find_nearest_stations_bulk(
+        cls,
+        points: List[Tuple[float, float]],
+        department: str,
+        k: int = 1,
+        max_distance_km: float = 100.0
+    ) -> List[List[Tuple[Station, float]]]:
+        """
+        Find the k nearest stations for many (latitude, longitude) points at once.
         
-        # Sort by distance
-        stations_with_distance.sort(key=lambda x: x['distance_km'])
+        Returns:
+            One list of (station, distance_km) tuples per point, sorted by distance
+        """
+        if settings.STATION_LOOKUP_BACKEND == 'database':
+            return [
+                cls._stations_near(latitude, longitude, department, max_distance_km)[:k]
+                for latitude, longitude in points
+            ]
+
+        results = [None] * len(points)
+        if settings.STATION_LOOKUP_BACKEND == 'grid' and k == 1:
+            # Precomputed raster first, points outside it go to the spatial index below
+            grid = StationGridRegistry.for_department(department)
+            if grid is not None:
+                results = [grid.nearest(latitude, longitude, max_distance_km=max_distance_km) for latitude, longitude in points]
+
+        missing = [position for position, result in enumerate(results) if result is None]
+        if missing:
+            index = StationSpatialIndex.for_department(department)
+            nearest = index.nearest_many([points[position] for position in missing], k=k, max_distance_km=max_distance_km)
+            for position, result in zip(missing, nearest):
+                results[position] = result
+        return results
+
+    @classmethod
+    def distance_matrix(cls, points: List[Tuple[float, float]], department: str) -> Tuple[List[Station], np.ndarray]:
+        """
+        Distances from many points to every active station of a department.
         
-        return stations_with_distance
+        Returns:
+            (stations, matrix) where matrix[i, j] is the distance in km from
+            points[i] to stations[j]
+        """
+        index = StationSpatialIndex.for_department(department)
+        return index.stations, index.distance_matrix(points)
 
     @classmethod
     def assign_alert_to_nearest_station(cls, alert):
@@ -126,7 +270,7 @@ class StationFinderService:
             )
 
             if nearest_station:
-                alert.assigned_station_id = nearest_station.station_id
+                alert.assigned_station = nearest_station
                 alert.save()
                 return nearest_station
         return None
@@ -166,16 +310,16 @@ class StationFinderService:
         
         if nearest_station:
             # Update alert with station assignment
-            alert.assigned_station_id = nearest_station.station_id
+            alert.assigned_station = nearest_station
             alert.department = department
             
             # Calculate distance for assignment info
-            distance = cls.calculate_distance(
+            station_distance = cls.calculate_distance(
                 float(lat), float(lng),
                 float(nearest_station.latitude), float(nearest_station.longitude)
             )
             
-            alert.assigned_to = f"{nearest_station.name} ({distance:.1f}km away)"
+            alert.assigned_to = f"{nearest_station.name} ({station_distance:.1f}km away)"
             alert.save()
             
             return True
@@ -198,13 +342,10 @@ class StationFinderService:
                 'recent_alerts_count': 0
             }
         
-        # Count active alerts assigned to this station
-        active_alerts = Alert.objects.filter(
-            assigned_station_id=station.station_id,
-            status__in=['active', 'in_progress']
-        ).count()
+        # Open alerts come from the maintained load counters, no query
+        active_alerts = StationLoad.get(station.station_id)
         
-        # Count recent alerts (last 24 hours)
+        # Count recent alerts (last 24 hours), an index range scan on (station, created_at)
         from django.utils import timezone
         from datetime import timedelta
         
@@ -224,6 +365,16 @@ class StationFinderService:
 
 class AlertRoutingService:
     """Service for routing alerts to appropriate stations and personnel"""
+
+    PRIORITY_MAPPING = {
+        'low': 'low',
+        'medium': 'medium',
+        'high': 'high',
+        'critical': 'high'
+    }
+
+    # Fire emergencies also alert medical and police departments
+    FIRE_ALERT_TYPES = ['fire_detected', 'building_fire', 'wildfire', 'gas_leak', 'explosion', 'hazmat_incident']
     
     @classmethod
     def route_emergency_alert(
@@ -250,77 +401,172 @@ class AlertRoutingService:
         Returns:
             Primary Alert object (additional alerts may be created)
         """
-        from accounts.models import User
+        # Station assignments for the primary and any support alerts are computed
+        # up front and everything is written in one atomic bulk insert
+        return cls.route_emergency_alerts_bulk([{
+            'alert_type': alert_type,
+            'latitude': latitude,
+            'longitude': longitude,
+            'severity': severity,
+            'description': description
+        }], created_by_user=created_by_user)[0]
+
+    @classmethod
+    def route_emergency_alerts_bulk(cls, incidents: List[Dict], created_by_user=None) -> List[Alert]:
+        """
+        Create and route many emergency alerts at once.
+
+        Station lookups run as one vectorized pass per department and every
+        alert (including fire support alerts) is written with a single
+        bulk insert inside one transaction.
+
+        Args:
+            incidents: List of dicts with alert_type, latitude, longitude and
+                optional severity and description
+            created_by_user: User creating the alerts
+
+        Returns:
+            Primary Alert objects in incident order
+        """
+        from accounts.cache import get_system_user
 
         # Get system user if no user provided
         if not created_by_user:
-            created_by_user = User.objects.filter(role='System Administrator').first()
-
-        # Determine primary department and priority
-        primary_department = Alert.get_department_for_alert_type(alert_type)
-        priority_mapping = {
-            'low': 'low',
-            'medium': 'medium',
-            'high': 'high',
-            'critical': 'high'
-        }
-        priority = priority_mapping.get(severity, 'medium')
+            created_by_user = get_system_user()
+
+        primary_alerts = []
+        all_alerts = []
+        for incident in incidents:
+            alerts = cls._build_incident_alerts(
+                alert_type=incident['alert_type'],
+                latitude=incident['latitude'],
+                longitude=incident['longitude'],
+                severity=incident.get('severity', 'medium'),
+                description=incident.get('description', ''),
+                created_by_user=created_by_user
+            )
+            primary_alerts.append(alerts[0])
+            all_alerts.extend(alerts)
+
+        cls._assign_stations(all_alerts)
+
+        with transaction.atomic():
+            Alert.objects.bulk_create(all_alerts)
+            # bulk_create skips save signals, count the new alerts here
+            record_alerts_created(all_alerts)
+            cls.publish_alerts(all_alerts, 'alert.routed')
 
-        # Create primary alert
-        primary_alert = Alert.objects.create(
+        return primary_alerts
+
+    @classmethod
+    def publish_alerts(cls, alerts: List[Alert], event: str):
+        """Push alerts to their station, department and region subscribers after commit"""
+        publish_alerts(alerts, event)
+
+    @classmethod
+    def publish_status_change(cls, alert: Alert):
+        """Push an alert whose status changed"""
+        publish_alerts([alert], 'alert.status_changed')
+
+    @classmethod
+    def _build_incident_alerts(
+        cls,
+        alert_type: str,
+        latitude: float,
+        longitude: float,
+        severity: str,
+        description: str,
+        created_by_user
+    ) -> List[Alert]:
+        """Build the unsaved primary alert of an incident followed by any support alerts"""
+        primary_alert = Alert(
             title=f"Emergency: {alert_type.replace('_', ' ').title()}",
             alert_type=alert_type,
             description=description,
             location=f"Lat: {latitude}, Lng: {longitude}",
             latitude=latitude,
             longitude=longitude,
-            priority=priority,
+            priority=cls.PRIORITY_MAPPING.get(severity, 'medium'),
             status='active',
-            department=primary_department,
+            department=Alert.get_department_for_alert_type(alert_type),
             created_by=created_by_user
         )
+        alerts = [primary_alert]
 
-        # Assign primary alert to nearest station
-        StationFinderService.assign_alert_to_nearest_station(primary_alert)
+        if alert_type in cls.FIRE_ALERT_TYPES:
+            incident_name = alert_type.replace('_', ' ').title()
 
-        # For fire emergencies, also alert medical and police departments
-        if alert_type in ['fire_detected', 'building_fire', 'wildfire', 'gas_leak', 'explosion', 'hazmat_incident']:
-            cls._create_supporting_alerts(
-                primary_alert, latitude, longitude, description, created_by_user
-            )
+            # Medical alert for potential injuries
+            alerts.append(Alert(
+                title=f"Medical Support: {incident_name}",
+                alert_type='injury',  # Generic medical response
+                description=f"Medical support requested for fire emergency.\n\nOriginal Alert:\n{description}",
+                location=primary_alert.location,
+                latitude=latitude,
+                longitude=longitude,
+                priority=primary_alert.priority,
+                status='active',
+                department='medical',
+                created_by=created_by_user
+            ))
 
-        return primary_alert
+            # Police alert for crowd control and traffic management
+            alerts.append(Alert(
+                title=f"Police Support: {incident_name}",
+                alert_type='traffic_violation',  # Generic police response
+                description=f"Police support requested for fire emergency - crowd control and traffic management.\n\nOriginal Alert:\n{description}",
+                location=primary_alert.location,
+                latitude=latitude,
+                longitude=longitude,
+                priority='medium',  # Lower priority for support
+                status='active',
+                department='police',
+                created_by=created_by_user
+            ))
+
+        return alerts
 
     @classmethod
-    def _create_supporting_alerts(cls, primary_alert, latitude, longitude, description, created_by_user):
-        """Create supporting alerts for other departments during fire emergencies"""
-
-        # Create medical alert for potential injuries
-        medical_alert = Alert.objects.create(
-            title=f"Medical Support: {primary_alert.alert_type.replace('_', ' ').title()}",
-            alert_type='injury',  # Generic medical response
-            description=f"Medical support requested for fire emergency.\n\nOriginal Alert:\n{description}",
-            location=f"Lat: {latitude}, Lng: {longitude}",
-            latitude=latitude,
-            longitude=longitude,
-            priority=primary_alert.priority,
-            status='active',
-            department='medical',
-            created_by=created_by_user
-        )
-        StationFinderService.assign_alert_to_nearest_station(medical_alert)
+    def _assign_stations(cls, alerts: List[Alert]):
+        """Assign unsaved alerts to their nearest stations, one vectorized lookup per department"""
+        alerts_by_department = defaultdict(list)
+        for alert in alerts:
+            if alert.latitude is not None and alert.longitude is not None:
+                alerts_by_department[alert.department].append(alert)
 
-        # Create police alert for crowd control and traffic management
-        police_alert = Alert.objects.create(
-            title=f"Police Support: {primary_alert.alert_type.replace('_', ' ').title()}",
-            alert_type='traffic_violation',  # Generic police response
-            description=f"Police support requested for fire emergency - crowd control and traffic management.\n\nOriginal Alert:\n{description}",
-            location=f"Lat: {latitude}, Lng: {longitude}",
-            latitude=latitude,
-            longitude=longitude,
-            priority='medium',  # Lower priority for support
-            status='active',
-            department='police',
-            created_by=created_by_user
-        )
-        StationFinderService.assign_alert_to_nearest_station(police_alert)
+        if settings.STATION_ROUTING_MODE == 'travel_time':
+            for department, department_alerts in alerts_by_department.items():
+                for alert in department_alerts:
+                    fastest = StationFinderService.find_fastest_station(
+                        float(alert.latitude), float(alert.longitude), department
+                    )
+                    if fastest:
+                        station, eta_seconds = fastest
+                        alert.assigned_station = station
+                        if eta_seconds is None:
+                            distance_km = StationFinderService.calculate_distance(
+                                float(alert.latitude), float(alert.longitude),
+                                float(station.latitude), float(station.longitude)
+                            )
+                            alert.assigned_to = f"{station.name} ({distance_km:.1f}km away)"
+                        else:
+                            alert.assigned_to = f"{station.name} ({eta_seconds / 60:.0f} min away)"
+            return
+
+        # Alerts routed earlier in this batch count towards a station's load
+        pending = defaultdict(int)
+        k = StationFinderService.routing_candidates()
+
+        for department, department_alerts in alerts_by_department.items():
+            nearest = StationFinderService.find_nearest_stations_bulk(
+                [(float(alert.latitude), float(alert.longitude)) for alert in department_alerts],
+                department,
+                k=k
+            )
+            for alert, matches in zip(department_alerts, nearest):
+                choice = StationFinderService.pick_station(matches, pending=pending)
+                if choice:
+                    station, station_distance = choice
+                    pending[station.station_id] += 1
+                    alert.assigned_station = station
+                    alert.assigned_to = f"{station.name} ({station_distance:.1f}km away)"
@@ -0,0 +1,89 @@
+from django.db.models.signals import post_init, post_save, post_delete, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from geography.models import Station
+from .counters import COUNTER_FIELDS, counter_key, record_alert_changed, release_station_counters
+from .models import Alert, AlertTombstone
+from .services import AlertRoutingService
+
+
+@receiver(post_init, sender=Alert)
+def remember_counter_key(sender, instance, **kwargs):
+    """Remember which counter row a loaded alert belongs to"""
+    # Never trigger extra queries for deferred fields
+    deferred = instance.get_deferred_fields()
+    if instance.pk is None or any(field in deferred for field in COUNTER_FIELDS):
+        instance._counter_key = None
+    else:
+        instance._counter_key = counter_key(instance)
+
+
+@receiver(post_save, sender=Alert)
+def update_alert_counters(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Keep alert counters in step with status, priority and assignment changes,
+    and leave a tombstone in the scope an alert moves out of.
+    """
+    if update_fields is not None and not set(update_fields) & {
+        'department', 'assigned_station', 'assigned_station_id', 'status', 'priority'
+    }:
+        return
+
+    new_key = counter_key(instance)
+    old_key = None if created else instance._counter_key
+    if not created and old_key is None:
+        # Loaded without the counter fields, nothing to compare against
+        instance._counter_key = new_key
+        return
+
+    record_alert_changed(old_key, new_key)
+    instance._counter_key = new_key
+
+    # Delta sync clients scoped to the old department or station must drop the alert
+    if old_key is not None and old_key[:2] != new_key[:2]:
+        AlertTombstone.objects.create(
+            alert_id=instance.pk,
+            department=old_key[0],
+            assigned_station_id=old_key[1]
+        )
+
+    if old_key is not None and old_key[2] != new_key[2]:
+        AlertRoutingService.publish_status_change(instance)
+
+
+@receiver(post_delete, sender=Alert)
+def remove_from_alert_counters(sender, instance, **kwargs):
+    """Drop a deleted alert from its counter row"""
+    if instance._counter_key:
+        record_alert_changed(instance._counter_key, None)
+
+
+@receiver(post_delete, sender=Alert)
+def leave_alert_tombstone(sender, instance, **kwargs):
+    """Record the deletion for delta sync clients"""
+    AlertTombstone.objects.create(
+        alert_id=instance.pk,
+        department=instance.department,
+        assigned_station_id=instance.assigned_station_id
+    )
+
+
+@receiver(pre_delete, sender=Station)
+def leave_station_alert_tombstones(sender, instance, **kwargs):
+    """
+    The station's alerts are about to be unassigned by a queryset update,
+    which sends no save signals and leaves updated_at alone: tombstone them
+    for the station's scope and bump updated_at so department scopes re-sync them.
+    """
+    alerts = Alert.objects.filter(assigned_station_id=instance.pk)
+    AlertTombstone.objects.bulk_create([
+        AlertTombstone(alert_id=alert_id, department=department, assigned_station_id=instance.pk)
+        for alert_id, department in alerts.values_list('id', 'department')
+    ], batch_size=1000)
+    alerts.update(updated_at=timezone.now())
+
+
+@receiver(post_delete, sender=Station)
+def unassign_station_counters(sender, instance, **kwargs):
+    """The station's alerts are now unassigned, move their counts with them"""
+    release_station_counters(instance.pk)
@@ -0,0 +1,134 @@
+"""
+Delta sync of alerts against a watermark.
+
+A cursor holds two keyset positions: (updated_at, id) in the alerts table and
+(deleted_at, id) in the tombstones table. Each call returns the rows after
+those positions, up to a settle horizon a few seconds in the past, and a new
+cursor to send next time.
+"""
+import base64
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import AlertTombstone
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class CursorExpired(ValueError):
+    pass
+
+
+def encode_cursor(alert_key, tombstone_key):
+    payload = json.dumps({'a': alert_key, 't': tombstone_key}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(since):
+    """
+    Parse a sync cursor, or a plain ISO timestamp for a first sync from a known time.
+
+    Returns:
+        (alert_key, tombstone_key), each a (datetime, id) tuple
+    """
+    timestamp = parse_datetime(since) if since else None
+    if timestamp is not None:
+        if timezone.is_naive(timestamp):
+            timestamp = timezone.make_aware(timestamp)
+        return (timestamp, 0), (timestamp, 0)
+
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(since.encode()).decode())
+        keys = []
+        for name in ('a', 't'):
+            moment, pk = payload[name]
+            moment = parse_datetime(moment)
+            if moment is None:
+                raise InvalidCursor(since)
+            keys.append((moment, int(pk)))
+    except (TypeError, ValueError, KeyError, AttributeError):
+        raise InvalidCursor(since)
+    return keys[0], keys[1]
+
+
+def _after(field, key):
+    moment, pk = key
+    return models.Q(**{f'{field}__gt': moment}) | models.Q(**{field: moment, 'id__gt': pk})
+
+
+def _page(queryset, field, key, horizon, limit):
+    if key is not None:
+        queryset = queryset.filter(_after(field, key))
+    rows = list(queryset.filter(**{f'{field}__lt': horizon}).order_by(field, 'id')[:limit + 1])
+    return rows[:limit], len(rows) > limit
+
+
+def _key(row, field):
+    return [getattr(row, field).isoformat(), row.id]
+
+
+def alert_changes(alerts, scope, since=None, limit=None):
+    """
+    Alerts created or updated, and tombstones of alerts deleted or moved out
+    of the scope, after a cursor.
+
+    Args:
+        alerts: Alert queryset already scoped to the user
+        scope: Q from alert_scope_filter, applied to tombstones
+        since: cursor from a previous call, an ISO timestamp, or None for everything
+
+    Returns:
+        dict with updated alerts, deleted alert ids, the next cursor and has_more
+    """
+    limit = limit or settings.ALERT_SYNC_PAGE_SIZE
+    now = timezone.now()
+    horizon = now - timedelta(seconds=settings.ALERT_SYNC_SETTLE_SECONDS)
+
+    alert_key = tombstone_key = None
+    if since:
+        alert_key, tombstone_key = decode_cursor(since)
+        # Deletions before the retention window may already be pruned
+        if tombstone_key[0] < now - timedelta(days=settings.ALERT_TOMBSTONE_RETENTION_DAYS):
+            raise CursorExpired(since)
+
+    updated, more_updated = _page(alerts, 'updated_at', alert_key, horizon, limit)
+    tombstones = AlertTombstone.objects.filter(scope) if since else AlertTombstone.objects.none()
+    deleted, more_deleted = _page(tombstones, 'deleted_at', tombstone_key, horizon, limit)
+
+    # A stream that is fully read jumps to the horizon so idle polls stay cheap
+    horizon_key = [horizon.isoformat(), 0]
+    next_alert_key = _key(updated[-1], 'updated_at') if more_updated else horizon_key
+    next_tombstone_key = _key(deleted[-1], 'deleted_at') if more_deleted else horizon_key
+
+    # Tombstones also mark alerts that moved out of a scope, only report those no longer visible
+    deleted_ids = list(dict.fromkeys(tombstone.alert_id for tombstone in deleted))
+    if deleted_ids:
+        visible = set(alerts.filter(id__in=deleted_ids).values_list('id', flat=True))
+        deleted_ids = [alert_id for alert_id in deleted_ids if alert_id not in visible]
+
+    return {
+        'updated': updated,
+        'deleted': deleted_ids,
+        'cursor': encode_cursor(next_alert_key, next_tombstone_key),
+        'has_more': more_updated or more_deleted,
+    }
+
+
+def prune_tombstones():
+    """
+    Delete tombstones past ALERT_TOMBSTONE_RETENTION_DAYS; cursors that old
+    get CursorExpired, so nothing reads them any more.
+
+    Returns:
+        Number of tombstones deleted
+    """
+    cutoff = timezone.now() - timedelta(days=settings.ALERT_TOMBSTONE_RETENTION_DAYS)
+    deleted, _ = AlertTombstone.objects.filter(deleted_at__lt=cutoff).delete()
+    return deleted
@@ -0,0 +1,14 @@
+from celery import shared_task
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(ignore_result=True)
+def prune_alert_tombstones():
+    """Delete alert tombstones older than the delta sync retention window"""
+    from .sync import prune_tombstones
+
+    deleted = prune_tombstones()
+    if deleted:
+        logger.info(f"Pruned {deleted} alert tombstone(s)")
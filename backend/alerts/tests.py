@@ -0,0 +1,256 @@
+"""
+Tests for the alert list: keyset paging for each role, the station
+manager's UNION scope, and (on PostgreSQL) the indexes behind the
+role-scoped queries.
+"""
+import json
+from datetime import timedelta
+from unittest import skipUnless
+
+from django.db import connection
+from django.db.models import Q
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from accounts.models import User
+from geography.models import Station
+from utils.pagination import KeysetPagination
+from .models import Alert
+from .views import alert_scope_branches, alerts_for_user
+
+NEWEST = ('-created_at', '-id')
+
+# Synthetic alerts for the plan checks: spread over two years, about 5% still open
+SEED_ALERTS_SQL = """
+INSERT INTO alerts_alert (
+    title, alert_type, description, location, priority, status, department,
+    created_by_id, assigned_to, assigned_station_id, created_at, updated_at,
+    response_time, outcome
+)
+SELECT
+    'Plan check alert ' || n, 'robbery', 'Synthetic alert', 'Nowhere',
+    (ARRAY['low', 'medium', 'high'])[1 + mod(n, 3)],
+    CASE WHEN random() < 0.03 THEN 'active'
+         WHEN random() < 0.02 THEN 'in_progress'
+         WHEN random() < 0.10 THEN 'cancelled'
+         ELSE 'resolved' END,
+    (ARRAY['fire', 'police', 'medical'])[1 + mod(n, 3)],
+    %(user_id)s, '',
+    CASE WHEN mod(n, 10) = 0 THEN NULL ELSE (%(station_ids)s::uuid[])[1 + mod(n, %(station_count)s)] END,
+    now() - (random() * interval '730 days'),
+    now(),
+    '', ''
+FROM generate_series(1, %(alerts)s) AS n
+"""
+
+
+def make_station(index, department):
+    return Station.objects.create(
+        name=f'Test Station {index}', code=f'TEST{index}', department=department,
+        region='Test', address='-', city='-', state='-', zip_code='-'
+    )
+
+
+def make_user(username, role, department, station=None):
+    return User.objects.create(
+        username=username, email=f'{username}@example.com', full_name=username,
+        role=role, department=department, station_id=station.station_id if station else None
+    )
+
+
+def role_user(role, department, station=None):
+    """Unsaved user; alerts_for_user only reads role, department and station"""
+    return User(role=role, department=department, station_id=station.station_id if station else None)
+
+
+def index_names(plan):
+    """Every index named anywhere in an EXPLAIN (FORMAT JSON) plan"""
+    names = set()
+    if isinstance(plan, dict):
+        if 'Index Name' in plan:
+            names.add(plan['Index Name'])
+        for value in plan.values():
+            names |= index_names(value)
+    elif isinstance(plan, list):
+        for value in plan:
+            names |= index_names(value)
+    return names
+
+
+def union_page(user, order_by, keyset_filter=Q(), limit=KeysetPagination.page_size + 1, **filters):
+    """A station manager's alert list page, built the way KeysetPagination builds it"""
+    keys = KeysetPagination.union_page_keys(alert_scope_branches(user, **filters), keyset_filter, order_by, limit)
+    return alerts_for_user(user, **filters).filter(pk__in=keys).order_by(*order_by)[:limit]
+
+
+class AlertListPaginationTests(APITestCase):
+    """The alert list pages through each role's scope with keyset cursors"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.fire_station = make_station(1, 'fire')
+        cls.police_station = make_station(2, 'police')
+        cls.admin = make_user('admin', 'Admin', 'fire')
+        cls.manager = make_user('manager', 'Station Manager', 'fire', cls.fire_station)
+        cls.officer = make_user('officer', 'Field Officer', 'police', cls.police_station)
+
+        # Fire alerts with and without a station, police alerts on both
+        # stations, and pairs sharing a created_at so the id breaks the tie
+        placements = [('fire', cls.fire_station)] * 9 + [('fire', None)] * 6 + \
+            [('police', cls.police_station)] * 7 + [('police', cls.fire_station)] * 4 + [('medical', None)] * 3
+        now = timezone.now()
+        for n, (department, station) in enumerate(placements):
+            alert = Alert.objects.create(
+                title=f'Alert {n}', alert_type='fire', description='-', location='-',
+                priority=('low', 'medium', 'high')[n % 3], status=('active', 'resolved')[n % 2],
+                department=department, assigned_station=station, created_by=cls.admin
+            )
+            Alert.objects.filter(pk=alert.pk).update(created_at=now - timedelta(minutes=n // 2))
+
+    def expected_ids(self, user, **filters):
+        return list(alerts_for_user(user, **filters).order_by(*NEWEST).values_list('id', flat=True))
+
+    def walk(self, user, url):
+        """Ids of every page reached by following next links, and the pages' responses"""
+        self.client.force_authenticate(user)
+        ids, responses = [], []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(list(response.data), ['next', 'previous', 'results'])
+            responses.append(response)
+            ids += [alert['id'] for alert in response.data['results']]
+            url = response.data['next']
+        return ids, responses
+
+    def test_pages_cover_each_scope_in_order(self):
+        for user in (self.admin, self.manager, self.officer):
+            with self.subTest(role=user.role):
+                ids, responses = self.walk(user, '/api/alerts/?page_size=4')
+                self.assertEqual(ids, self.expected_ids(user))
+                self.assertIsNone(responses[0].data['previous'])
+
+    def test_filters_page_inside_the_scope(self):
+        ids, _ = self.walk(self.manager, '/api/alerts/?page_size=3&status=active&priority=high')
+        self.assertEqual(ids, self.expected_ids(self.manager, status='active', priority='high'))
+        self.assertTrue(ids)
+
+    def test_previous_returns_the_page_before(self):
+        _, responses = self.walk(self.manager, '/api/alerts/?page_size=4')
+        self.assertGreater(len(responses), 2)
+        for earlier, later in zip(responses, responses[1:]):
+            previous = self.client.get(later.data['previous'])
+            self.assertEqual(
+                [alert['id'] for alert in previous.data['results']],
+                [alert['id'] for alert in earlier.data['results']]
+            )
+
+    def test_new_alerts_do_not_shift_later_pages(self):
+        self.client.force_authenticate(self.manager)
+        first = self.client.get('/api/alerts/?page_size=4')
+        second = self.client.get(first.data['next'])
+        Alert.objects.create(
+            title='Newest', alert_type='fire', description='-', location='-', priority='high',
+            department='fire', assigned_station=self.fire_station, created_by=self.admin
+        )
+        self.assertEqual(self.client.get(first.data['next']).data['results'], second.data['results'])
+
+    def test_pages_issue_no_count_or_offset(self):
+        self.client.force_authenticate(self.manager)
+        url = self.client.get('/api/alerts/?page_size=4').data['next']
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        for query in queries.captured_queries:
+            self.assertNotIn('COUNT(', query['sql'].upper())
+            self.assertNotIn('OFFSET', query['sql'].upper())
+
+    def test_invalid_cursor_is_not_found(self):
+        self.client.force_authenticate(self.manager)
+        self.assertEqual(self.client.get('/api/alerts/?cursor=not-a-cursor').status_code, 404)
+        self.assertEqual(self.client.get('/api/alerts/?cursor=eyJrIjpbMV0sInIiOjB9').status_code, 404)
+
+    @skipUnless(connection.features.supports_slicing_ordering_in_compound, 'UNION branches cannot be cut to a page')
+    def test_union_page_matches_or_scope(self):
+        """Each UNION page equals the same page of the OR scope, from every cut point"""
+        paginator = KeysetPagination()
+        paginator.ordering = NEWEST
+        rows = list(alerts_for_user(self.manager).order_by(*NEWEST))
+        for limit in (1, 3, 5):
+            for row in [None] + rows:
+                keyset_filter = paginator.build_keyset_filter(paginator.get_key(row), False) if row else Q()
+                with self.subTest(limit=limit, after=row and row.pk):
+                    self.assertEqual(
+                        list(union_page(self.manager, NEWEST, keyset_filter, limit)),
+                        list(alerts_for_user(self.manager).filter(keyset_filter).order_by(*NEWEST)[:limit])
+                    )
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Query plans can only be checked on PostgreSQL')
+class AlertQueryPlanTests(TestCase):
+    """The role-scoped alert queries use the alert indexes on a large table"""
+    alert_count = 100000
+    station_count = 60
+    page = KeysetPagination.page_size + 1
+
+    @classmethod
+    def setUpTestData(cls):
+        creator = make_user('plan_check', 'Admin', 'fire')
+        stations = [make_station(i, ('fire', 'police', 'medical')[i % 3]) for i in range(cls.station_count)]
+        with connection.cursor() as cursor:
+            cursor.execute(SEED_ALERTS_SQL, {
+                'user_id': creator.pk,
+                'station_ids': [str(station.station_id) for station in stations],
+                'station_count': cls.station_count,
+                'alerts': cls.alert_count,
+            })
+            cursor.execute('ANALYZE alerts_alert')
+        cls.station = stations[1]
+        cls.manager = role_user('Station Manager', 'fire', cls.station)
+
+    def assertUsesIndexes(self, queryset, expected):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        used = index_names(json.loads(plan) if isinstance(plan, str) else plan)
+        self.assertLessEqual(set(expected), used, f'Plan used {sorted(used) or "a sequential scan"}')
+
+    def test_field_officer_station_alerts(self):
+        officer = role_user('Field Officer', self.station.department, self.station)
+        self.assertUsesIndexes(alerts_for_user(officer).order_by(*NEWEST)[:self.page], {'alert_station_created_idx'})
+        self.assertUsesIndexes(
+            alerts_for_user(officer, status='active').order_by(*NEWEST)[:self.page], {'alert_station_status_idx'}
+        )
+
+    def test_department_alerts(self):
+        officer = role_user('Field Officer', 'police')
+        self.assertUsesIndexes(alerts_for_user(officer).order_by(*NEWEST)[:self.page], {'alert_dept_created_idx'})
+        self.assertUsesIndexes(
+            alerts_for_user(officer, status='in_progress').order_by(*NEWEST)[:self.page], {'alert_dept_status_idx'}
+        )
+
+    def test_station_manager_union(self):
+        self.assertUsesIndexes(union_page(self.manager, NEWEST), {'alert_station_created_idx', 'alert_dept_created_idx'})
+        self.assertUsesIndexes(
+            union_page(self.manager, NEWEST, status='active'), {'alert_station_status_idx', 'alert_dept_status_idx'}
+        )
+        # A later page: everything older than a year ago
+        older = Q(created_at__lt=timezone.now() - timedelta(days=365))
+        self.assertUsesIndexes(
+            union_page(self.manager, NEWEST, older), {'alert_station_created_idx', 'alert_dept_created_idx'}
+        )
+
+    def test_open_alerts(self):
+        self.assertUsesIndexes(
+            Alert.objects.filter(assigned_station=self.station, status__in=['active', 'in_progress'])
+            .order_by('-created_at')[:self.page],
+            {'alert_station_open_idx'}
+        )
+        self.assertUsesIndexes(
+            Alert.objects.filter(department='medical', priority='high', status__in=['active', 'in_progress'])
+            .order_by('-created_at')[:self.page],
+            {'alert_dept_open_idx'}
+        )
+
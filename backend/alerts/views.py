@@ -2,111 +2,182 @@ from rest_framework import generics, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from django.conf import settings
+from django.core.cache import cache
 from django.utils import timezone
 from django.db import models
-from .models import Alert
+from geography.models import Station
+from utils.conditional import etag_matches, make_etag, not_modified, queryset_version, set_etag
+from utils.pagination import KeysetPagination
+from .counters import counter_statistics
+from .models import Alert, AlertCounter, AlertTombstone
+from .search import search_alerts
 from .serializers import AlertSerializer
 from .services import StationFinderService, AlertRoutingService
+from .sync import CursorExpired, InvalidCursor, alert_changes
+
+def alert_scope_filter(user):
+    """
+    Q of the alerts a user may see based on their role, or None for no alerts.
+
+    Only uses department and assigned_station_id, so it also scopes alert tombstones.
+    """
+    if user.role == 'Admin':
+        # Admins can see all alerts
+        return models.Q()
+    elif user.role == 'Station Manager':
+        # Station managers can see alerts assigned to their station or in their department/region
+        if user.station_id:
+            return models.Q(assigned_station_id=user.station_id) | models.Q(department=user.department)
+        # If no station assigned, show alerts in their department/region
+        return models.Q(department=user.department)
+    elif user.role == 'Field Officer':
+        # Field officers can only see alerts assigned to their station
+        if user.station_id:
+            return models.Q(assigned_station_id=user.station_id)
+        # If no station assigned, show alerts in their department
+        return models.Q(department=user.department)
+    # Default: no alerts for unknown roles
+    return None
+
+def alert_visible_to(user, department, station_id):
+    """alert_scope_filter for one alert's department and assigned station (keep the two in step)"""
+    if user.role == 'Admin':
+        return True
+    elif user.role == 'Station Manager':
+        if user.station_id and str(station_id) == str(user.station_id):
+            return True
+        return department == user.department
+    elif user.role == 'Field Officer':
+        if user.station_id:
+            return station_id is not None and str(station_id) == str(user.station_id)
+        return department == user.department
+    return False
+
+def alerts_for_user(user, **filters):
+    """
+    Alerts visible to a user based on their role, with related rows joined in.
+
+    Extra filters (status, priority) are applied inside the role scope so
+    they can use the (scope, status, created_at) indexes.
+    """
+    scope = alert_scope_filter(user)
+    queryset = Alert.objects.filter(scope, **filters) if scope is not None else Alert.objects.none()
+
+    # AlertSerializer reads the creator's and station's names; the search document is never sent
+    return queryset.select_related('created_by', 'assigned_station').defer('search_vector')
+
+def alert_scope_branches(user, **filters):
+    """
+    A station manager's scope as two querysets (station's alerts, department's
+    alerts), or None for single-column scopes.
+
+    An OR across two columns cannot use either composite index, so the alert
+    list pages through each branch on its own index and unions the pages
+    (see KeysetPagination.keyset_branches).
+    """
+    if user.role == 'Station Manager' and user.station_id:
+        return [
+            Alert.objects.filter(assigned_station_id=user.station_id, **filters),
+            Alert.objects.filter(department=user.department, **filters),
+        ]
+    return None
+
+def alert_list_versions(user):
+    """
+    Versions of what the user's alert list pages are built from.
+
+    Newest update among the alerts in the user's scope and newest tombstone
+    left in it cover inserts, updates, deletes and alerts moving out, without
+    counting rows. Stations of the user's department cover the joined
+    station names. Changes outside the scope leave the version alone.
+    """
+    scope = alert_scope_filter(user)
+    if scope is None:
+        return ()
+
+    stations = Station.objects.all() if user.role == 'Admin' else Station.objects.filter(department=user.department)
+    return (
+        queryset_version(Alert.objects.filter(scope), count=False),
+        queryset_version(AlertTombstone.objects.filter(scope), field='deleted_at', count=False),
+        queryset_version(stations, count=False),
+    )
 
 class AlertListCreateView(generics.ListCreateAPIView):
     serializer_class = AlertSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-created_at', '-id')
+    keyset_branches = None
     
     def get_queryset(self):
-        user = self.request.user
-
-        # Role-based alert filtering
-        if user.role == 'Admin':
-            # Admins can see all alerts
-            queryset = Alert.objects.all()
-        elif user.role == 'Station Manager':
-            # Station managers can see alerts assigned to their station or in their department/region
-            if user.station_id:
-                queryset = Alert.objects.filter(
-                    models.Q(assigned_station_id=user.station_id) |
-                    models.Q(department=user.department)
-                )
-            else:
-                # If no station assigned, show alerts in their department/region
-                queryset = Alert.objects.filter(department=user.department)
-        elif user.role == 'Field Officer':
-            # Field officers can only see alerts assigned to their station
-            if user.station_id:
-                queryset = Alert.objects.filter(assigned_station_id=user.station_id)
-            else:
-                # If no station assigned, show alerts in their department
-                queryset = Alert.objects.filter(department=user.department)
-        else:
-            # Default: no alerts for unknown roles
-            queryset = Alert.objects.none()
+        filters = {}
 
         # Filter by status if provided
         status_filter = self.request.query_params.get('status', None)
         if status_filter:
-            queryset = queryset.filter(status=status_filter)
+            filters['status'] = status_filter
 
         # Filter by priority if provided
         priority_filter = self.request.query_params.get('priority', None)
         if priority_filter:
-            queryset = queryset.filter(priority=priority_filter)
+            filters['priority'] = priority_filter
 
-        # Search functionality
+        queryset = alerts_for_user(self.request.user, **filters)
+
+        # Full-text search, best matches first
         search = self.request.query_params.get('search', None)
         if search:
-            queryset = queryset.filter(
-                models.Q(title__icontains=search) |
-                models.Q(location__icontains=search) |
-                models.Q(description__icontains=search)
-            )
+            queryset, ranked = search_alerts(queryset, search)
+            if ranked:
+                self.keyset_ordering = ('-search_rank', '-id')
+        else:
+            self.keyset_branches = alert_scope_branches(self.request.user, **filters)
 
         return queryset
 
+    def list(self, request, *args, **kwargs):
+        # Answer repeated polls with 304 before touching the alert rows
+        etag = make_etag(request, *alert_list_versions(request.user))
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        return set_etag(super().list(request, *args, **kwargs), etag)
+
     def perform_create(self, serializer):
         """Automatically assign alert to nearest station when created"""
-        alert = serializer.save(created_by=self.request.user)
+        # Department and station go into the first save: a second save would
+        # look like the alert moving out of the scope it was created in
+        assignment = {}
+        latitude = serializer.validated_data.get('latitude')
+        longitude = serializer.validated_data.get('longitude')
 
         # If coordinates are provided, find and assign nearest station
-        if alert.latitude and alert.longitude:
+        if latitude and longitude:
             # Determine department based on alert type
-            department = Alert.get_department_for_alert_type(alert.alert_type)
-            alert.department = department
+            department = Alert.get_department_for_alert_type(serializer.validated_data.get('alert_type'))
+            assignment['department'] = department
 
             # Find nearest station
             nearest_station = StationFinderService.find_nearest_station(
-                float(alert.latitude),
-                float(alert.longitude),
+                float(latitude),
+                float(longitude),
                 department
             )
 
             if nearest_station:
-                alert.assigned_station_id = nearest_station.station_id
-                alert.save()
+                assignment['assigned_station'] = nearest_station
+
+        alert = serializer.save(created_by=self.request.user, **assignment)
+
+        AlertRoutingService.publish_alerts([alert], 'alert.created')
 
 class AlertDetailView(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = AlertSerializer
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
-        user = self.request.user
-
         # Use the same filtering logic as the list view
-        if user.role == 'Admin':
-            return Alert.objects.all()
-        elif user.role == 'Station Manager':
-            if user.station_id:
-                return Alert.objects.filter(
-                    models.Q(assigned_station_id=user.station_id) |
-                    models.Q(department=user.department)
-                )
-            else:
-                return Alert.objects.filter(department=user.department)
-        elif user.role == 'Field Officer':
-            if user.station_id:
-                return Alert.objects.filter(assigned_station_id=user.station_id)
-            else:
-                return Alert.objects.filter(department=user.department)
-        else:
-            return Alert.objects.none()
+        return alerts_for_user(self.request.user)
     
     def perform_update(self, serializer):
         # If status is being changed to resolved, set resolved_at
@@ -122,25 +193,58 @@ def alert_statistics(request):
 
     # System Administrators can see statistics for all alerts
     if user.role == 'System Administrator':
+        scope = 'all'
         alerts = Alert.objects.all()
+        counters = AlertCounter.objects.all()
     else:
         # Other users see statistics for their department only
+        scope = f'department:{user.department}'
         alerts = Alert.objects.filter(department=user.department)
-    
-    stats = {
-        'total_alerts': alerts.count(),
-        'active_alerts': alerts.filter(status='active').count(),
-        'resolved_alerts': alerts.filter(status='resolved').count(),
-        'high_priority': alerts.filter(priority='high').count(),
-        'recent_alerts': AlertSerializer(
-            alerts.filter(created_at__gte=timezone.now() - timezone.timedelta(days=7))[:5], 
+        counters = AlertCounter.objects.filter(department=user.department)
+
+    cache_key = f'alert_statistics:{scope}'
+    stats = cache.get(cache_key)
+    if stats is None:
+        # Counts come from the maintained counter rows in one aggregate query
+        stats = counter_statistics(counters)
+        stats['recent_alerts'] = AlertSerializer(
+            alerts.filter(
+                created_at__gte=timezone.now() - timezone.timedelta(days=7)
+            ).select_related('created_by', 'assigned_station').defer('search_vector')[:5],
             many=True
         ).data
-    }
+        cache.set(cache_key, stats, settings.ALERT_STATISTICS_CACHE_TTL)
     
     return Response(stats)
 
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def alert_changes_since(request):
+    """
+    Delta sync: alerts created/updated and ids of alerts deleted since a cursor.
+
+    Call without `since` for the initial load, then keep passing the returned
+    cursor. While has_more is true, call again straight away.
+    """
+    scope = alert_scope_filter(request.user)
+    if scope is None:
+        return Response({'error': 'No alerts are visible to this role'}, status=status.HTTP_403_FORBIDDEN)
+
+    try:
+        changes = alert_changes(alerts_for_user(request.user), scope, since=request.query_params.get('since'))
+    except InvalidCursor:
+        return Response({'error': 'Invalid since cursor'}, status=status.HTTP_400_BAD_REQUEST)
+    except CursorExpired:
+        return Response(
+            {'error': 'Cursor is older than the sync window, reload all alerts'},
+            status=status.HTTP_410_GONE
+        )
+
+    changes['updated'] = AlertSerializer(changes['updated'], many=True).data
+    return Response(changes)
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def find_nearest_stations(request):
@@ -236,6 +340,60 @@ def create_emergency_alert(request):
         )
 
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def create_emergency_alerts_bulk(request):
+    """Create and route many emergency alerts (gateway backlogs, mass-casualty events)"""
+    incidents = request.data.get('incidents') if isinstance(request.data, dict) else request.data
+
+    if not isinstance(incidents, list) or not incidents:
+        return Response({'error': 'A non-empty list of incidents is required'}, status=status.HTTP_400_BAD_REQUEST)
+
+    max_incidents = settings.ALERT_BULK_MAX_INCIDENTS
+    if len(incidents) > max_incidents:
+        return Response({'error': f'A bulk request may contain at most {max_incidents} incidents'},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    # Validate every incident before creating anything
+    required_fields = ['alert_type', 'latitude', 'longitude', 'description']
+    errors = {}
+    validated_incidents = []
+    for index, incident in enumerate(incidents):
+        if not isinstance(incident, dict):
+            errors[index] = 'Incident must be an object'
+            continue
+
+        missing_fields = [field for field in required_fields if field not in incident]
+        if missing_fields:
+            errors[index] = f"Missing required fields: {', '.join(missing_fields)}"
+            continue
+
+        try:
+            latitude = float(incident['latitude'])
+            longitude = float(incident['longitude'])
+        except (ValueError, TypeError):
+            errors[index] = 'Invalid coordinate values'
+            continue
+
+        validated_incidents.append({
+            'alert_type': incident['alert_type'],
+            'latitude': latitude,
+            'longitude': longitude,
+            'severity': incident.get('severity', 'medium'),
+            'description': incident['description']
+        })
+
+    if errors:
+        return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+
+    alerts = AlertRoutingService.route_emergency_alerts_bulk(validated_incidents, created_by_user=request.user)
+
+    return Response({
+        'created': len(alerts),
+        'alerts': AlertSerializer(alerts, many=True).data
+    }, status=status.HTTP_201_CREATED)
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_station_coverage(request, station_id):
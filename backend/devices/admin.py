@@ -1,5 +1,6 @@
 from django.contrib import admin
 from .models import Device, DeviceReading, EmergencyTrigger, DepartmentRegistration
+from .telemetry import overlay_telemetry
 
 @admin.register(Device)
 class DeviceAdmin(admin.ModelAdmin):
@@ -8,6 +9,18 @@ class DeviceAdmin(admin.ModelAdmin):
     search_fields = ('serial_number', 'owner_name', 'mac_address')
     readonly_fields = ('device_id', 'registered_at', 'updated_at', 'is_online')
 
+    # Show heartbeat/battery/location fresher than the last telemetry flush
+    def get_object(self, request, object_id, from_field=None):
+        device = super().get_object(request, object_id, from_field)
+        if device is not None:
+            overlay_telemetry([device])
+        return device
+
+    def get_changelist_instance(self, request):
+        changelist = super().get_changelist_instance(request)
+        changelist.result_list = overlay_telemetry(changelist.result_list)
+        return changelist
+
 @admin.register(DeviceReading)
 class DeviceReadingAdmin(admin.ModelAdmin):
     list_display = ('device', 'reading_type', 'timestamp', 'heart_rate', 'temperature', 'fear_probability', 'is_emergency')
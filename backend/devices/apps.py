@@ -1,5 +1,11 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 class DevicesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'devices'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .partitions import install_partitions
+        post_migrate.connect(install_partitions, sender=self)
@@ -0,0 +1,235 @@
+"""
+Cold archive of old device readings as Parquet files.
+
+Readings older than DEVICE_READING_ARCHIVE_AFTER_DAYS are exported, one day
+at a time, to zstd-compressed Parquet files under
+DEVICE_READING_ARCHIVE_URI (a local path, s3://bucket/prefix or
+gs://bucket/prefix), laid out Hive-style by day and device:
+
+    <archive>/date=2026-01-31/device=<device_id>/readings.parquet
+
+and then deleted from device_readings in batches. Readings referenced by an
+emergency trigger stay in the table, they are part of the incident record.
+
+Exports are idempotent: a file that already exists is merged with the new
+rows (by reading_id), so a run interrupted between writing and deleting can
+simply be repeated. Only whole days are archived, so a day's file is written
+once rather than once per run. read_archived_readings reads the files of a
+device back for a time range.
+"""
+import json
+import logging
+from datetime import datetime, time as dt_time, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import DeviceReading, EmergencyTrigger
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_FIELDS = [
+    'reading_id', 'device_id', 'reading_type', 'timestamp', 'sampled_at', 'heart_rate', 'temperature',
+    'smoke_level', 'battery_level', 'latitude', 'longitude', 'audio_file', 'fear_probability',
+    'stress_level', 'audio_analysis_complete', 'is_emergency', 'triggered_by', 'raw_data',
+]
+
+
+class ArchiveNotConfigured(Exception):
+    pass
+
+
+def archive_schema():
+    import pyarrow as pa
+
+    return pa.schema([
+        ('reading_id', pa.string()),
+        ('device_id', pa.string()),
+        ('reading_type', pa.string()),
+        ('timestamp', pa.timestamp('us', tz='UTC')),
+        ('sampled_at', pa.timestamp('us', tz='UTC')),  # Missing from files written before it existed
+        ('heart_rate', pa.int32()),
+        ('temperature', pa.float64()),
+        ('smoke_level', pa.float64()),
+        ('battery_level', pa.int32()),
+        ('latitude', pa.decimal128(10, 8)),
+        ('longitude', pa.decimal128(11, 8)),
+        ('audio_file', pa.string()),
+        ('fear_probability', pa.float64()),
+        ('stress_level', pa.float64()),
+        ('audio_analysis_complete', pa.bool_()),
+        ('is_emergency', pa.bool_()),
+        ('triggered_by', pa.string()),
+        ('raw_data', pa.string()),  # JSON text
+    ])
+
+
+def archive_filesystem():
+    """(pyarrow filesystem, root path) of the configured archive"""
+    from pyarrow import fs
+
+    uri = settings.DEVICE_READING_ARCHIVE_URI
+    if not uri:
+        raise ArchiveNotConfigured('Set DEVICE_READING_ARCHIVE_URI to archive readings')
+    if '://' not in uri:
+        return fs.LocalFileSystem(), uri.rstrip('/')
+    filesystem, root = fs.FileSystem.from_uri(uri)
+    return filesystem, root.rstrip('/')
+
+
+def archive_path(root, day, device_id):
+    return f'{root}/date={day.isoformat()}/device={device_id}/readings.parquet'
+
+
+def _file_exists(filesystem, path):
+    from pyarrow import fs
+    return filesystem.get_file_info(path).type == fs.FileType.File
+
+
+def write_archive_file(filesystem, path, rows):
+    """
+    Write rows to a Parquet file, merged with the file's existing rows.
+
+    An existing file holds rows already deleted from device_readings, so on
+    local filesystems the new file is written next to it and renamed over
+    it; object stores replace objects atomically on upload.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    from pyarrow import fs
+
+    table = pa.Table.from_pylist(rows, schema=archive_schema())
+    if _file_exists(filesystem, path):
+        existing = pq.read_table(path, filesystem=filesystem, schema=archive_schema())
+        new_ids = set(table.column('reading_id').to_pylist())
+        keep = pa.array([reading_id not in new_ids for reading_id in existing.column('reading_id').to_pylist()])
+        table = pa.concat_tables([existing.filter(keep), table])
+
+    table = table.sort_by([('timestamp', 'ascending'), ('reading_id', 'ascending')])
+    filesystem.create_dir(path.rsplit('/', 1)[0], recursive=True)
+    if isinstance(filesystem, fs.LocalFileSystem):
+        partial = f'{path}.partial'
+        pq.write_table(table, partial, filesystem=filesystem, compression='zstd')
+        filesystem.move(partial, path)
+    else:
+        pq.write_table(table, path, filesystem=filesystem, compression='zstd')
+    return len(table)
+
+
+def _archive_row(values):
+    row = dict(zip(ARCHIVE_FIELDS, values))
+    row['reading_id'] = str(row['reading_id'])
+    row['device_id'] = str(row['device_id'])
+    row['audio_file'] = row['audio_file'] or None
+    row['raw_data'] = json.dumps(row['raw_data']) if row['raw_data'] is not None else None
+    return row
+
+
+def archivable_readings():
+    """Readings that may leave the table: all but those referenced by an emergency trigger"""
+    return DeviceReading.objects.exclude(
+        reading_id__in=EmergencyTrigger.objects.filter(reading__isnull=False).values('reading')
+    )
+
+
+def archive_day(day, cutoff, filesystem, root):
+    """
+    Archive and delete the readings of one UTC day that are older than cutoff.
+
+    Works device by device, so memory holds one device-day at a time.
+
+    Returns:
+        Number of readings archived
+    """
+    start = datetime.combine(day, dt_time.min, tzinfo=dt_timezone.utc)
+    end = min(start + timedelta(days=1), cutoff)
+
+    readings = archivable_readings().between(start, end).order_by()
+
+    archived = 0
+    batch_size = settings.DEVICE_READING_ARCHIVE_BATCH_SIZE
+    for device_id in readings.values_list('device_id', flat=True).distinct():
+        rows = [_archive_row(values) for values in readings.filter(device_id=device_id).values_list(*ARCHIVE_FIELDS)]
+        if not rows:
+            continue
+
+        # The file is complete before any of its rows leave the table
+        write_archive_file(filesystem, archive_path(root, day, device_id), rows)
+
+        reading_ids = [row['reading_id'] for row in rows]
+        for offset in range(0, len(reading_ids), batch_size):
+            with transaction.atomic():
+                # The time range keeps each delete inside the day's partition
+                DeviceReading.objects.between(start, end).filter(
+                    reading_id__in=reading_ids[offset:offset + batch_size]
+                ).delete()
+        archived += len(rows)
+    return archived
+
+
+def archive_readings(before=None, max_days=None):
+    """
+    Archive the whole UTC days of readings before the archive window, oldest
+    day first, skipping days with nothing to archive.
+
+    Returns:
+        {day: readings archived} for the days processed
+    """
+    filesystem, root = archive_filesystem()
+    cutoff = before or timezone.now() - timedelta(days=settings.DEVICE_READING_ARCHIVE_AFTER_DAYS)
+    cutoff = datetime.combine(cutoff.astimezone(dt_timezone.utc).date(), dt_time.min, tzinfo=dt_timezone.utc)
+
+    archived = {}
+    readings = archivable_readings().filter(timestamp__lt=cutoff)
+    while max_days is None or len(archived) < max_days:
+        oldest = readings.order_by('timestamp').values_list('timestamp', flat=True).first()
+        if oldest is None:
+            break
+
+        day = oldest.astimezone(dt_timezone.utc).date()
+        count = archive_day(day, cutoff, filesystem, root)
+        if count:
+            archived[day] = count
+            logger.info(f"Archived {count} reading(s) from {day}")
+        readings = readings.filter(timestamp__gte=datetime.combine(day + timedelta(days=1), dt_time.min, tzinfo=dt_timezone.utc))
+    return archived
+
+
+def archive_days(start, end):
+    """UTC days touched by [start, end)"""
+    first = start.astimezone(dt_timezone.utc).date()
+    last = (end - timedelta(microseconds=1)).astimezone(dt_timezone.utc).date()
+    return [first + timedelta(days=offset) for offset in range((last - first).days + 1)] if last >= first else []
+
+
+def read_archived_readings(device_id, start, end, reading_type=None):
+    """
+    Archived readings of a device in [start, end), oldest first.
+
+    Only the files of the days in the range are opened.
+
+    Returns:
+        List of reading dicts (raw_data decoded)
+    """
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+
+    filesystem, root = archive_filesystem()
+    tables = []
+    for day in archive_days(start, end):
+        path = archive_path(root, day, device_id)
+        if not _file_exists(filesystem, path):
+            continue
+        table = pq.read_table(path, filesystem=filesystem, schema=archive_schema())
+        mask = pc.and_(pc.greater_equal(table['timestamp'], start), pc.less(table['timestamp'], end))
+        if reading_type:
+            mask = pc.and_(mask, pc.equal(table['reading_type'], reading_type))
+        tables.append(table.filter(mask))
+
+    readings = []
+    for table in tables:
+        for row in table.to_pylist():
+            row['raw_data'] = json.loads(row['raw_data']) if row['raw_data'] is not None else {}
+            readings.append(row)
+    return readings
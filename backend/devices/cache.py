@@ -0,0 +1,43 @@
+import copy
+
+from utils.local_cache import LocalCache
+
+# Device fields written by the ingest path; saves limited to these keep cached devices
+INGEST_FIELDS = [
+    'last_heartbeat', 'last_known_latitude', 'last_known_longitude',
+    'last_location_update', 'battery_level', 'updated_at'
+]
+
+device_cache = LocalCache('active_device_by_mac')
+
+
+def get_active_device(mac_address):
+    """
+    Active device for a MAC address, cached per process (None if unknown or inactive).
+
+    Returns a copy: request threads share the cached instance, and uploads
+    set telemetry on the device they are given.
+    """
+    from .models import Device
+    device = device_cache.get(
+        mac_address,
+        lambda: Device.objects.filter(mac_address=mac_address, status='active').first()
+    )
+    return copy.copy(device) if device is not None else None
+
+
+def get_active_devices(mac_addresses):
+    """{mac_address: device} for the active devices among many MAC addresses"""
+    from .models import Device
+
+    def load(missing):
+        return {
+            device.mac_address: device
+            for device in Device.objects.filter(mac_address__in=missing, status='active')
+        }
+
+    # Copies, as in get_active_device
+    return {
+        mac_address: copy.copy(device)
+        for mac_address, device in device_cache.get_many(set(mac_addresses), load).items()
+    }
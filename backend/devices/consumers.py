@@ -0,0 +1,89 @@
+import json
+from urllib.parse import parse_qs
+
+from channels.db import database_sync_to_async
+from channels.generic.http import AsyncHttpConsumer
+from corsheaders.conf import conf as cors_conf
+from django.conf import settings
+from rest_framework.utils.encoders import JSONEncoder
+from accounts.middleware import get_user_for_token
+from .latest import get_latest, snapshot_payload, wait_for_latest
+
+
+class DeviceLatestValuesConsumer(AsyncHttpConsumer):
+    """
+    GET api/devices/<device_id>/latest/ - latest value of every sensor field
+    of a device, merged across reading types.
+
+    Pass the version of the last snapshot as ?since= (or as an If-None-Match
+    ETag) with ?wait=<seconds> to long-poll: the request returns as soon as a
+    newer reading arrives, or with 304 once the wait is over.
+
+    Served by Channels rather than a Django view: Django runs sync views (and
+    async views behind sync-only middleware) on one shared thread per
+    process, which a waiting request would hold for the whole wait.
+    Authenticate with Authorization: Bearer <JWT access token>.
+    """
+
+    async def handle(self, body):
+        self.headers = {name.decode().lower(): value.decode() for name, value in self.scope['headers']}
+        method = self.scope['method']
+        if method == 'OPTIONS':
+            return await self.respond(204, headers={
+                'Access-Control-Allow-Methods': 'GET, OPTIONS',
+                'Access-Control-Allow-Headers': ', '.join(cors_conf.CORS_ALLOW_HEADERS),
+                'Access-Control-Max-Age': str(cors_conf.CORS_PREFLIGHT_MAX_AGE),
+            })
+        if method != 'GET':
+            return await self.respond(405, {'detail': f'Method "{method}" not allowed.'}, headers={'Allow': 'GET, OPTIONS'})
+
+        user = await self.authenticate()
+        if user is None or not user.is_authenticated:
+            return await self.respond(401, {'detail': 'Authentication credentials were not provided.'})
+
+        params = {key: values[0] for key, values in parse_qs(self.scope['query_string'].decode()).items()}
+        since = params.get('since') or self.headers.get('if-none-match', '').strip('W/"') or None
+        try:
+            since = int(since) if since is not None else None
+            wait = min(max(float(params.get('wait', 0)), 0), settings.DEVICE_LATEST_MAX_WAIT)
+        except ValueError:
+            return await self.respond(400, {'error': 'since must be a snapshot version and wait a number of seconds'})
+
+        device_id = self.scope['url_route']['kwargs']['device_id']
+        snapshot = await database_sync_to_async(get_latest)(device_id)
+        if snapshot is None:
+            return await self.respond(404, {'error': 'Device not found'})
+        if since is not None and wait > 0 and snapshot['version'] == since:
+            snapshot = await wait_for_latest(device_id, since, wait) or snapshot
+
+        etag = f'"{snapshot["version"]}"'
+        if snapshot['version'] == since:
+            return await self.respond(304, headers={'ETag': etag})
+        await self.respond(200, snapshot_payload(device_id, snapshot), headers={'ETag': etag})
+
+    async def authenticate(self):
+        authorization = self.headers.get('authorization', '')
+        if not authorization.startswith('Bearer '):
+            return None
+        return await get_user_for_token(authorization[len('Bearer '):])
+
+    async def respond(self, status, data=None, headers=None):
+        """Send a JSON response with the same caching and CORS headers as the REST API"""
+        headers = {
+            'Content-Type': 'application/json',
+            'Cache-Control': 'no-cache, private',
+            'Vary': 'Authorization, Origin',
+            **self.cors_headers(),
+            **(headers or {}),
+        }
+        body = json.dumps(data, cls=JSONEncoder).encode() if data is not None else b''
+        await self.send_response(status, body, headers=[(name.encode(), value.encode()) for name, value in headers.items()])
+
+    def cors_headers(self):
+        origin = self.headers.get('origin')
+        if not origin or not (cors_conf.CORS_ALLOW_ALL_ORIGINS or origin in cors_conf.CORS_ALLOWED_ORIGINS):
+            return {}
+        headers = {'Access-Control-Allow-Origin': origin, 'Access-Control-Expose-Headers': 'ETag'}
+        if cors_conf.CORS_ALLOW_CREDENTIALS:
+            headers['Access-Control-Allow-Credentials'] = 'true'
+        return headers
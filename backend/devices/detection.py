@@ -0,0 +1,431 @@
+"""
+Streaming emergency detection over recent samples of each device.
+
+Every device keeps, per metric, a fixed-size ring buffer of its latest
+(timestamp, value) samples (DETECTION_BUFFER_SIZE, numpy arrays). Rules
+are evaluated in O(1) per in-order sample (plus a binary search for the
+start of a rise window):
+
+    sustained  value above a threshold for at least window_seconds
+               (and min_samples samples), e.g. heart rate > 120 for 30 s
+    rise       value rising faster than threshold per minute across the
+               buffered window, e.g. temperature climbing 8 °C/min
+
+Samples are placed at the time the device took them (sampled_at, falling
+back to the ingest time), so a batch of buffered readings spans its real
+window. Workers may process a batch out of order: a late sample is inserted
+in time order unless it is older than every sample of a full buffer, and the
+sustained streak is rebuilt from the buffered samples around it.
+
+Each rule of each device is either normal or in alarm. A trigger is only
+emitted when a rule enters alarm, and the rule is reported as cleared when
+it leaves it (sustained rules clear with DETECTION_HYSTERESIS below the
+threshold), so a stream of bad samples raises one trigger, not one per
+sample.
+
+Detector state lives in Redis when REDIS_URL is set (shared by all
+workers, one short lock per device) and in process memory otherwise. Process
+memory only works while tasks run eagerly (no CELERY_BROKER_URL): worker
+processes could not share it, so detection on a worker without Redis fails
+loudly instead.
+"""
+import json
+import logging
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+
+class Rule:
+    """A windowed condition on one metric that raises one kind of trigger"""
+
+    def __init__(self, name, metric, trigger_type, kind, threshold, window_seconds=0, min_samples=1,
+                 severity='high', escalated_severity=None, escalate_above=None):
+        self.name = name
+        self.metric = metric
+        self.trigger_type = trigger_type
+        self.kind = kind
+        self.threshold = threshold
+        self.window_seconds = window_seconds
+        self.min_samples = min_samples
+        self.severity = severity
+        self.escalated_severity = escalated_severity
+        self.escalate_above = escalate_above
+
+    def severity_for(self, peak):
+        if self.escalate_above is not None and peak > self.escalate_above:
+            return self.escalated_severity
+        return self.severity
+
+
+def detection_rules():
+    return [
+        Rule('heart_rate_sustained', 'heart_rate', 'high_heart_rate', 'sustained', 120,
+             window_seconds=settings.DETECTION_HEART_RATE_WINDOW_SECONDS, min_samples=2,
+             severity='medium', escalated_severity='high', escalate_above=150),
+        Rule('temperature_sustained', 'temperature', 'fire_detected', 'sustained', 40,
+             window_seconds=settings.DETECTION_FIRE_WINDOW_SECONDS, min_samples=2,
+             severity='high', escalated_severity='critical', escalate_above=50),
+        Rule('temperature_rise', 'temperature', 'fire_detected', 'rise', settings.DETECTION_TEMPERATURE_RISE_PER_MINUTE,
+             window_seconds=settings.DETECTION_TEMPERATURE_RISE_WINDOW_SECONDS, min_samples=3,
+             severity='high'),
+        Rule('smoke_sustained', 'smoke_level', 'fire_detected', 'sustained', 2500,
+             window_seconds=settings.DETECTION_FIRE_WINDOW_SECONDS, min_samples=2,
+             severity='high', escalated_severity='critical', escalate_above=2900),
+        # Audio clips are analysed one at a time, each verdict already covers a window of sound
+        Rule('fear', 'fear_probability', 'fear_detected', 'sustained', 0.7,
+             severity='high', escalated_severity='critical', escalate_above=0.9),
+    ]
+
+
+class RingBuffer:
+    """Latest (timestamp, value) samples of one metric in time order, oldest overwritten first"""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.times = np.zeros(capacity, dtype=np.float64)
+        self.values = np.zeros(capacity, dtype=np.float64)
+        self.head = 0  # Position of the oldest sample
+        self.size = 0
+
+    def push(self, timestamp, value):
+        """
+        Add a sample in time order. Returns False for a sample older than
+        every sample of a full buffer, it could not change any window.
+        """
+        capacity = self.capacity
+        if self.size == capacity:
+            if timestamp < self.times[self.head]:
+                return False
+            self._evict()
+
+        # Late samples are rare and land near the end, shift the few newer ones up a slot
+        position = self.size
+        while position and self.times[(self.head + position - 1) % capacity] > timestamp:
+            source, target = (self.head + position - 1) % capacity, (self.head + position) % capacity
+            self.times[target] = self.times[source]
+            self.values[target] = self.values[source]
+            position -= 1
+        self.times[(self.head + position) % capacity] = timestamp
+        self.values[(self.head + position) % capacity] = value
+        self.size += 1
+        return True
+
+    def _evict(self):
+        self.head = (self.head + 1) % self.capacity
+        self.size -= 1
+
+    def at(self, index):
+        """The index-th sample counted from the oldest"""
+        position = (self.head + index) % self.capacity
+        return self.times[position], self.values[position]
+
+    def first_since(self, moment):
+        """Index of the oldest sample at or after moment (size when there is none)"""
+        low, high = 0, self.size
+        while low < high:
+            middle = (low + high) // 2
+            if self.times[(self.head + middle) % self.capacity] < moment:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def newest(self):
+        return self.at(self.size - 1)
+
+    def samples(self):
+        """(times, values) in time order"""
+        positions = (self.head + np.arange(self.size)) % self.capacity
+        return self.times[positions], self.values[positions]
+
+
+class DeviceDetector:
+    """Ring buffers and rule states of one device"""
+
+    def __init__(self, rules):
+        self.rules = rules
+        self.buffers = {rule.metric: RingBuffer(settings.DETECTION_BUFFER_SIZE) for rule in rules}
+        # Rule name -> {'alarm': bool, 'streak': [since, samples, last_seen, peak] or None}
+        self.states = {rule.name: {'alarm': False, 'streak': None} for rule in rules}
+
+    def observe(self, timestamp, values):
+        """
+        Feed one reading's metric values.
+
+        Returns:
+            (raised, cleared) - rules entering alarm as (rule, trigger value,
+            peak or rate), and rules leaving it
+        """
+        pushed = {}
+        for metric, value in values.items():
+            if metric in self.buffers and value is not None:
+                buffer = self.buffers[metric]
+                late = bool(buffer.size) and timestamp < buffer.newest()[0]
+                if buffer.push(timestamp, float(value)):
+                    pushed[metric] = late
+
+        raised, cleared = [], []
+        for rule in self.rules:
+            if rule.metric not in pushed:
+                continue
+            state = self.states[rule.name]
+            active, measure = self._evaluate(rule, state, late=pushed[rule.metric])
+
+            if active and not state['alarm']:
+                state['alarm'] = True
+                # Rise rules report the rate that tripped them, sustained rules the newest value
+                value = measure if rule.kind == 'rise' else float(self.buffers[rule.metric].newest()[1])
+                raised.append((rule, value, measure))
+            elif not active and state['alarm']:
+                state['alarm'] = False
+                cleared.append(rule)
+        return raised, cleared
+
+    def _evaluate(self, rule, state, late=False):
+        """(active, streak peak or rise per minute) after a sample was added to the rule's buffer"""
+        buffer = self.buffers[rule.metric]
+        timestamp, value = (float(item) for item in buffer.newest())
+        if rule.kind == 'rise':
+            # Oldest buffered sample inside the window
+            start = buffer.first_since(timestamp - rule.window_seconds)
+            if buffer.size - start < rule.min_samples:
+                return False, value
+            oldest_time, oldest_value = buffer.at(start)
+            if timestamp <= oldest_time:
+                return False, value
+            per_minute = float((value - oldest_value) / (timestamp - oldest_time) * 60)
+            return per_minute >= rule.threshold, per_minute
+
+        # Sustained: a streak of samples above the level, broken by a sample below it or a long gap
+        level = rule.threshold * (1 - settings.DETECTION_HYSTERESIS) if state['alarm'] else rule.threshold
+        if late:
+            streak = self._streak_from_buffer(buffer, state['streak'], level)
+        elif value <= level:
+            streak = None
+        else:
+            streak = state['streak']
+            if streak is None or timestamp - streak[2] > settings.DETECTION_MAX_GAP_SECONDS:
+                streak = [timestamp, 0, timestamp, value]
+            streak[1] += 1
+            streak[2] = timestamp
+            streak[3] = max(streak[3], value)
+
+        state['streak'] = streak
+        if streak is None:
+            return False, value
+        return streak[1] >= rule.min_samples and timestamp - streak[0] >= rule.window_seconds, streak[3]
+
+    @staticmethod
+    def _streak_from_buffer(buffer, previous, level):
+        """
+        Rebuild the streak from the buffered samples after a late sample was
+        inserted somewhere inside it. A streak that reaches the oldest buffered
+        sample may have started earlier, that part is taken from the previous streak.
+        """
+        times, values = buffer.samples()
+        start = len(times)
+        while start and values[start - 1] > level and (
+            start == len(times) or times[start] - times[start - 1] <= settings.DETECTION_MAX_GAP_SECONDS
+        ):
+            start -= 1
+        if start == len(times):
+            return None
+
+        streak = [float(times[start]), len(times) - start, float(times[-1]), float(values[start:].max())]
+        if start == 0 and previous is not None and previous[0] < streak[0]:
+            streak = [previous[0], previous[1] + 1, streak[2], max(previous[3], streak[3])]
+        return streak
+
+    def to_bytes(self):
+        header = {
+            'buffers': {metric: [buffer.head, buffer.size] for metric, buffer in self.buffers.items()},
+            'states': self.states,
+        }
+        arrays = b''.join(
+            buffer.times.tobytes() + buffer.values.tobytes() for _, buffer in sorted(self.buffers.items())
+        )
+        return json.dumps(header).encode() + b'\n' + arrays
+
+    @classmethod
+    def from_bytes(cls, rules, data):
+        detector = cls(rules)
+        header_bytes, arrays = data.split(b'\n', 1)
+        header = json.loads(header_bytes)
+        # Rules or buffer sizes changed since the state was saved: start over
+        if set(header['buffers']) != set(detector.buffers) or set(header['states']) != set(detector.states):
+            return detector
+        expected = sum(buffer.capacity * 16 for buffer in detector.buffers.values())
+        if len(arrays) != expected:
+            return detector
+
+        offset = 0
+        for metric, buffer in sorted(detector.buffers.items()):
+            length = buffer.capacity * 8
+            buffer.times = np.frombuffer(arrays, dtype=np.float64, count=buffer.capacity, offset=offset).copy()
+            buffer.values = np.frombuffer(arrays, dtype=np.float64, count=buffer.capacity, offset=offset + length).copy()
+            buffer.head, buffer.size = header['buffers'][metric]
+            offset += 2 * length
+        detector.states = header['states']
+        return detector
+
+
+def save_on_commit(save, release):
+    """
+    Run save() and then release() once the current transaction commits.
+
+    A detector update must only stick when the triggers it raised commit,
+    otherwise a redelivered reading meets a rule that is already in alarm and
+    no trigger is ever created. Callers call discard_uncommitted() when their
+    transaction rolls back; a worker that dies leaves the Redis lock to expire.
+    """
+    pending = _pending_releases()
+    pending.append(release)
+
+    def commit():
+        pending.remove(release)
+        try:
+            save()
+        finally:
+            release()
+
+    transaction.on_commit(commit)
+
+
+def discard_uncommitted():
+    """Drop detector updates of a rolled back transaction and free their locks"""
+    pending = _pending_releases()
+    while pending:
+        pending.pop()()
+
+
+_uncommitted = threading.local()
+
+
+def _pending_releases():
+    if not hasattr(_uncommitted, 'releases'):
+        _uncommitted.releases = []
+    return _uncommitted.releases
+
+
+class MemoryDetectorStore:
+    """Per-process detector states, kept serialized so uncommitted updates can be dropped"""
+
+    def __init__(self):
+        self._states = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def detector(self, device_id, rules):
+        with self._lock:
+            data = self._states.get(device_id)
+        detector = DeviceDetector.from_bytes(rules, data) if data else DeviceDetector(rules)
+        yield detector
+
+        state = detector.to_bytes()
+
+        def save():
+            with self._lock:
+                self._states[device_id] = state
+
+        save_on_commit(save, lambda: None)
+
+
+class RedisDetectorStore:
+    """
+    Shared detector states, one key per device. The per-device lock is held
+    until the transaction that used the detector commits or is discarded.
+    """
+
+    KEY = 'device_detector:{}'
+
+    def __init__(self, url):
+        import redis
+        self.client = redis.Redis.from_url(url)
+
+    @contextmanager
+    def detector(self, device_id, rules):
+        from redis.exceptions import LockError
+
+        key = self.KEY.format(device_id)
+        lock = self.client.lock(f'{key}:lock', timeout=10, blocking_timeout=10)
+        if not lock.acquire():
+            raise LockError(f'Could not lock the detector of device {device_id}')
+
+        def release():
+            try:
+                lock.release()
+            except LockError:
+                # Held past its timeout, another worker may own it now
+                pass
+
+        try:
+            data = self.client.get(key)
+            detector = DeviceDetector.from_bytes(rules, data) if data else DeviceDetector(rules)
+            yield detector
+        except BaseException:
+            release()
+            raise
+
+        state = detector.to_bytes()
+        save_on_commit(lambda: self.client.set(key, state, ex=settings.DETECTION_STATE_TTL), release)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    if not settings.REDIS_URL:
+        from celery import current_task
+
+        # A worker process only ever sees some of a device's readings
+        if current_task and not current_task.request.is_eager:
+            raise ImproperlyConfigured('Emergency detection on Celery workers needs a shared store, set REDIS_URL')
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = RedisDetectorStore(settings.REDIS_URL) if settings.REDIS_URL else MemoryDetectorStore()
+    return _store
+
+
+def detect(reading):
+    """
+    Run a stored reading through its device's detector.
+
+    Returns:
+        (triggers, cleared) - trigger data for rules that just entered alarm,
+        and the rules that just left it
+    """
+    values = {
+        'heart_rate': reading.heart_rate,
+        'temperature': reading.temperature,
+        'smoke_level': reading.smoke_level,
+        'fear_probability': reading.fear_probability,
+    }
+    if all(value is None for value in values.values()):
+        return [], []
+
+    # The device's sample time, the ingest time is shared by a whole batch
+    sampled_at = reading.sampled_at or reading.timestamp
+    with get_store().detector(str(reading.device_id), detection_rules()) as detector:
+        raised, cleared = detector.observe(sampled_at.timestamp(), values)
+
+    triggers = [
+        {
+            'rule': rule.name,
+            'trigger_type': rule.trigger_type,
+            'severity': rule.severity_for(peak),
+            'trigger_value': value,
+            'threshold_value': rule.threshold,
+        }
+        for rule, value, peak in raised
+    ]
+    return triggers, cleared
@@ -0,0 +1,323 @@
+"""
+Latest-values snapshot of every device.
+
+One record per device holds the most recent non-null value of each sensor
+field across reading types (what the mobile app used to rebuild from the
+last 50 rows of device_readings every second), plus the id, type and time
+of the newest reading. Ingest merges each reading into the snapshot, so
+serving it never touches the readings table.
+
+Every change bumps the snapshot's version, which clients send back to
+long-poll for the next change. Waiting is async (wait_for_latest), so a
+long-poll never holds the thread Django runs sync views on. The store lives
+in Redis when REDIS_URL is set (shared by web processes and workers, changes
+announced over pub/sub) and in process memory otherwise, which only suits a
+single web process with eager Celery tasks.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.dateparse import parse_datetime
+
+logger = logging.getLogger(__name__)
+
+# Snapshot field -> parser for values read back from Redis
+SENSOR_FIELDS = {
+    'heart_rate': int,
+    'temperature': float,
+    'smoke_level': float,
+    'battery_level': int,
+    'latitude': Decimal,
+    'longitude': Decimal,
+    'fear_probability': float,
+    'stress_level': float,
+    'audio_analysis_complete': bool,
+}
+READING_FIELDS = {
+    'reading_id': str,
+    'reading_type': str,
+    'timestamp': parse_datetime,
+}
+SNAPSHOT_FIELDS = {**SENSOR_FIELDS, **READING_FIELDS}
+
+
+def next_version(previous=0):
+    """Microsecond clock, bumped past the previous version so versions always grow"""
+    return max(int(time.time() * 1_000_000), previous + 1)
+
+
+class MemoryLatestStore:
+    """Per-process snapshots; waiters are woken as soon as a snapshot changes"""
+
+    def __init__(self):
+        self._snapshots = {}
+        self._lock = threading.Lock()
+        # Device id -> {(event loop, asyncio.Event)} of the requests waiting on it
+        self._waiters = {}
+
+    def merge(self, device_id, values, version=None, create=True):
+        with self._lock:
+            current = self._snapshots.get(device_id)
+            if current is None:
+                if not create:
+                    return None
+                current = {'version': 0}
+            snapshot = {**current, **values}
+            snapshot['version'] = version or next_version(current['version'])
+            self._snapshots[device_id] = snapshot
+            # Merges come from sync code on other threads, events are set on their own loop
+            for loop, event in self._waiters.get(device_id, ()):
+                loop.call_soon_threadsafe(event.set)
+            return dict(snapshot)
+
+    def get(self, device_id):
+        snapshot = self._snapshots.get(device_id)
+        return dict(snapshot) if snapshot is not None else None
+
+    async def wait(self, device_id, since, timeout):
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self._lock:
+            snapshot = self._snapshots.get(device_id)
+            if snapshot is not None and snapshot['version'] != since:
+                return dict(snapshot)
+            self._waiters.setdefault(device_id, set()).add(waiter)
+        try:
+            await asyncio.wait_for(waiter[1].wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._lock:
+                waiters = self._waiters.get(device_id)
+                waiters.discard(waiter)
+                if not waiters:
+                    del self._waiters[device_id]
+        return self.get(device_id)
+
+    def discard(self, device_id):
+        with self._lock:
+            self._snapshots.pop(device_id, None)
+
+
+class RedisLatestStore:
+    """Shared snapshots: one hash per device, every change published on the device's channel"""
+
+    KEY = 'device_latest:{}'
+    CHANNEL = 'device_latest_changed:{}'
+
+    def __init__(self, url):
+        import redis
+        self.url = url
+        self.client = redis.Redis.from_url(url)
+
+    def merge(self, device_id, values, version=None, create=True):
+        key = self.KEY.format(device_id)
+        if version is None:
+            previous = self.client.hget(key, 'version')
+            if previous is None and not create:
+                return None
+            version = next_version(int(previous) if previous else 0)
+
+        mapping = {field: json.dumps(value, cls=DjangoJSONEncoder) for field, value in values.items()}
+        mapping['version'] = version
+        pipeline = self.client.pipeline(transaction=True)
+        pipeline.hset(key, mapping=mapping)
+        # Idle devices drop out; the next request rebuilds them from the readings table
+        pipeline.expire(key, 24 * 3600)
+        pipeline.publish(self.CHANNEL.format(device_id), version)
+        pipeline.execute()
+        return self.get(device_id)
+
+    def get(self, device_id):
+        raw = self.client.hgetall(self.KEY.format(device_id))
+        return self._decode(raw) if raw else None
+
+    async def wait(self, device_id, since, timeout):
+        import redis.asyncio
+
+        key = self.KEY.format(device_id)
+        deadline = time.monotonic() + timeout
+        # A client per wait: pub/sub holds its connection, and under WSGI every request has its own event loop
+        client = redis.asyncio.Redis.from_url(self.url)
+        pubsub = client.pubsub()
+        try:
+            # Subscribed before the version check, so a change in between is not missed
+            await pubsub.subscribe(self.CHANNEL.format(device_id))
+            while True:
+                version = await client.hget(key, 'version')
+                if version is not None and int(version) != since:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                await pubsub.get_message(ignore_subscribe_messages=True, timeout=remaining)
+            raw = await client.hgetall(key)
+            return self._decode(raw) if raw else None
+        finally:
+            await pubsub.aclose()
+            await client.aclose()
+
+    def discard(self, device_id):
+        self.client.delete(self.KEY.format(device_id))
+
+    @staticmethod
+    def _decode(raw):
+        snapshot = {}
+        for field, value in raw.items():
+            field = field.decode()
+            if field == 'version':
+                snapshot['version'] = int(value)
+                continue
+            value = json.loads(value)
+            parser = SNAPSHOT_FIELDS.get(field)
+            if parser is not None and value is not None:
+                snapshot[field] = parser(str(value)) if parser in (Decimal, parse_datetime) else parser(value)
+        return snapshot
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = RedisLatestStore(settings.REDIS_URL) if settings.REDIS_URL else MemoryLatestStore()
+    return _store
+
+
+def reading_values(reading):
+    """Snapshot fields a reading contributes: its identity and every non-null sensor value"""
+    values = {
+        'reading_id': str(reading.reading_id),
+        'reading_type': reading.reading_type,
+        'timestamp': reading.timestamp,
+    }
+    for field in SENSOR_FIELDS:
+        value = getattr(reading, field)
+        # audio_analysis_complete defaults to False on every reading, only audio results count
+        if value is not None and (field != 'audio_analysis_complete' or reading.reading_type == 'audio'):
+            values[field] = value
+    return values
+
+
+def record_readings(device_id, readings):
+    """
+    Merge newly stored readings (oldest first) into the device's snapshot once committed.
+
+    Only snapshots already in the store are updated. A device nobody has
+    asked for yet gets its snapshot built from the readings table on the
+    first request, which covers fields older than these readings too.
+    """
+    values = {}
+    for reading in readings:
+        values.update(reading_values(reading))
+    if not values:
+        return
+
+    def merge():
+        try:
+            get_store().merge(device_id, values, create=False)
+        except Exception as e:
+            # The snapshot is rebuilt from the readings table when the store is back
+            logger.error(f"Latest-values store unavailable, skipping device {device_id}: {e}")
+
+    # Readings rolled back with their batch never show up
+    transaction.on_commit(merge)
+
+
+def record_analysis(reading):
+    """Merge audio analysis results, finished after the reading itself was recorded"""
+    values = {
+        field: getattr(reading, field)
+        for field in ('fear_probability', 'stress_level', 'audio_analysis_complete')
+        if getattr(reading, field) is not None
+    }
+    try:
+        get_store().merge(reading.device_id, values, create=False)
+    except Exception as e:
+        logger.error(f"Latest-values store unavailable, skipping device {reading.device_id}: {e}")
+
+
+def build_snapshot(device_id):
+    """
+    Snapshot of a device rebuilt from its most recent readings.
+
+    Returns:
+        Snapshot dict, or None for an unknown device
+    """
+    from .models import Device, DeviceReading
+
+    readings = list(
+        DeviceReading.objects.filter(device_id=device_id)
+        .order_by('-timestamp', '-reading_id')[:settings.DEVICE_LATEST_BACKFILL_READINGS]
+    )
+    if not readings and not Device.objects.filter(device_id=device_id).exists():
+        return None
+
+    snapshot = {}
+    for reading in reversed(readings):
+        snapshot.update(reading_values(reading))
+    # Derive the version from the newest reading, so every process rebuilds the same one
+    snapshot['version'] = int(readings[0].timestamp.timestamp() * 1_000_000) if readings else 1
+    return snapshot
+
+
+def get_latest(device_id):
+    """
+    Latest-values snapshot of a device.
+
+    Returns:
+        Snapshot dict with a version key, or None for an unknown device
+    """
+    store = get_store()
+    try:
+        snapshot = store.get(device_id)
+        if snapshot is None:
+            snapshot = build_snapshot(device_id)
+            if snapshot is None:
+                return None
+            # Stored even without readings, so the device's first upload wakes waiters
+            version = snapshot.pop('version')
+            snapshot = store.merge(device_id, snapshot, version=version)
+        return snapshot
+    except Exception as e:
+        logger.error(f"Latest-values store unavailable, rebuilding device {device_id} from readings: {e}")
+        return build_snapshot(device_id)
+
+
+async def wait_for_latest(device_id, since, timeout):
+    """
+    Wait (without blocking a thread) until a device's snapshot moves past the
+    version `since`, or until timeout seconds have passed.
+
+    Returns:
+        The snapshot at that point, or None when the store is unavailable
+    """
+    try:
+        return await get_store().wait(device_id, since, timeout)
+    except Exception as e:
+        logger.error(f"Latest-values store unavailable, not waiting on device {device_id}: {e}")
+        return None
+
+
+def snapshot_payload(device_id, snapshot):
+    """API representation: every snapshot field, null until the device has reported it"""
+    payload = {'device_id': str(device_id), 'version': snapshot['version']}
+    payload.update({field: snapshot.get(field) for field in SNAPSHOT_FIELDS})
+    return payload
+
+
+def discard_latest(device_id):
+    try:
+        get_store().discard(device_id)
+    except Exception as e:
+        logger.error(f"Could not drop latest values of device {device_id}: {e}")
@@ -0,0 +1,33 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from devices.archive import ArchiveNotConfigured, archive_readings
+
+
+class Command(BaseCommand):
+    help = 'Export readings older than the archive window to Parquet files and delete them from device_readings'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than-days', type=int, default=None,
+            help='Archive window in days (defaults to DEVICE_READING_ARCHIVE_AFTER_DAYS)'
+        )
+        parser.add_argument('--max-days', type=int, default=None, help='Stop after archiving this many days')
+
+    def handle(self, *args, **options):
+        days = options['older_than_days']
+        if days is None:
+            days = settings.DEVICE_READING_ARCHIVE_AFTER_DAYS
+
+        try:
+            archived = archive_readings(before=timezone.now() - timedelta(days=days), max_days=options['max_days'])
+        except ArchiveNotConfigured as e:
+            raise CommandError(str(e))
+
+        for day, count in archived.items():
+            self.stdout.write(f'{day}: {count} reading(s)')
+        self.stdout.write(self.style.SUCCESS(
+            f'Archived {sum(archived.values())} reading(s) from {len(archived)} day(s)'
+        ))
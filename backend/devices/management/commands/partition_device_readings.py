@@ -0,0 +1,87 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from devices.partitions import DEFAULT_PARTITION, TABLE, ensure_partitions, is_partitioned
+
+
+class Command(BaseCommand):
+    help = (
+        'Convert device_readings into a table range-partitioned by timestamp (PostgreSQL). '
+        'Copies every reading inside one transaction that locks the table, so run it in a maintenance window.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be converted')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Partitioning needs PostgreSQL')
+
+        if is_partitioned():
+            with transaction.atomic(), connection.cursor() as cursor:
+                created = ensure_partitions(cursor, timezone.now())
+            self.stdout.write(self.style.SUCCESS(
+                f'{TABLE} is already partitioned, created {len(created)} upcoming partition(s)'
+            ))
+            return
+
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT COUNT(*), MIN("timestamp") FROM "{TABLE}"')
+            count, oldest = cursor.fetchone()
+
+        if options['dry_run']:
+            self.stdout.write(f'Would partition {TABLE} with {count} reading(s), oldest {oldest or "none"}')
+            return
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f'LOCK TABLE "{TABLE}" IN ACCESS EXCLUSIVE MODE')
+
+            # Everything recreated on the partitioned table afterwards
+            cursor.execute(
+                "SELECT conname FROM pg_constraint WHERE conrelid = to_regclass(%s) AND contype = 'p'", [TABLE]
+            )
+            primary_key = cursor.fetchone()[0]
+            cursor.execute(
+                "SELECT indexdef FROM pg_indexes WHERE schemaname = current_schema() "
+                "AND tablename = %s AND indexname <> %s",
+                [TABLE, primary_key]
+            )
+            index_definitions = [row[0] for row in cursor.fetchall()]
+            cursor.execute(
+                "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+                "WHERE conrelid = to_regclass(%s) AND contype = 'f'",
+                [TABLE]
+            )
+            foreign_keys = cursor.fetchall()
+
+            # Unique constraints must include the partition key, so nothing can reference readings any more
+            cursor.execute(
+                "SELECT conrelid::regclass::text, conname FROM pg_constraint "
+                "WHERE confrelid = to_regclass(%s) AND contype = 'f'",
+                [TABLE]
+            )
+            for referencing_table, constraint in cursor.fetchall():
+                cursor.execute(f'ALTER TABLE {referencing_table} DROP CONSTRAINT "{constraint}"')
+
+            old_table = f'{TABLE}_unpartitioned'
+            cursor.execute(f'ALTER TABLE "{TABLE}" RENAME TO "{old_table}"')
+            cursor.execute(
+                f'CREATE TABLE "{TABLE}" (LIKE "{old_table}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS) '
+                f'PARTITION BY RANGE ("timestamp")'
+            )
+            cursor.execute(f'CREATE TABLE "{DEFAULT_PARTITION}" PARTITION OF "{TABLE}" DEFAULT')
+            created = ensure_partitions(cursor, oldest or timezone.now())
+
+            # Copy first and index afterwards, building indexes once is cheaper than maintaining them per row
+            cursor.execute(f'INSERT INTO "{TABLE}" SELECT * FROM "{old_table}"')
+            cursor.execute(f'DROP TABLE "{old_table}"')
+
+            cursor.execute(f'ALTER TABLE "{TABLE}" ADD CONSTRAINT "{primary_key}" PRIMARY KEY (reading_id, "timestamp")')
+            for definition in index_definitions:
+                cursor.execute(definition)
+            for constraint, definition in foreign_keys:
+                cursor.execute(f'ALTER TABLE "{TABLE}" ADD CONSTRAINT "{constraint}" {definition}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Partitioned {TABLE}: {count} reading(s) across {len(created)} partition(s) plus {DEFAULT_PARTITION}'
+        ))
@@ -0,0 +1,27 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from devices.models import RollupCheckpoint
+from devices.rollups import floor_bucket, roll_up
+
+
+class Command(BaseCommand):
+    help = 'Roll device readings up into minute and hour vitals rollups until caught up (backfills included)'
+
+    def handle(self, *args, **options):
+        minute_total = hour_total = 0
+        cutoff = floor_bucket(timezone.now() - timedelta(seconds=settings.DEVICE_ROLLUP_SETTLE_SECONDS), 'minute')
+
+        # Each run covers a bounded stretch of readings, repeat until the checkpoint reaches now
+        while True:
+            minute_rows, hour_rows, _ = roll_up()
+            minute_total += minute_rows
+            hour_total += hour_rows
+            if RollupCheckpoint.objects.get(resolution='minute').position >= cutoff:
+                break
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {minute_total} minute and {hour_total} hour rollup row(s)'
+        ))
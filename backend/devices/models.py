@@ -73,7 +73,7 @@ class Device(models.Model):
         if not self.last_heartbeat:
             return False
         from django.utils import timezone
-        return (timezone.now() - self.last_heartbeat).seconds < 600  # 10 minutes
+        return (timezone.now() - self.last_heartbeat).total_seconds() < 600  # 10 minutes
     
     @property
     def registered_by(self):
@@ -86,8 +86,19 @@ class Device(models.Model):
                 return None
         return None
 
+class DeviceReadingQuerySet(models.QuerySet):
+    def between(self, start=None, end=None):
+        """Readings in [start, end); on a partitioned table only the partitions covering the range are scanned"""
+        queryset = self
+        if start is not None:
+            queryset = queryset.filter(timestamp__gte=start)
+        if end is not None:
+            queryset = queryset.filter(timestamp__lt=end)
+        return queryset
+
+
 class DeviceReading(models.Model):
-    """Sensor readings from devices"""
+    """Sensor readings from devices (range-partitioned by timestamp on PostgreSQL, see devices.partitions)"""
     READING_TYPE_CHOICES = [
         ('audio', 'Audio Analysis'),
         ('heart_rate', 'Heart Rate'),
@@ -101,6 +112,7 @@ class DeviceReading(models.Model):
     device = models.ForeignKey(Device, on_delete=models.CASCADE, related_name='readings')
     reading_type = models.CharField(max_length=20, choices=READING_TYPE_CHOICES)
     timestamp = models.DateTimeField(auto_now_add=True)
+    sampled_at = models.DateTimeField(null=True, blank=True, help_text="When the device took the sample (device clock)")
     
     # Sensor Data
     heart_rate = models.IntegerField(null=True, blank=True)
@@ -121,15 +133,18 @@ class DeviceReading(models.Model):
     # Emergency detection
     is_emergency = models.BooleanField(default=False)
     triggered_by = models.CharField(max_length=100, blank=True)
+    emergency_processed = models.BooleanField(default=False, help_text="Emergency processing already ran for this reading")
     
     # Raw sensor data (JSON)
     raw_data = models.JSONField(default=dict, blank=True)
+
+    objects = DeviceReadingQuerySet.as_manager()
     
     class Meta:
         db_table = 'device_readings'
         ordering = ['-timestamp']
         indexes = [
-            models.Index(fields=['device', '-timestamp']),
+            models.Index(fields=['device', '-timestamp', '-reading_id'], name='reading_device_keyset_idx'),
             models.Index(fields=['reading_type', '-timestamp']),
             models.Index(fields=['is_emergency', '-timestamp']),
         ]
@@ -137,6 +152,65 @@ class DeviceReading(models.Model):
     def __str__(self):
         return f"{self.device.serial_number} - {self.reading_type} at {self.timestamp}"
 
+class DeviceVitalsRollup(models.Model):
+    """
+    Heart rate, temperature and smoke statistics of one device over one
+    minute or one hour.
+
+    Built from device_readings by a periodic job (see devices.rollups), so
+    trend charts read one row per bucket instead of every reading. Sums are
+    stored rather than averages so hours can be built from minutes exactly.
+    """
+    RESOLUTION_CHOICES = [
+        ('minute', 'Per Minute'),
+        ('hour', 'Per Hour'),
+    ]
+
+    device = models.ForeignKey(Device, on_delete=models.CASCADE, related_name='vitals_rollups', db_index=False)
+    resolution = models.CharField(max_length=10, choices=RESOLUTION_CHOICES)
+    bucket = models.DateTimeField(help_text="Start of the minute or hour (UTC)")
+
+    heart_rate_count = models.IntegerField(default=0)
+    heart_rate_sum = models.FloatField(default=0)
+    heart_rate_min = models.FloatField(null=True, blank=True)
+    heart_rate_max = models.FloatField(null=True, blank=True)
+
+    temperature_count = models.IntegerField(default=0)
+    temperature_sum = models.FloatField(default=0)
+    temperature_min = models.FloatField(null=True, blank=True)
+    temperature_max = models.FloatField(null=True, blank=True)
+
+    smoke_level_count = models.IntegerField(default=0)
+    smoke_level_sum = models.FloatField(default=0)
+    smoke_level_min = models.FloatField(null=True, blank=True)
+    smoke_level_max = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'device_vitals_rollups'
+        constraints = [
+            # Also the index trend queries read: device, resolution, bucket range
+            models.UniqueConstraint(fields=['device', 'resolution', 'bucket'], name='vitals_rollup_bucket_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['resolution', 'bucket'], name='vitals_rollup_retention_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.device_id} {self.resolution} {self.bucket}"
+
+
+class RollupCheckpoint(models.Model):
+    """How far a rollup resolution has been computed; buckets before position are final"""
+    resolution = models.CharField(max_length=10, primary_key=True)
+    position = models.DateTimeField()
+
+    class Meta:
+        db_table = 'device_rollup_checkpoints'
+
+    def __str__(self):
+        return f"{self.resolution} rollups until {self.position}"
+
+
 class EmergencyTrigger(models.Model):
     """Emergency situations detected by devices"""
     TRIGGER_TYPE_CHOICES = [
@@ -161,9 +235,11 @@ class EmergencyTrigger(models.Model):
     severity = models.CharField(max_length=10, choices=SEVERITY_CHOICES)
     
     # Trigger Data
-    reading = models.ForeignKey(DeviceReading, on_delete=models.CASCADE, null=True, blank=True)
+    # No database constraint: partitioned readings have no unique key on reading_id alone
+    reading = models.ForeignKey(DeviceReading, on_delete=models.CASCADE, null=True, blank=True, db_constraint=False)
     trigger_value = models.FloatField(help_text="The value that triggered the alert")
     threshold_value = models.FloatField(help_text="The threshold that was exceeded")
+    rule = models.CharField(max_length=50, blank=True, help_text="Detection rule that raised the trigger")
     
     # Location at time of trigger
     latitude = models.DecimalField(max_digits=10, decimal_places=8, null=True, blank=True)
@@ -182,6 +258,12 @@ class EmergencyTrigger(models.Model):
     class Meta:
         db_table = 'emergency_triggers'
         ordering = ['-triggered_at']
+        indexes = [
+            # Keyset pagination order
+            models.Index(fields=['-triggered_at', '-trigger_id'], name='trigger_keyset_idx'),
+            # Open triggers of a rule, resolved when the rule clears
+            models.Index(fields=['device', 'rule', 'resolved_at'], name='trigger_open_rule_idx'),
+        ]
     
     def __str__(self):
         return f"{self.device.owner_name} - {self.get_trigger_type_display()} ({self.severity})"
@@ -0,0 +1,194 @@
+"""
+Range partitioning of device_readings by timestamp (PostgreSQL only).
+
+partition_device_readings converts the plain table into a partitioned one:
+one partition per day or month (DEVICE_READING_PARTITION_INTERVAL) plus a
+default partition that catches anything outside the created ranges. The
+primary key becomes (reading_id, timestamp), as PostgreSQL requires the
+partition key in every unique constraint, so foreign keys can no longer
+point at readings (EmergencyTrigger.reading has no database constraint).
+
+Afterwards maintain_partitions, run by Celery beat every few hours and after
+every migrate, creates partitions ahead of time and drops whole partitions past
+DEVICE_READING_RETENTION_DAYS instead of deleting rows. When readings are
+archived (devices.archive), only partitions the archive has emptied are dropped.
+Readings referenced by an emergency trigger outlive their partition in the
+default partition.
+"""
+import logging
+import re
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+logger = logging.getLogger(__name__)
+
+TABLE = 'device_readings'
+DEFAULT_PARTITION = f'{TABLE}_default'
+
+# EmergencyTrigger.reading has no database constraint, retention must not strand triggers
+REFERENCED_READINGS_SQL = 'SELECT "reading_id" FROM "emergency_triggers" WHERE "reading_id" IS NOT NULL'
+
+_BOUNDS = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+
+def period_start(moment, interval=None):
+    """Start (UTC midnight) of the day or month containing a moment"""
+    interval = interval or settings.DEVICE_READING_PARTITION_INTERVAL
+    moment = moment.astimezone(dt_timezone.utc)
+    return datetime(moment.year, moment.month, moment.day if interval == 'day' else 1, tzinfo=dt_timezone.utc)
+
+
+def next_period(start, interval=None):
+    interval = interval or settings.DEVICE_READING_PARTITION_INTERVAL
+    if interval == 'day':
+        return start + timedelta(days=1)
+    return (start + timedelta(days=32)).replace(day=1)
+
+
+def partition_name(start, interval=None):
+    interval = interval or settings.DEVICE_READING_PARTITION_INTERVAL
+    return f"{TABLE}_p{start.strftime('%Y%m%d' if interval == 'day' else '%Y%m')}"
+
+
+def is_partitioned(using='default'):
+    """Whether device_readings is a partitioned table on this database"""
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return False
+
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [TABLE])
+        row = cursor.fetchone()
+    return bool(row) and row[0] == 'p'
+
+
+def list_partitions(cursor):
+    """[(name, start, end)] of the range partitions, oldest first (the default partition is left out)"""
+    cursor.execute(
+        "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) "
+        "FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass(%s)",
+        [TABLE]
+    )
+    partitions = []
+    for name, bound in cursor.fetchall():
+        match = _BOUNDS.search(bound or '')
+        if match:
+            partitions.append((name, parse_datetime(match.group(1)), parse_datetime(match.group(2))))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+def create_partition(cursor, start, end, name):
+    """
+    Attach a partition for [start, end).
+
+    Rows that already landed in the default partition for that range are
+    moved into the new partition first, otherwise the attach would fail.
+    """
+    cursor.execute(f'CREATE TABLE "{name}" (LIKE "{TABLE}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+    cursor.execute(
+        f'WITH moved AS (DELETE FROM "{DEFAULT_PARTITION}" WHERE "timestamp" >= %s AND "timestamp" < %s RETURNING *) '
+        f'INSERT INTO "{name}" SELECT * FROM moved',
+        [start, end]
+    )
+    cursor.execute(f'ALTER TABLE "{TABLE}" ATTACH PARTITION "{name}" FOR VALUES FROM (%s) TO (%s)', [start, end])
+
+
+def ensure_partitions(cursor, first_start, ahead=None):
+    """
+    Create any missing partitions from the period of first_start up to
+    `ahead` periods after the current one.
+
+    Returns:
+        Names of the partitions created
+    """
+    ahead = settings.DEVICE_READING_PARTITIONS_AHEAD if ahead is None else ahead
+    existing = list_partitions(cursor)
+
+    last_start = period_start(timezone.now())
+    for _ in range(ahead):
+        last_start = next_period(last_start)
+
+    created = []
+    start = period_start(first_start)
+    while start <= last_start:
+        end = next_period(start)
+        # Ranges left by an earlier interval setting stay as they are
+        if not any(start < existing_end and existing_start < end for _, existing_start, existing_end in existing):
+            name = partition_name(start)
+            create_partition(cursor, start, end, name)
+            created.append(name)
+        start = end
+    return created
+
+
+def drop_partitions_before(cursor, cutoff):
+    """
+    Drop every partition whose whole range is older than cutoff.
+
+    Readings an emergency trigger points at are kept: the partition is
+    detached and those rows are re-inserted, which routes them to the
+    default partition, before the rest is dropped.
+
+    Returns:
+        Names of the partitions dropped
+    """
+    dropped = []
+    for name, _, end in list_partitions(cursor):
+        if end > cutoff:
+            continue
+        if settings.DEVICE_READING_ARCHIVE_URI:
+            # With archiving on, only partitions the archive job has emptied go
+            # (it leaves trigger-referenced readings in place)
+            cursor.execute(
+                f'SELECT EXISTS (SELECT 1 FROM "{name}" WHERE "reading_id" NOT IN ({REFERENCED_READINGS_SQL}))'
+            )
+            if cursor.fetchone()[0]:
+                continue
+        cursor.execute(f'ALTER TABLE "{TABLE}" DETACH PARTITION "{name}"')
+        cursor.execute(
+            f'INSERT INTO "{TABLE}" SELECT * FROM "{name}" WHERE "reading_id" IN ({REFERENCED_READINGS_SQL})'
+        )
+        cursor.execute(f'DROP TABLE "{name}"')
+        dropped.append(name)
+
+    # Stray old rows in the default partition go too (the archive job handles them when enabled)
+    if not settings.DEVICE_READING_ARCHIVE_URI:
+        cursor.execute(
+            f'DELETE FROM "{DEFAULT_PARTITION}" WHERE "timestamp" < %s AND "reading_id" NOT IN ({REFERENCED_READINGS_SQL})',
+            [cutoff]
+        )
+    return dropped
+
+
+def maintain_partitions(using='default', retention=True):
+    """
+    Create upcoming partitions and apply the retention window.
+
+    Returns:
+        (created, dropped) partition names; nothing happens until the table
+        has been converted with partition_device_readings
+    """
+    if not is_partitioned(using):
+        return [], []
+
+    with transaction.atomic(using=using), connections[using].cursor() as cursor:
+        created = ensure_partitions(cursor, timezone.now())
+
+        dropped = []
+        if retention and settings.DEVICE_READING_RETENTION_DAYS:
+            cutoff = timezone.now() - timedelta(days=settings.DEVICE_READING_RETENTION_DAYS)
+            dropped = drop_partitions_before(cursor, cutoff)
+
+    if created or dropped:
+        logger.info(f"Reading partitions created: {created or 'none'}, dropped: {dropped or 'none'}")
+    return created, dropped
+
+
+def install_partitions(sender, using='default', **kwargs):
+    """post_migrate hook: create upcoming partitions on partitioned databases (retention is left to beat)"""
+    maintain_partitions(using, retention=False)
@@ -0,0 +1,227 @@
+"""
+Per-minute and per-hour rollups of device vitals.
+
+A Celery beat job turns finished minutes of device_readings into
+DeviceVitalsRollup rows (count, sum, min and max of heart rate, temperature
+and smoke level per device), then finished hours of minute rows into hour
+rows. A RollupCheckpoint per resolution records how far that has got, and
+buckets are only rolled up once DEVICE_ROLLUP_SETTLE_SECONDS have passed,
+so every stored bucket is final and re-running a range simply rewrites it.
+
+Readings are bucketed by when the device took them (sampled_at, falling back
+to the ingest time), so a batch upload lands in the minutes it covers. The
+settle window is how late a sample may arrive and still be rolled up; later
+ones stay in the raw readings only.
+
+Trend queries read stored buckets up to the checkpoint and aggregate the
+few newer readings on the fly.
+"""
+import logging
+from datetime import timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, FloatField, Max, Min, Q, Sum
+from django.db.models.functions import Coalesce, Trunc
+from django.utils import timezone
+
+from .models import DeviceReading, DeviceVitalsRollup, RollupCheckpoint
+
+logger = logging.getLogger(__name__)
+
+METRICS = ['heart_rate', 'temperature', 'smoke_level']
+STAT_FIELDS = [f'{metric}_{stat}' for metric in METRICS for stat in ('count', 'sum', 'min', 'max')]
+RESOLUTIONS = {
+    'minute': timedelta(minutes=1),
+    'hour': timedelta(hours=1),
+}
+
+# Longest stretch of unfinished buckets a trend query aggregates from raw readings
+LIVE_TAIL = timedelta(hours=3)
+
+
+def floor_bucket(moment, resolution):
+    """Start of the minute or hour containing a moment (UTC)"""
+    moment = moment.astimezone(dt_timezone.utc)
+    if resolution == 'hour':
+        return moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(second=0, microsecond=0)
+
+
+def aggregate_readings(start, end, resolution, device_ids=None):
+    """
+    Vitals statistics of raw readings sampled in [start, end), per device and bucket.
+
+    Returns:
+        Dicts with device_id, bucket and the STAT_FIELDS
+    """
+    aggregates = {}
+    for metric in METRICS:
+        aggregates[f'{metric}_count'] = Count(metric)
+        aggregates[f'{metric}_sum'] = Sum(metric, output_field=FloatField())
+        aggregates[f'{metric}_min'] = Min(metric, output_field=FloatField())
+        aggregates[f'{metric}_max'] = Max(metric, output_field=FloatField())
+
+    # Samples are stored after they are taken, up to the settle window later (or a
+    # little before, by a fast device clock); the ingest range keeps partition pruning
+    readings = DeviceReading.objects.between(
+        start - timedelta(seconds=settings.DEVICE_SAMPLE_MAX_CLOCK_SKEW),
+        end + timedelta(seconds=settings.DEVICE_ROLLUP_SETTLE_SECONDS)
+    ).annotate(
+        sample_time=Coalesce('sampled_at', 'timestamp')
+    ).filter(
+        Q(heart_rate__isnull=False) | Q(temperature__isnull=False) | Q(smoke_level__isnull=False),
+        sample_time__gte=start,
+        sample_time__lt=end
+    )
+    if device_ids is not None:
+        readings = readings.filter(device_id__in=device_ids)
+
+    return list(
+        readings.order_by()
+        .annotate(bucket=Trunc('sample_time', resolution, tzinfo=dt_timezone.utc))
+        .values('device_id', 'bucket')
+        .annotate(**aggregates)
+    )
+
+
+def aggregate_minutes(start, end):
+    """Hour statistics built from the minute rollups in [start, end)"""
+    aggregates = {}
+    for metric in METRICS:
+        aggregates[f'{metric}_count'] = Sum(f'{metric}_count')
+        aggregates[f'{metric}_sum'] = Sum(f'{metric}_sum')
+        aggregates[f'{metric}_min'] = Min(f'{metric}_min')
+        aggregates[f'{metric}_max'] = Max(f'{metric}_max')
+
+    return list(
+        DeviceVitalsRollup.objects.filter(resolution='minute', bucket__gte=start, bucket__lt=end)
+        .order_by()
+        .annotate(hour=Trunc('bucket', 'hour', tzinfo=dt_timezone.utc))
+        .values('device_id', 'hour')
+        .annotate(**aggregates)
+    )
+
+
+def write_rollups(rows, resolution, bucket_key='bucket'):
+    """Insert or overwrite the rollup rows of finished buckets"""
+    DeviceVitalsRollup.objects.bulk_create(
+        [
+            DeviceVitalsRollup(
+                device_id=row['device_id'],
+                resolution=resolution,
+                bucket=row[bucket_key],
+                **{field: (row[field] or 0) if field.endswith(('_count', '_sum')) else row[field] for field in STAT_FIELDS}
+            )
+            for row in rows
+        ],
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=['device', 'resolution', 'bucket'],
+        update_fields=STAT_FIELDS,
+    )
+    return len(rows)
+
+
+def _checkpoint(resolution, initial):
+    """Locked checkpoint of a resolution, created at `initial` the first time"""
+    RollupCheckpoint.objects.get_or_create(resolution=resolution, defaults={'position': initial()})
+    return RollupCheckpoint.objects.select_for_update().get(resolution=resolution)
+
+
+def _first_minute():
+    first = DeviceReading.objects.order_by('timestamp').values_list('timestamp', flat=True).first()
+    if first is None:
+        return floor_bucket(timezone.now(), 'minute')
+    # The first stored reading may carry samples from up to the settle window before it
+    return floor_bucket(first - timedelta(seconds=settings.DEVICE_ROLLUP_SETTLE_SECONDS), 'minute')
+
+
+def roll_up(now=None):
+    """
+    Roll up finished minutes and hours since the last run.
+
+    Each run covers at most DEVICE_ROLLUP_MAX_CATCHUP_HOURS of readings, so a
+    long backlog is worked off over several runs.
+
+    Returns:
+        (minute rows written, hour rows written, minute rows pruned)
+    """
+    now = now or timezone.now()
+    cutoff = floor_bucket(now - timedelta(seconds=settings.DEVICE_ROLLUP_SETTLE_SECONDS), 'minute')
+
+    with transaction.atomic():
+        minutes = _checkpoint('minute', _first_minute)
+        # Hours start where minutes started, before this run moves them on
+        first_hour = floor_bucket(minutes.position, 'hour')
+        end = min(cutoff, minutes.position + timedelta(hours=settings.DEVICE_ROLLUP_MAX_CATCHUP_HOURS))
+        minute_rows = 0
+        if end > minutes.position:
+            minute_rows = write_rollups(aggregate_readings(minutes.position, end, 'minute'), 'minute')
+            minutes.position = end
+            minutes.save(update_fields=['position'])
+
+        hours = _checkpoint('hour', lambda: first_hour)
+        end = floor_bucket(minutes.position, 'hour')
+        hour_rows = 0
+        if end > hours.position:
+            hour_rows = write_rollups(aggregate_minutes(hours.position, end), 'hour', bucket_key='hour')
+            hours.position = end
+            hours.save(update_fields=['position'])
+
+        # Hours stay for long-range charts, minutes only for recent ones
+        pruned, _ = DeviceVitalsRollup.objects.filter(
+            resolution='minute',
+            bucket__lt=now - timedelta(days=settings.DEVICE_ROLLUP_MINUTE_RETENTION_DAYS)
+        ).delete()
+
+    return minute_rows, hour_rows, pruned
+
+
+def pick_resolution(start, end):
+    """Minutes for short windows, hours for anything longer"""
+    if end - start <= timedelta(hours=settings.DEVICE_TRENDS_MINUTE_WINDOW_HOURS):
+        return 'minute'
+    return 'hour'
+
+
+def _point(bucket, row, metrics):
+    point = {'bucket': bucket}
+    for metric in metrics:
+        count = row[f'{metric}_count'] or 0
+        point[metric] = {
+            'count': count,
+            'min': row[f'{metric}_min'],
+            'max': row[f'{metric}_max'],
+            'avg': round(row[f'{metric}_sum'] / count, 2) if count else None,
+        }
+    return point
+
+
+def vitals_trend(device_id, start, end, resolution, metrics=METRICS):
+    """
+    Vitals of a device in [start, end) at a resolution, oldest bucket first.
+
+    Returns:
+        (points, complete_until) - buckets before complete_until come from
+        the rollup table, later ones are aggregated from recent readings
+    """
+    start = floor_bucket(start, resolution)
+    checkpoint = RollupCheckpoint.objects.filter(resolution=resolution).values_list('position', flat=True).first()
+    complete_until = checkpoint or start
+
+    points = [
+        _point(row['bucket'], row, metrics)
+        for row in DeviceVitalsRollup.objects.filter(
+            device_id=device_id, resolution=resolution, bucket__gte=start, bucket__lt=min(end, complete_until)
+        ).order_by('bucket').values('bucket', *STAT_FIELDS)
+    ]
+
+    if end > complete_until:
+        live_start = max(start, complete_until, floor_bucket(end - LIVE_TAIL, resolution))
+        if live_start > max(start, complete_until):
+            logger.warning(f"{resolution} rollups are behind ({complete_until}), trend has a gap before {live_start}")
+        live = aggregate_readings(live_start, end, resolution, device_ids=[device_id])
+        points.extend(_point(row['bucket'], row, metrics) for row in sorted(live, key=lambda row: row['bucket']))
+
+    return points, complete_until
@@ -0,0 +1,7 @@
+from django.urls import path
+from . import consumers
+
+# Served by Channels ahead of Django, see DeviceLatestValuesConsumer
+http_urlpatterns = [
+    path('api/devices/<uuid:device_id>/latest/', consumers.DeviceLatestValuesConsumer.as_asgi()),
+]
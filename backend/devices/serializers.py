@@ -1,11 +1,37 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
 from rest_framework import serializers
 from .models import Device, DeviceReading, EmergencyTrigger, DepartmentRegistration
+from .telemetry import overlay_telemetry
+
+
+def validate_sample_time(value):
+    """A device clock may run a little fast, not minutes ahead"""
+    if value and value > timezone.now() + timedelta(seconds=settings.DEVICE_SAMPLE_MAX_CLOCK_SKEW):
+        raise serializers.ValidationError('Sample time is in the future')
+    return value
+
+class DeviceListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        # One buffer read for the whole list
+        devices = data.all() if hasattr(data, 'all') else data
+        return super().to_representation(overlay_telemetry(devices))
+
 
 class DeviceSerializer(serializers.ModelSerializer):
+    """Devices with heartbeat/battery/location fresher than the last telemetry flush"""
     is_online = serializers.ReadOnlyField()
+
+    def to_representation(self, instance):
+        if not isinstance(self.parent, DeviceListSerializer):
+            overlay_telemetry([instance])
+        return super().to_representation(instance)
     
     class Meta:
         model = Device
+        list_serializer_class = DeviceListSerializer
         fields = [
             'device_id', 'mac_address', 'serial_number', 'device_type',
             'owner_name', 'owner_phone', 'owner_address', 'emergency_contact',
@@ -24,12 +50,30 @@ class DeviceReadingSerializer(serializers.ModelSerializer):
     class Meta:
         model = DeviceReading
         fields = [
-            'reading_id', 'device', 'device_serial', 'reading_type', 'timestamp', 
+            'reading_id', 'device', 'device_serial', 'reading_type', 'timestamp', 'sampled_at',
             'heart_rate', 'temperature', 'smoke_level', 'battery_level', 'latitude',
             'longitude', 'audio_file', 'fear_probability', 'stress_level',
             'audio_analysis_complete', 'is_emergency', 'triggered_by', 'raw_data'
         ]
-        read_only_fields = ['reading_id', 'timestamp']
+        # The uploading view resolves the device from its MAC address
+        read_only_fields = ['reading_id', 'device', 'timestamp']
+
+    def validate_sampled_at(self, value):
+        return validate_sample_time(value)
+
+class DeviceReadingBatchItemSerializer(serializers.ModelSerializer):
+    """One reading inside a batch upload - the device is identified by MAC address"""
+    mac_address = serializers.CharField(max_length=17)
+
+    class Meta:
+        model = DeviceReading
+        fields = [
+            'mac_address', 'reading_type', 'sampled_at', 'heart_rate', 'temperature', 'smoke_level',
+            'battery_level', 'latitude', 'longitude', 'raw_data'
+        ]
+
+    def validate_sampled_at(self, value):
+        return validate_sample_time(value)
 
 class EmergencyTriggerSerializer(serializers.ModelSerializer):
     device_info = serializers.SerializerMethodField()
@@ -37,12 +81,12 @@ class EmergencyTriggerSerializer(serializers.ModelSerializer):
     class Meta:
         model = EmergencyTrigger
         fields = [
-            'trigger_id', 'device', 'device_info', 'trigger_type', 'severity',
+            'trigger_id', 'device', 'device_info', 'trigger_type', 'rule', 'severity',
             'trigger_value', 'threshold_value', 'latitude', 'longitude',
             'alert_created_id', 'acknowledged', 'acknowledged_by_id', 'acknowledged_at',
             'triggered_at', 'resolved_at'
         ]
-        read_only_fields = ['trigger_id', 'triggered_at']
+        read_only_fields = ['trigger_id', 'rule', 'triggered_at']
     
     def get_device_info(self, obj):
         return {
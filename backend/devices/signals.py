@@ -0,0 +1,22 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .cache import INGEST_FIELDS, device_cache
+from .latest import discard_latest
+from .models import Device
+
+
+@receiver(post_save, sender=Device)
+@receiver(post_delete, sender=Device)
+def invalidate_device_cache(sender, instance, update_fields=None, **kwargs):
+    """Drop cached devices when status, MAC address or owner details may have changed"""
+    # Heartbeat/location/battery writes from the ingest path keep the cache
+    if update_fields is not None and set(update_fields) <= set(INGEST_FIELDS):
+        return
+    # The MAC address itself may have changed, so the old key is unknown
+    device_cache.invalidate()
+
+
+@receiver(post_delete, sender=Device)
+def discard_latest_values(sender, instance, **kwargs):
+    """Forget the latest-values snapshot of a deleted device"""
+    discard_latest(instance.device_id)
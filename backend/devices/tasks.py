@@ -0,0 +1,113 @@
+from celery import shared_task
+from django.db import transaction
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(acks_late=True)
+def process_device_reading(reading_id, timestamp=None):
+    """Evaluate a stored reading for emergencies (audio analysis included)"""
+    from django.utils.dateparse import parse_datetime
+    from .detection import discard_uncommitted
+    from .models import DeviceReading
+    from .views import process_reading_for_emergencies
+
+    readings = DeviceReading.objects.select_related('device')
+    if timestamp:
+        # Lets a partitioned table look in one partition only
+        readings = readings.filter(timestamp=parse_datetime(timestamp))
+
+    # acks_late redelivers a task whose worker died, and a broker may deliver
+    # twice: the row lock and flag let only one run create triggers, and a
+    # run that dies before committing leaves the reading to be processed again,
+    # against unchanged detector state (it is only saved on commit)
+    try:
+        with transaction.atomic():
+            try:
+                reading = readings.select_for_update(of=('self',)).get(reading_id=reading_id)
+            except DeviceReading.DoesNotExist:
+                logger.warning(f"Reading {reading_id} no longer exists, skipping emergency processing")
+                return
+
+            if reading.emergency_processed:
+                logger.info(f"Reading {reading_id} was already processed, skipping")
+                return
+
+            process_reading_for_emergencies(reading)
+            reading.emergency_processed = True
+            reading.save(update_fields=['emergency_processed'])
+    except Exception:
+        discard_uncommitted()
+        raise
+
+
+@shared_task(bind=True, acks_late=True, max_retries=3, default_retry_delay=5)
+def route_emergency_trigger(self, trigger_id):
+    """Create and route the alert for an emergency trigger"""
+    from .models import EmergencyTrigger
+    from .views import route_trigger_alert
+
+    try:
+        trigger = EmergencyTrigger.objects.select_related('device', 'reading').get(trigger_id=trigger_id)
+    except EmergencyTrigger.DoesNotExist:
+        logger.warning(f"Emergency trigger {trigger_id} no longer exists, skipping routing")
+        return
+
+    # Already routed by an earlier (redelivered) run
+    if trigger.alert_created_id:
+        return
+
+    try:
+        route_trigger_alert(trigger)
+    except Exception as exc:
+        logger.error(f"Error routing emergency trigger {trigger_id}: {exc}")
+        raise self.retry(exc=exc)
+
+
+@shared_task(ignore_result=True)
+def maintain_reading_partitions():
+    """Create upcoming device_readings partitions and drop those past the retention window"""
+    from .partitions import maintain_partitions
+
+    maintain_partitions()
+
+
+@shared_task(ignore_result=True)
+def rollup_device_vitals():
+    """Roll finished minutes and hours of readings up into vitals rollups"""
+    from .rollups import roll_up
+
+    minute_rows, hour_rows, pruned = roll_up()
+    if minute_rows or hour_rows:
+        logger.info(f"Rolled up {minute_rows} minute and {hour_rows} hour bucket(s), pruned {pruned}")
+
+
+@shared_task(ignore_result=True)
+def archive_old_readings():
+    """Move readings past the archive window to Parquet files"""
+    from django.conf import settings
+    from .archive import archive_readings
+
+    if not settings.DEVICE_READING_ARCHIVE_URI:
+        return
+    archived = archive_readings(max_days=settings.DEVICE_READING_ARCHIVE_DAYS_PER_RUN)
+    if archived:
+        logger.info(f"Archived {sum(archived.values())} reading(s) from {len(archived)} day(s)")
+
+
+@shared_task(ignore_result=True)
+def flush_device_telemetry():
+    """Write buffered heartbeats, battery levels and locations to the devices table"""
+    from .telemetry import flush_telemetry
+
+    flushed = flush_telemetry()
+    if flushed:
+        logger.info(f"Flushed telemetry for {flushed} device(s)")
+
+
+def enqueue_reading_processing(reading):
+    """Queue emergency processing for a reading once it is committed"""
+    reading_id = str(reading.reading_id)
+    timestamp = reading.timestamp.isoformat()
+    transaction.on_commit(lambda: process_device_reading.delay(reading_id, timestamp))
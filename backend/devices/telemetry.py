@@ -0,0 +1,246 @@
+"""
+Buffered device telemetry (heartbeat, battery, last location).
+
+Uploads record the latest values in a buffer instead of writing the devices
+table on every reading. A periodic flush writes everything buffered since
+the last flush as a few batched UPDATEs of just the telemetry columns.
+Readers overlay the buffered values on Device instances, so the API and
+is_online see data fresher than the last flush.
+
+The buffer lives in Redis when REDIS_URL is set (shared by web processes,
+flushed by the Celery beat task) and in process memory otherwise (flushed
+by a background thread of the process every flush interval, and once more
+when the process exits).
+"""
+import atexit
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+
+logger = logging.getLogger(__name__)
+
+# Buffered field -> parser for values read back from Redis
+TELEMETRY_FIELDS = {
+    'last_heartbeat': parse_datetime,
+    'last_known_latitude': Decimal,
+    'last_known_longitude': Decimal,
+    'last_location_update': parse_datetime,
+    'battery_level': int,
+    'updated_at': parse_datetime,
+}
+
+
+class MemoryTelemetryBuffer:
+    """Per-process buffer, flushed by the process that records"""
+
+    def __init__(self):
+        self._values = {}
+        self._dirty = set()
+        self._lock = threading.Lock()
+
+    def record(self, device_id, values):
+        with self._lock:
+            self._values.setdefault(device_id, {}).update(values)
+            self._dirty.add(device_id)
+
+    def get_many(self, device_ids):
+        with self._lock:
+            return {device_id: dict(self._values[device_id]) for device_id in device_ids if device_id in self._values}
+
+    def drain(self):
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            return {device_id: dict(self._values[device_id]) for device_id in dirty}
+
+    def requeue(self, device_ids):
+        with self._lock:
+            self._dirty.update(device_ids)
+
+
+class RedisTelemetryBuffer:
+    """Shared buffer: one hash per device plus a set of devices changed since the last flush"""
+
+    KEY = 'device_telemetry:{}'
+    DIRTY_KEY = 'device_telemetry:dirty'
+    DRAIN_BATCH = 1000
+
+    def __init__(self, url):
+        import redis
+        self.client = redis.Redis.from_url(url)
+
+    def record(self, device_id, values):
+        key = self.KEY.format(device_id)
+        pipeline = self.client.pipeline(transaction=False)
+        pipeline.hset(key, mapping={field: json.dumps(value, cls=DjangoJSONEncoder) for field, value in values.items()})
+        # Buffered values outlive any flush interval, the table has them by then
+        pipeline.expire(key, 24 * 3600)
+        pipeline.sadd(self.DIRTY_KEY, str(device_id))
+        pipeline.execute()
+
+    def get_many(self, device_ids):
+        device_ids = list(device_ids)
+        pipeline = self.client.pipeline(transaction=False)
+        for device_id in device_ids:
+            pipeline.hgetall(self.KEY.format(device_id))
+        return {
+            device_id: self._decode(raw)
+            for device_id, raw in zip(device_ids, pipeline.execute())
+            if raw
+        }
+
+    def drain(self):
+        # Devices recorded after their id is popped are simply flushed next time
+        drained = {}
+        while True:
+            device_ids = self.client.spop(self.DIRTY_KEY, self.DRAIN_BATCH)
+            if not device_ids:
+                return drained
+            device_ids = [device_id.decode() for device_id in device_ids]
+            drained.update(self.get_many(device_ids))
+
+    def requeue(self, device_ids):
+        device_ids = [str(device_id) for device_id in device_ids]
+        if device_ids:
+            self.client.sadd(self.DIRTY_KEY, *device_ids)
+
+    @staticmethod
+    def _decode(raw):
+        values = {}
+        for field, value in raw.items():
+            field = field.decode()
+            value = json.loads(value)
+            parser = TELEMETRY_FIELDS.get(field)
+            if parser is not None and value is not None:
+                values[field] = parser(str(value))
+        return values
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_buffer():
+    """The configured telemetry buffer, or None when writes go straight to the table"""
+    global _buffer
+    backend = settings.DEVICE_TELEMETRY_BUFFER
+    if backend == 'off':
+        return None
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                if backend == 'redis':
+                    _buffer = RedisTelemetryBuffer(settings.REDIS_URL)
+                else:
+                    _buffer = MemoryTelemetryBuffer()
+                    start_flusher()
+    return _buffer
+
+
+def record_telemetry(device, values):
+    """
+    Record the latest telemetry of a device.
+
+    Also sets the values on the instance, so the caller's Device is current.
+    """
+    for field, value in values.items():
+        setattr(device, field, value)
+
+    buffer = get_buffer()
+    if buffer is None:
+        device.save(update_fields=list(values))
+        return
+
+    try:
+        buffer.record(device.device_id, values)
+    except Exception as e:
+        # Never lose an upload over the buffer, write through instead
+        logger.error(f"Telemetry buffer unavailable, writing device {device.device_id} directly: {e}")
+        device.save(update_fields=list(values))
+
+
+def start_flusher():
+    """Flush the in-process buffer every flush interval and when the process exits"""
+    thread = threading.Thread(target=_flush_periodically, name='telemetry-flusher', daemon=True)
+    thread.start()
+    atexit.register(_flush_safely)
+
+
+def _flush_periodically():
+    while True:
+        time.sleep(settings.DEVICE_TELEMETRY_FLUSH_INTERVAL)
+        _flush_safely()
+
+
+def _flush_safely():
+    from django.db import connection
+
+    try:
+        flush_telemetry()
+    except Exception as e:
+        # Failed devices are requeued and written by the next flush
+        logger.error(f"Error flushing device telemetry: {e}")
+    finally:
+        # This thread's connection, the flusher sleeps far longer than it is used
+        connection.close()
+
+
+def flush_telemetry():
+    """
+    Write buffered telemetry to the devices table.
+
+    Devices are grouped by which fields they buffered, and each group is one
+    bulk UPDATE of just those columns.
+
+    Returns:
+        Number of devices written
+    """
+    from .models import Device
+
+    buffer = get_buffer()
+    if buffer is None:
+        return 0
+
+    drained = buffer.drain()
+    if not drained:
+        return 0
+
+    groups = defaultdict(list)
+    for device_id, values in drained.items():
+        groups[tuple(sorted(values))].append(Device(device_id=device_id, **values))
+
+    try:
+        with transaction.atomic():
+            for fields, devices in groups.items():
+                Device.objects.bulk_update(devices, list(fields), batch_size=500)
+    except Exception:
+        # The buffer still holds their values, mark them for the next flush
+        buffer.requeue(drained)
+        raise
+    return len(drained)
+
+
+def overlay_telemetry(devices):
+    """Apply buffered telemetry newer than the table to Device instances"""
+    devices = list(devices)
+    buffer = get_buffer()
+    if buffer is None or not devices:
+        return devices
+
+    try:
+        buffered = buffer.get_many(device.device_id for device in devices)
+    except Exception as e:
+        logger.error(f"Telemetry buffer unavailable, serving stored device values: {e}")
+        return devices
+
+    for device in devices:
+        for field, value in buffered.get(device.device_id, {}).items():
+            setattr(device, field, value)
+    return devices
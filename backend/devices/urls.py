@@ -6,6 +6,10 @@ urlpatterns = [
     path('', views.DeviceListView.as_view(), name='device_list'),
     path('register/', views.register_device, name='register_device'),
     path('data/', views.device_data_upload, name='device_data_upload'),
+    path('data/batch/', views.device_data_batch_upload, name='device_data_batch_upload'),
+    path('<uuid:device_id>/readings/', views.DeviceReadingListView.as_view(), name='device_readings'),
+    path('<uuid:device_id>/readings/archive/', views.archived_device_readings, name='archived_device_readings'),
+    path('<uuid:device_id>/trends/', views.device_vitals_trends, name='device_vitals_trends'),
     
     # Department Registration
     path('departments/register/', views.register_department, name='register_department'),
@@ -2,17 +2,32 @@ from rest_framework import generics, status, permissions
 from rest_framework.decorators import api_view, permission_classes, parser_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
-from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
+from rest_framework.exceptions import ValidationError
+from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django.shortcuts import get_object_or_404
 from .models import Device, DeviceReading, EmergencyTrigger, DepartmentRegistration
 from .serializers import (
     DeviceSerializer, DeviceReadingSerializer, EmergencyTriggerSerializer,
-    DepartmentRegistrationSerializer, DeviceRegistrationSerializer
+    DepartmentRegistrationSerializer, DeviceRegistrationSerializer,
+    DeviceReadingBatchItemSerializer
 )
+from .archive import ArchiveNotConfigured, read_archived_readings
+from .cache import get_active_device, get_active_devices
+from .detection import detect
+from .latest import record_analysis, record_readings
 from .ml_models import analyze_audio_for_fear
+from .rollups import METRICS, RESOLUTIONS, pick_resolution, vitals_trend
+from .tasks import enqueue_reading_processing, route_emergency_trigger
+from .telemetry import record_telemetry
 from alerts.models import Alert
+from utils.pagination import KeysetPagination
 import logging
+from collections import defaultdict
+from datetime import timedelta
 
 logger = logging.getLogger(__name__)
 
@@ -28,6 +43,120 @@ class DeviceListView(generics.ListAPIView):
         # For now, return all devices - you can add filtering logic
         return Device.objects.all()
 
+class DeviceReadingListView(generics.ListAPIView):
+    """Reading history of one device, newest first"""
+    serializer_class = DeviceReadingSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-timestamp', '-reading_id')
+
+    def get_queryset(self):
+        device = get_object_or_404(Device, device_id=self.kwargs['device_id'])
+        queryset = DeviceReading.objects.filter(device=device).select_related('device')
+
+        # Filter by reading type if provided
+        reading_type = self.request.query_params.get('reading_type')
+        if reading_type:
+            queryset = queryset.filter(reading_type=reading_type)
+
+        # Time window (ISO 8601), keeps partitioned scans to the partitions it covers
+        window = {}
+        for param in ('since', 'until'):
+            value = self.request.query_params.get(param)
+            if value:
+                window[param] = parse_datetime(value)
+                if window[param] is None:
+                    raise ValidationError({param: 'Expected an ISO 8601 date and time'})
+        if window:
+            queryset = queryset.between(window.get('since'), window.get('until'))
+
+        return queryset
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def archived_device_readings(request, device_id):
+    """
+    Readings of a device that were moved to the cold archive, oldest first.
+
+    ?start=&end= (ISO 8601) are required and may span at most
+    DEVICE_READING_ARCHIVE_MAX_QUERY_DAYS; ?reading_type= filters.
+    """
+    device = get_object_or_404(Device, device_id=device_id)
+
+    start = parse_datetime(request.query_params.get('start', ''))
+    end = parse_datetime(request.query_params.get('end', ''))
+    # Times without an offset are in the server's time zone, as the ORM reads them
+    start, end = [timezone.make_aware(value) if value and timezone.is_naive(value) else value for value in (start, end)]
+    if start is None or end is None or start >= end:
+        return Response({'error': 'start and end (ISO 8601, start before end) are required'},
+                       status=status.HTTP_400_BAD_REQUEST)
+
+    max_days = settings.DEVICE_READING_ARCHIVE_MAX_QUERY_DAYS
+    if end - start > timedelta(days=max_days):
+        return Response({'error': f'An archive query may span at most {max_days} days'},
+                       status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        readings = read_archived_readings(
+            device.device_id, start, end, reading_type=request.query_params.get('reading_type')
+        )
+    except ArchiveNotConfigured:
+        return Response({'error': 'Reading archive is not configured'}, status=status.HTTP_404_NOT_FOUND)
+
+    for reading in readings:
+        reading['device_serial'] = device.serial_number
+    return Response({'count': len(readings), 'results': readings})
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def device_vitals_trends(request, device_id):
+    """
+    Heart rate, temperature and smoke trend of a device from the vitals rollups.
+
+    ?start=&end= (ISO 8601, default the last 24 hours), ?metric= (repeatable,
+    default all) and ?resolution=minute|hour (default picked from the window).
+    """
+    device = get_object_or_404(Device, device_id=device_id)
+
+    end = timezone.now()
+    start = end - timedelta(hours=24)
+    for param in ('start', 'end'):
+        value = request.query_params.get(param)
+        if value:
+            parsed = parse_datetime(value)
+            if parsed is None:
+                return Response({'error': f'{param} must be an ISO 8601 date and time'},
+                               status=status.HTTP_400_BAD_REQUEST)
+            # Times without an offset are in the server's time zone, as the ORM reads them
+            if timezone.is_naive(parsed):
+                parsed = timezone.make_aware(parsed)
+            if param == 'start':
+                start = parsed
+            else:
+                end = parsed
+    if start >= end:
+        return Response({'error': 'start must be before end'}, status=status.HTTP_400_BAD_REQUEST)
+
+    metrics = request.query_params.getlist('metric') or METRICS
+    unknown = [metric for metric in metrics if metric not in METRICS]
+    if unknown:
+        return Response({'error': f'Unknown metric(s) {", ".join(unknown)}, expected {", ".join(METRICS)}'},
+                       status=status.HTTP_400_BAD_REQUEST)
+
+    resolution = request.query_params.get('resolution') or pick_resolution(start, end)
+    if resolution not in RESOLUTIONS:
+        return Response({'error': 'resolution must be minute or hour'}, status=status.HTTP_400_BAD_REQUEST)
+
+    points, complete_until = vitals_trend(device.device_id, start, end, resolution, metrics)
+    return Response({
+        'device_id': str(device.device_id),
+        'resolution': resolution,
+        'start': start,
+        'end': end,
+        'complete_until': complete_until,
+        'points': points,
+    })
+
 @api_view(['POST'])
 @permission_classes([AllowAny])  # Mobile app registration
 def register_device(request):
@@ -62,18 +191,14 @@ def device_data_upload(request):
     if not mac_address:
         return Response({'error': 'MAC address required'}, status=status.HTTP_400_BAD_REQUEST)
     
-    try:
-        device = Device.objects.get(mac_address=mac_address, status='active')
-    except Device.DoesNotExist:
+    device = get_active_device(mac_address)
+    if device is None:
         return Response({'error': 'Device not found or inactive'}, status=status.HTTP_404_NOT_FOUND)
     
-    # Update last heartbeat
-    device.last_heartbeat = timezone.now()
-    
     # Create reading record
     reading_data = {
-        'device': device.device_id,
         'reading_type': reading_type,
+        'sampled_at': request.data.get('sampled_at'),
         'heart_rate': request.data.get('heart_rate'),
         'temperature': request.data.get('temperature'),
         'smoke_level': request.data.get('smoke_level'),
@@ -90,21 +215,24 @@ def device_data_upload(request):
     
     serializer = DeviceReadingSerializer(data=reading_data)
     if serializer.is_valid():
-        reading = serializer.save()
+        reading = serializer.save(device=device)
         
-        # Update device location and battery if provided
+        # Heartbeat, plus location and battery if provided, go through the telemetry buffer
+        now = timezone.now()
+        telemetry = {'last_heartbeat': now, 'updated_at': now}
         if reading.latitude and reading.longitude:
-            device.last_known_latitude = reading.latitude
-            device.last_known_longitude = reading.longitude
-            device.last_location_update = timezone.now()
+            telemetry['last_known_latitude'] = reading.latitude
+            telemetry['last_known_longitude'] = reading.longitude
+            telemetry['last_location_update'] = now
         
         if reading.battery_level:
-            device.battery_level = reading.battery_level
+            telemetry['battery_level'] = reading.battery_level
         
-        device.save()
+        record_telemetry(device, telemetry)
+        record_readings(device.device_id, [reading])
         
-        # Process the reading for emergency triggers
-        process_reading_for_emergencies(reading)
+        # Emergency detection runs on the workers, the device gets its answer now
+        enqueue_reading_processing(reading)
         
         return Response({
             'message': 'Data received successfully',
@@ -113,37 +241,83 @@ def device_data_upload(request):
     
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+@api_view(['POST'])
+@permission_classes([AllowAny])
+@parser_classes([JSONParser])
+def device_data_batch_upload(request):
+    """Receive many buffered readings (possibly from many devices) in one request"""
+    items = request.data.get('readings') if isinstance(request.data, dict) else request.data
+
+    if not isinstance(items, list) or not items:
+        return Response({'error': 'A non-empty list of readings is required'}, status=status.HTTP_400_BAD_REQUEST)
+
+    max_readings = settings.DEVICE_BATCH_MAX_READINGS
+    if len(items) > max_readings:
+        return Response({'error': f'A batch may contain at most {max_readings} readings'},
+                       status=status.HTTP_400_BAD_REQUEST)
+
+    # Validate every reading in one pass
+    serializer = DeviceReadingBatchItemSerializer(data=items, many=True)
+    if not serializer.is_valid():
+        return Response({'errors': serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+
+    # Resolve all devices referenced by the batch, one query at most for devices not cached yet
+    devices = get_active_devices(item['mac_address'] for item in serializer.validated_data)
+
+    now = timezone.now()
+    readings = []
+    rejected = []
+    telemetry = {}
+    device_readings = defaultdict(list)
+
+    for index, item in enumerate(serializer.validated_data):
+        device = devices.get(item['mac_address'])
+        if device is None:
+            rejected.append({'index': index, 'mac_address': item['mac_address'],
+                             'error': 'Device not found or inactive'})
+            continue
+
+        reading_data = {key: value for key, value in item.items() if key != 'mac_address'}
+        reading = DeviceReading(device=device, **reading_data)
+        readings.append(reading)
+        device_readings[device.device_id].append(reading)
+
+        # Fold the batch into one heartbeat/location/battery update per device,
+        # later readings in the batch win
+        device_telemetry = telemetry.setdefault(device.device_id, (device, {}))[1]
+        device_telemetry.update(last_heartbeat=now, updated_at=now)
+        if reading.latitude and reading.longitude:
+            device_telemetry.update(
+                last_known_latitude=reading.latitude,
+                last_known_longitude=reading.longitude,
+                last_location_update=now
+            )
+        if reading.battery_level:
+            device_telemetry['battery_level'] = reading.battery_level
+
+    if not readings:
+        return Response({'error': 'No readings matched an active device', 'rejected': rejected},
+                       status=status.HTTP_404_NOT_FOUND)
+
+    with transaction.atomic():
+        DeviceReading.objects.bulk_create(readings)
+        for device, device_telemetry in telemetry.values():
+            record_telemetry(device, device_telemetry)
+            record_readings(device.device_id, device_readings[device.device_id])
+
+        # Emergency detection runs on the workers once the batch is committed
+        for reading in readings:
+            enqueue_reading_processing(reading)
+
+    return Response({
+        'message': 'Data received successfully',
+        'accepted': len(readings),
+        'rejected': rejected,
+        'reading_ids': [str(reading.reading_id) for reading in readings]
+    }, status=status.HTTP_201_CREATED)
+
 def process_reading_for_emergencies(reading):
     """Process device reading to detect emergencies"""
-    triggers = []
-    
-    # Check heart rate
-    if reading.heart_rate and reading.heart_rate > 120:  # High heart rate threshold
-        triggers.append({
-            'trigger_type': 'high_heart_rate',
-            'severity': 'high' if reading.heart_rate > 150 else 'medium',
-            'trigger_value': reading.heart_rate,
-            'threshold_value': 120
-        })
-    
-    # Check temperature (fire detection)
-    if reading.temperature and reading.temperature > 40:  # High temperature threshold
-        triggers.append({
-            'trigger_type': 'fire_detected',
-            'severity': 'critical' if reading.temperature > 50 else 'high',
-            'trigger_value': reading.temperature,
-            'threshold_value': 40
-        })
-    
-    # Check smoke level
-    if reading.smoke_level and reading.smoke_level > 2500:  # Smoke threshold
-        triggers.append({
-            'trigger_type': 'fire_detected',
-            'severity': 'critical' if reading.smoke_level > 2900 else 'high',
-            'trigger_value': reading.smoke_level,
-            'threshold_value': 2500
-        })
-    
     # Process audio for fear detection
     if reading.audio_file and reading.reading_type == 'audio':
         try:
@@ -152,29 +326,34 @@ def process_reading_for_emergencies(reading):
                 reading.fear_probability = audio_analysis['fear_probability']
                 reading.stress_level = audio_analysis['stress_level']
                 reading.audio_analysis_complete = True
-                reading.save()
-                
-                # Check if fear detected
-                if audio_analysis['fear_probability'] > 0.7:  # High fear threshold
-                    triggers.append({
-                        'trigger_type': 'fear_detected',
-                        'severity': 'critical' if audio_analysis['fear_probability'] > 0.9 else 'high',
-                        'trigger_value': audio_analysis['fear_probability'],
-                        'threshold_value': 0.7
-                    })
+                reading.save(update_fields=['fear_probability', 'stress_level', 'audio_analysis_complete'])
+                record_analysis(reading)
         except Exception as e:
             logger.error(f"Error processing audio for fear detection: {e}")
     
+    # Windowed rules over the device's recent samples; a trigger is only
+    # created when a rule enters alarm, not for every reading past a threshold
+    triggers, cleared = detect(reading)
+    
     # Create emergency triggers and alerts
     for trigger_data in triggers:
         create_emergency_trigger(reading, trigger_data)
+    
+    # Rules back to normal resolve the open triggers they raised
+    for rule in cleared:
+        EmergencyTrigger.objects.filter(
+            device_id=reading.device_id,
+            rule=rule.name,
+            resolved_at__isnull=True
+        ).update(resolved_at=timezone.now())
 
 def create_emergency_trigger(reading, trigger_data):
-    """Create emergency trigger and corresponding alert with automatic station assignment"""
+    """Create emergency trigger and queue routing of its alert"""
     trigger = EmergencyTrigger.objects.create(
         device=reading.device,
         reading=reading,
         trigger_type=trigger_data['trigger_type'],
+        rule=trigger_data.get('rule', ''),
         severity=trigger_data['severity'],
         trigger_value=trigger_data['trigger_value'],
         threshold_value=trigger_data['threshold_value'],
@@ -182,43 +361,56 @@ def create_emergency_trigger(reading, trigger_data):
         longitude=reading.longitude
     )
 
+    # Alert creation and station assignment happen on the workers
+    trigger_id = str(trigger.trigger_id)
+    transaction.on_commit(lambda: route_emergency_trigger.delay(trigger_id))
+    return trigger
+
+def route_trigger_alert(trigger):
+    """Create the alert for an emergency trigger with automatic station assignment"""
+    device = trigger.device
+
     # Create alert description
     alert_description = f"""
-    Emergency detected from device {reading.device.serial_number}
-    Owner: {reading.device.owner_name}
+    Emergency detected from device {device.serial_number}
+    Owner: {device.owner_name}
     Trigger: {trigger.get_trigger_type_display()}
     Severity: {trigger.get_severity_display()}
     Value: {trigger.trigger_value} (Threshold: {trigger.threshold_value})
-    Location: {reading.device.owner_address}
+    Location: {device.owner_address}
     """
 
     # Use the new alert routing service to create and assign the alert
     if trigger.latitude and trigger.longitude:
         from alerts.services import AlertRoutingService
-        from accounts.models import User
+        from accounts.cache import get_system_user
 
-        system_user = User.objects.filter(role='System Administrator').first()
+        system_user = get_system_user()
 
         if system_user:
-            alert = AlertRoutingService.route_emergency_alert(
-                alert_type=trigger.trigger_type,
-                latitude=float(trigger.latitude),
-                longitude=float(trigger.longitude),
-                severity=trigger.severity,
-                description=alert_description,
-                created_by_user=system_user
-            )
+            # Alert and trigger link commit together so retries never duplicate alerts
+            with transaction.atomic():
+                alert = AlertRoutingService.route_emergency_alert(
+                    alert_type=trigger.trigger_type,
+                    latitude=float(trigger.latitude),
+                    longitude=float(trigger.longitude),
+                    severity=trigger.severity,
+                    description=alert_description,
+                    created_by_user=system_user
+                )
 
-            trigger.alert_created_id = alert.id
-            trigger.save()
+                trigger.alert_created_id = alert.id
+                trigger.save(update_fields=['alert_created_id'])
 
-            logger.info(f"Emergency alert created and routed: {alert.id} for device {reading.device.serial_number}")
+            logger.info(f"Emergency alert created and routed: {alert.id} for device {device.serial_number}")
             if alert.assigned_station:
                 logger.info(f"Alert assigned to station: {alert.assigned_station.name}")
+            return alert
         else:
             logger.error("No system administrator found to create alert")
     else:
-        logger.warning(f"No location data available for device {reading.device.serial_number}, cannot route alert")
+        logger.warning(f"No location data available for device {device.serial_number}, cannot route alert")
+    return None
 
 # Department Registration Views
 @api_view(['POST'])
@@ -317,6 +509,8 @@ def approve_department_registration(request, registration_id):
 class EmergencyTriggerListView(generics.ListAPIView):
     serializer_class = EmergencyTriggerSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-triggered_at', '-trigger_id')
     
     def get_queryset(self):
         user = self.request.user
@@ -0,0 +1,19 @@
+import os
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'emergency_system.settings')
+
+# Set up Django before importing consumers and auth middleware
+django_asgi_app = get_asgi_application()
+
+from django.urls import re_path
+from channels.routing import ProtocolTypeRouter, URLRouter
+from accounts.middleware import JWTAuthMiddleware
+from alerts.routing import websocket_urlpatterns
+from devices.routing import http_urlpatterns
+
+application = ProtocolTypeRouter({
+    # Long-polling endpoints first, everything else goes to Django
+    'http': URLRouter(http_urlpatterns + [re_path(r'', django_asgi_app)]),
+    'websocket': JWTAuthMiddleware(URLRouter(websocket_urlpatterns)),
+})
@@ -18,6 +18,7 @@ ALLOWED_HOSTS = ['*']
 
 # Application definition
 INSTALLED_APPS = [
+    'daphne',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -25,6 +26,7 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'django.contrib.sites',
+    'django.contrib.postgres',
     
     # Third party apps
     'rest_framework',
@@ -72,6 +74,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'emergency_system.wsgi.application'
+ASGI_APPLICATION = 'emergency_system.asgi.application'
 
 # Database - Using Neon PostgreSQL
 DATABASES = {
@@ -105,6 +108,40 @@ if DATABASE_URL:
         },
     }
 
+# Cache - Redis when configured, otherwise per-process memory
+REDIS_URL = config('REDIS_URL', default='')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Process-local caches of hot lookups (system user, devices by MAC address)
+LOCAL_CACHE_TTL = config('LOCAL_CACHE_TTL', default=60, cast=int)  # Seconds
+
+# Channel layer for real-time alert push - Redis when configured, in-memory for local runs
+if REDIS_URL:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {'hosts': [REDIS_URL]},
+        }
+    }
+else:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels.layers.InMemoryChannelLayer',
+        }
+    }
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -281,6 +318,100 @@ EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'  # For developm
 FILE_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
 
+# Device Ingestion Settings
+DEVICE_BATCH_MAX_READINGS = config('DEVICE_BATCH_MAX_READINGS', default=500, cast=int)
+DEVICE_SAMPLE_MAX_CLOCK_SKEW = config('DEVICE_SAMPLE_MAX_CLOCK_SKEW', default=300, cast=int)  # Seconds a sampled_at may lie ahead
+# Heartbeat/battery/location buffer: 'redis' (shared, flushed by Celery beat), 'memory' (per process) or 'off'
+DEVICE_TELEMETRY_BUFFER = config('DEVICE_TELEMETRY_BUFFER', default='redis' if REDIS_URL else 'memory')
+DEVICE_TELEMETRY_FLUSH_INTERVAL = config('DEVICE_TELEMETRY_FLUSH_INTERVAL', default=10, cast=int)  # Seconds
+# device_readings partitioning (PostgreSQL, after running partition_device_readings)
+DEVICE_READING_PARTITION_INTERVAL = config('DEVICE_READING_PARTITION_INTERVAL', default='month')  # 'day' or 'month'
+DEVICE_READING_PARTITIONS_AHEAD = config('DEVICE_READING_PARTITIONS_AHEAD', default=3, cast=int)
+DEVICE_READING_RETENTION_DAYS = config('DEVICE_READING_RETENTION_DAYS', default=0, cast=int)  # 0 keeps every reading
+# Emergency detection: windowed rules over per-device ring buffers
+DETECTION_BUFFER_SIZE = config('DETECTION_BUFFER_SIZE', default=64, cast=int)  # Samples kept per device and metric
+DETECTION_HEART_RATE_WINDOW_SECONDS = config('DETECTION_HEART_RATE_WINDOW_SECONDS', default=30, cast=int)
+DETECTION_FIRE_WINDOW_SECONDS = config('DETECTION_FIRE_WINDOW_SECONDS', default=10, cast=int)
+DETECTION_TEMPERATURE_RISE_PER_MINUTE = config('DETECTION_TEMPERATURE_RISE_PER_MINUTE', default=8.0, cast=float)  # Degrees C
+DETECTION_TEMPERATURE_RISE_WINDOW_SECONDS = config('DETECTION_TEMPERATURE_RISE_WINDOW_SECONDS', default=60, cast=int)
+DETECTION_MAX_GAP_SECONDS = config('DETECTION_MAX_GAP_SECONDS', default=900, cast=int)  # Longer silences break a streak
+DETECTION_HYSTERESIS = config('DETECTION_HYSTERESIS', default=0.05, cast=float)  # Fraction below threshold to clear
+DETECTION_STATE_TTL = config('DETECTION_STATE_TTL', default=24 * 3600, cast=int)  # Seconds (Redis)
+# Cold archive of old readings as Parquet (local path, s3://bucket/prefix or gs://bucket/prefix; empty disables)
+DEVICE_READING_ARCHIVE_URI = config('DEVICE_READING_ARCHIVE_URI', default='')
+DEVICE_READING_ARCHIVE_AFTER_DAYS = config('DEVICE_READING_ARCHIVE_AFTER_DAYS', default=90, cast=int)
+DEVICE_READING_ARCHIVE_BATCH_SIZE = config('DEVICE_READING_ARCHIVE_BATCH_SIZE', default=1000, cast=int)  # Rows per delete
+DEVICE_READING_ARCHIVE_DAYS_PER_RUN = config('DEVICE_READING_ARCHIVE_DAYS_PER_RUN', default=7, cast=int)
+DEVICE_READING_ARCHIVE_MAX_QUERY_DAYS = config('DEVICE_READING_ARCHIVE_MAX_QUERY_DAYS', default=31, cast=int)
+# Vitals rollups (minute and hour statistics for trend charts)
+DEVICE_ROLLUP_SETTLE_SECONDS = config('DEVICE_ROLLUP_SETTLE_SECONDS', default=300, cast=int)  # Wait before a minute is final (covers batched samples)
+DEVICE_ROLLUP_MAX_CATCHUP_HOURS = config('DEVICE_ROLLUP_MAX_CATCHUP_HOURS', default=6, cast=int)  # Per run
+DEVICE_ROLLUP_MINUTE_RETENTION_DAYS = config('DEVICE_ROLLUP_MINUTE_RETENTION_DAYS', default=14, cast=int)
+DEVICE_TRENDS_MINUTE_WINDOW_HOURS = config('DEVICE_TRENDS_MINUTE_WINDOW_HOURS', default=6, cast=int)  # Longer windows use hours
+# Latest-values snapshots served to the mobile app (Redis when REDIS_URL is set)
+DEVICE_LATEST_MAX_WAIT = config('DEVICE_LATEST_MAX_WAIT', default=25, cast=int)  # Longest long-poll, seconds
+DEVICE_LATEST_BACKFILL_READINGS = config('DEVICE_LATEST_BACKFILL_READINGS', default=50, cast=int)
+
+# Celery - background emergency processing
+# Without a broker URL tasks run eagerly in-process (local runs and tests)
+CELERY_BROKER_URL = config('CELERY_BROKER_URL', default='')
+CELERY_TASK_ALWAYS_EAGER = config('CELERY_TASK_ALWAYS_EAGER', default=not CELERY_BROKER_URL, cast=bool)
+CELERY_TASK_EAGER_PROPAGATES = True
+CELERY_TASK_ACKS_LATE = True  # Keep tasks on the queue until a worker finishes them
+CELERY_TASK_REJECT_ON_WORKER_LOST = True
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+CELERY_TASK_SERIALIZER = 'json'
+CELERY_ACCEPT_CONTENT = ['json']
+CELERY_TIMEZONE = TIME_ZONE
+CELERY_BEAT_SCHEDULE = {
+    'flush-device-telemetry': {
+        'task': 'devices.tasks.flush_device_telemetry',
+        'schedule': DEVICE_TELEMETRY_FLUSH_INTERVAL,
+    },
+    'rollup-device-vitals': {
+        'task': 'devices.tasks.rollup_device_vitals',
+        'schedule': 60,
+    },
+    'archive-old-readings': {
+        'task': 'devices.tasks.archive_old_readings',
+        'schedule': 3600,
+    },
+    'maintain-reading-partitions': {
+        'task': 'devices.tasks.maintain_reading_partitions',
+        'schedule': 6 * 3600,
+    },
+    'prune-alert-tombstones': {
+        'task': 'alerts.tasks.prune_alert_tombstones',
+        'schedule': 24 * 3600,
+    },
+}
+
+# Station Routing Settings
+ALERT_BULK_MAX_INCIDENTS = config('ALERT_BULK_MAX_INCIDENTS', default=500, cast=int)
+ALERT_STATISTICS_CACHE_TTL = config('ALERT_STATISTICS_CACHE_TTL', default=10, cast=int)  # Seconds
+# Delta sync only hands out changes older than this, so slow transactions cannot commit behind a watermark
+ALERT_SYNC_SETTLE_SECONDS = config('ALERT_SYNC_SETTLE_SECONDS', default=5, cast=int)
+ALERT_SYNC_PAGE_SIZE = config('ALERT_SYNC_PAGE_SIZE', default=200, cast=int)
+# Cursors older than this must do a full resync, tombstones are pruned past it
+ALERT_TOMBSTONE_RETENTION_DAYS = config('ALERT_TOMBSTONE_RETENTION_DAYS', default=30, cast=int)
+# 'index' answers lookups from in-memory spatial indexes, 'database' uses a bounding-box query per lookup,
+# 'grid' reads the precomputed station grids (build_station_grid) and uses the index outside them
+STATION_LOOKUP_BACKEND = config('STATION_LOOKUP_BACKEND', default='index')
+# 'nearest' picks the closest station, 'load_aware' scores the k nearest by distance plus open alerts,
+# 'travel_time' picks the fastest station over the road graph (straight line without a graph)
+STATION_ROUTING_MODE = config('STATION_ROUTING_MODE', default='nearest')
+STATION_LOAD_CANDIDATES = config('STATION_LOAD_CANDIDATES', default=3, cast=int)
+STATION_LOAD_PENALTY_KM = config('STATION_LOAD_PENALTY_KM', default=5.0, cast=float)  # Extra km per open alert
+STATION_LOAD_TTL = config('STATION_LOAD_TTL', default=5, cast=int)  # Seconds between load snapshot reloads
+STATION_INDEX_TTL = config('STATION_INDEX_TTL', default=300, cast=int)  # Seconds before spatial indexes are rebuilt
+# Nearest-station grids built by the build_station_grid command
+STATION_GRID_DIR = config('STATION_GRID_DIR', default='')
+STATION_GRID_BOUNDS = config('STATION_GRID_BOUNDS', default='-17.2,-9.3,32.6,36.0')  # min_lat,max_lat,min_lng,max_lng (Malawi)
+# Road graph built by the build_road_graph command
+ROAD_GRAPH_PATH = config('ROAD_GRAPH_PATH', default='')
+ROAD_GRAPH_MAX_SNAP_KM = config('ROAD_GRAPH_MAX_SNAP_KM', default=5.0, cast=float)  # Farther from a road means straight line
+ROAD_GRAPH_OFF_ROAD_KMH = config('ROAD_GRAPH_OFF_ROAD_KMH', default=15.0, cast=float)
+
 # ML Model Settings
 ML_MODELS_DIR = BASE_DIR / 'ml_models'
 os.makedirs(ML_MODELS_DIR, exist_ok=True)
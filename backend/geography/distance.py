@@ -0,0 +1,110 @@
+"""
+Vectorized Haversine distances on NumPy float64 arrays.
+
+Points are (latitude, longitude) pairs in degrees, given as an (n, 2) array
+or anything np.asarray accepts. All distances are in kilometers.
+"""
+import math
+from typing import Optional, Tuple
+
+import numpy as np
+
+# Radius of Earth in kilometers
+EARTH_RADIUS_KM = 6371.0
+
+
+def as_points(points) -> np.ndarray:
+    """Coerce coordinates to an (n, 2) float64 array of degrees"""
+    return np.asarray(points, dtype=np.float64).reshape(-1, 2)
+
+
+def haversine_matrix(query_points, target_points) -> np.ndarray:
+    """
+    Great circle distances from every query point to every target point.
+
+    Returns:
+        (n_queries, n_targets) array of distances in kilometers
+    """
+    query = np.radians(as_points(query_points))
+    target = np.radians(as_points(target_points))
+
+    query_lat = query[:, 0][:, np.newaxis]
+    query_lon = query[:, 1][:, np.newaxis]
+    target_lat = target[:, 0][np.newaxis, :]
+    target_lon = target[:, 1][np.newaxis, :]
+
+    a = (
+        np.sin((target_lat - query_lat) / 2) ** 2
+        + np.cos(query_lat) * np.cos(target_lat) * np.sin((target_lon - query_lon) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def haversine_distances(latitude: float, longitude: float, target_points) -> np.ndarray:
+    """Distances from one point to every target point, as a 1-D array"""
+    return haversine_matrix([[latitude, longitude]], target_points)[0]
+
+
+def k_smallest(distances: np.ndarray, k: int, max_distance: Optional[float] = None) -> np.ndarray:
+    """
+    Indices of the k smallest distances, sorted ascending.
+
+    Uses argpartition so only the k selected entries are sorted.
+    """
+    k = min(k, distances.shape[0])
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+
+    indices = np.argpartition(distances, k - 1)[:k]
+    indices = indices[np.argsort(distances[indices], kind='stable')]
+
+    if max_distance is not None:
+        indices = indices[distances[indices] <= max_distance]
+    return indices
+
+
+def k_smallest_rows(matrix: np.ndarray, k: int) -> np.ndarray:
+    """
+    Row-wise indices of the k smallest entries of a distance matrix.
+
+    Returns:
+        (n_rows, k) array of column indices, each row sorted ascending
+    """
+    k = min(k, matrix.shape[1])
+    if k <= 0:
+        return np.empty((matrix.shape[0], 0), dtype=np.intp)
+
+    indices = np.argpartition(matrix, k - 1, axis=1)[:, :k]
+    order = np.argsort(np.take_along_axis(matrix, indices, axis=1), axis=1, kind='stable')
+    return np.take_along_axis(indices, order, axis=1)
+
+
+def within_radius(distances: np.ndarray, radius: float) -> np.ndarray:
+    """Indices of distances within radius, sorted ascending"""
+    indices = np.flatnonzero(distances <= radius)
+    return indices[np.argsort(distances[indices], kind='stable')]
+
+
+def bounding_box(latitude: float, longitude: float, radius_km: float) -> Tuple[float, float, float, float]:
+    """
+    Lat/lng box that contains every point within radius_km of a location.
+
+    Returns:
+        (min_latitude, max_latitude, min_longitude, max_longitude) in degrees.
+        Longitude spans the whole globe near the poles or across the antimeridian.
+    """
+    angular_radius = radius_km / EARTH_RADIUS_KM
+    delta_lat = math.degrees(angular_radius)
+    min_lat = latitude - delta_lat
+    max_lat = latitude + delta_lat
+
+    if min_lat <= -90 or max_lat >= 90:
+        return max(min_lat, -90.0), min(max_lat, 90.0), -180.0, 180.0
+
+    delta_lon = math.degrees(math.asin(min(1.0, math.sin(angular_radius) / math.cos(math.radians(latitude)))))
+    min_lon = longitude - delta_lon
+    max_lon = longitude + delta_lon
+
+    if min_lon < -180 or max_lon > 180:
+        return min_lat, max_lat, -180.0, 180.0
+    return min_lat, max_lat, min_lon, max_lon
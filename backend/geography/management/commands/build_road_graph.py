@@ -0,0 +1,79 @@
+import csv
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        'Convert a road edge list CSV into the compact CSR road graph used for travel-time routing. '
+        'Columns: from_lat, from_lng, to_lat, to_lng and either travel_seconds or length_km + speed_kmh; '
+        'optional oneway (1 for one-way roads). Edge lists can be exported from an OSM PBF extract '
+        'with tools such as osmium or osmnx.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('edges_csv', help='Road edge list CSV')
+        parser.add_argument('--output', default=None, help='Output .npz file (defaults to ROAD_GRAPH_PATH)')
+        parser.add_argument('--precision', type=int, default=6, help='Decimals used to merge shared nodes')
+
+    def handle(self, *args, **options):
+        output = options['output'] or settings.ROAD_GRAPH_PATH
+        if not output:
+            raise CommandError('Pass --output or set ROAD_GRAPH_PATH')
+
+        nodes = {}
+        sources, targets, weights = [], [], []
+
+        def node_for(latitude, longitude):
+            key = (round(float(latitude), options['precision']), round(float(longitude), options['precision']))
+            if key not in nodes:
+                nodes[key] = len(nodes)
+            return nodes[key]
+
+        with open(options['edges_csv'], newline='') as edges_file:
+            for line, row in enumerate(csv.DictReader(edges_file), start=2):
+                try:
+                    start = node_for(row['from_lat'], row['from_lng'])
+                    end = node_for(row['to_lat'], row['to_lng'])
+                    if row.get('travel_seconds'):
+                        seconds = float(row['travel_seconds'])
+                    else:
+                        seconds = float(row['length_km']) / float(row['speed_kmh']) * 3600
+                except (KeyError, TypeError, ValueError, ZeroDivisionError) as e:
+                    raise CommandError(f'Line {line}: {e}')
+
+                if start == end or seconds < 0:
+                    continue
+                sources.append(start)
+                targets.append(end)
+                weights.append(seconds)
+                if str(row.get('oneway', '0')).strip().lower() not in ('1', 'true', 'yes'):
+                    sources.append(end)
+                    targets.append(start)
+                    weights.append(seconds)
+
+        if not nodes:
+            raise CommandError('No edges found')
+
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int32)
+        weights = np.asarray(weights, dtype=np.float32)
+
+        # Sort by (source, target, weight) and keep the fastest of any parallel edges
+        order = np.lexsort((weights, targets, sources))
+        sources, targets, weights = sources[order], targets[order], weights[order]
+        first = np.ones(len(sources), dtype=bool)
+        first[1:] = (sources[1:] != sources[:-1]) | (targets[1:] != targets[:-1])
+        sources, targets, weights = sources[first], targets[first], weights[first]
+
+        node_count = len(nodes)
+        indptr = np.zeros(node_count + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=node_count), out=indptr[1:])
+        node_coords = np.array(list(nodes.keys()), dtype=np.float64)
+
+        np.savez_compressed(output, node_coords=node_coords, indptr=indptr, indices=targets, weights=weights)
+        self.stdout.write(
+            self.style.SUCCESS(f'Wrote road graph with {node_count} nodes and {len(targets)} edges to {output}')
+        )
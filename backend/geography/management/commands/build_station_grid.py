@@ -0,0 +1,83 @@
+import json
+import math
+import os
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from geography.spatial_index import StationSpatialIndex
+from geography.station_grid import NO_STATION, grid_paths, station_fingerprint
+
+DEPARTMENTS = ['fire', 'police', 'medical']
+
+# Rows of cells queried at once, keeps memory flat on large grids
+CHUNK_ROWS = 64
+
+
+class Command(BaseCommand):
+    help = 'Precompute per-department nearest and second-nearest station grids for O(1) routing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--department', action='append', choices=DEPARTMENTS, help='Department (repeatable, default all)')
+        parser.add_argument('--cell-size-m', type=float, default=500.0, help='Approximate cell size in meters')
+        parser.add_argument(
+            '--bounds', default=None,
+            help='min_lat,max_lat,min_lng,max_lng (defaults to STATION_GRID_BOUNDS)'
+        )
+        parser.add_argument('--output-dir', default=None, help='Directory for the grids (defaults to STATION_GRID_DIR)')
+
+    def handle(self, *args, **options):
+        directory = options['output_dir'] or settings.STATION_GRID_DIR
+        if not directory:
+            raise CommandError('Pass --output-dir or set STATION_GRID_DIR')
+        os.makedirs(directory, exist_ok=True)
+
+        try:
+            min_lat, max_lat, min_lng, max_lng = [
+                float(value) for value in (options['bounds'] or settings.STATION_GRID_BOUNDS).split(',')
+            ]
+        except ValueError:
+            raise CommandError('Bounds must be min_lat,max_lat,min_lng,max_lng')
+
+        # Cells are square-ish at the middle latitude of the box
+        lat_step = options['cell_size_m'] / 111320.0
+        lng_step = lat_step / max(math.cos(math.radians((min_lat + max_lat) / 2)), 0.01)
+        rows = int(math.ceil((max_lat - min_lat) / lat_step))
+        cols = int(math.ceil((max_lng - min_lng) / lng_step))
+
+        for department in options['department'] or DEPARTMENTS:
+            index = StationSpatialIndex.build(department)
+            if len(index.stations) > np.iinfo(np.int16).max:
+                raise CommandError(f'Too many {department} stations for an int16 grid')
+
+            cells = np.full((rows, cols, 2), NO_STATION, dtype=np.int16)
+            if index.tree is not None:
+                k = min(2, len(index.stations))
+                lngs = min_lng + (np.arange(cols) + 0.5) * lng_step
+                for start in range(0, rows, CHUNK_ROWS):
+                    lats = min_lat + (np.arange(start, min(start + CHUNK_ROWS, rows)) + 0.5) * lat_step
+                    centres = np.column_stack([np.repeat(lats, cols), np.tile(lngs, len(lats))])
+                    _, nearest = index.tree.query(np.radians(centres), k=k)
+                    cells[start:start + len(lats), :, :k] = nearest.reshape(len(lats), cols, k)
+
+            cells_path, meta_path = grid_paths(directory, department)
+            np.save(cells_path, cells)
+            with open(meta_path, 'w') as meta_file:
+                json.dump({
+                    'department': department,
+                    'min_lat': min_lat,
+                    'min_lng': min_lng,
+                    'lat_step': lat_step,
+                    'lng_step': lng_step,
+                    'rows': rows,
+                    'cols': cols,
+                    'station_ids': [str(station.station_id) for station in index.stations],
+                    'fingerprint': station_fingerprint(index.stations),
+                    'built_at': timezone.now().isoformat(),
+                }, meta_file)
+
+            self.stdout.write(self.style.SUCCESS(
+                f'Built {department} grid: {rows}x{cols} cells, {len(index.stations)} stations, '
+                f'{cells.nbytes / 1e6:.1f} MB'
+            ))
@@ -0,0 +1,97 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:26
+
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Region',
+            fields=[
+                ('region_id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('name', models.CharField(choices=[('central', 'Central Region'), ('north', 'Northern Region'), ('southern', 'Southern Region')], max_length=20, unique=True)),
+                ('display_name', models.CharField(max_length=100)),
+                ('description', models.TextField(blank=True)),
+                ('boundary_coordinates', models.JSONField(blank=True, help_text='GeoJSON polygon for region boundaries', null=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'regions',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Station',
+            fields=[
+                ('station_id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=100)),
+                ('code', models.CharField(help_text='Unique station code', max_length=15, unique=True)),
+                ('station_type', models.CharField(choices=[('headquarters', 'Headquarters'), ('substation', 'Substation'), ('outpost', 'Outpost'), ('mobile', 'Mobile Unit')], default='substation', max_length=20)),
+                ('department', models.CharField(choices=[('fire', 'Fire Department'), ('police', 'Police Department'), ('medical', 'Medical Department')], max_length=20)),
+                ('region', models.CharField(help_text='Region name', max_length=100)),
+                ('address', models.TextField()),
+                ('city', models.CharField(max_length=100)),
+                ('state', models.CharField(max_length=50)),
+                ('zip_code', models.CharField(max_length=10)),
+                ('latitude', models.DecimalField(blank=True, decimal_places=8, max_digits=10, null=True)),
+                ('longitude', models.DecimalField(blank=True, decimal_places=8, max_digits=11, null=True)),
+                ('manager_id', models.UUIDField(blank=True, help_text='ID of station manager', null=True)),
+                ('phone', models.CharField(blank=True, max_length=17, validators=[django.core.validators.RegexValidator(regex='^\\+?1?\\d{9,15}$')])),
+                ('description', models.TextField(blank=True)),
+                ('capacity', models.PositiveIntegerField(default=0, help_text='Maximum staff capacity')),
+                ('operating_hours', models.CharField(blank=True, help_text='e.g., 24/7, 8AM-6PM', max_length=100)),
+                ('is_active', models.BooleanField(default=True)),
+                ('established_date', models.DateField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('created_by_id', models.UUIDField(blank=True, help_text='ID of user who created this station', null=True)),
+            ],
+            options={
+                'db_table': 'geography_stations',
+                'ordering': ['region', 'department', 'name'],
+                'unique_together': {('name', 'department', 'region')},
+            },
+        ),
+        migrations.CreateModel(
+            name='District',
+            fields=[
+                ('district_id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=100)),
+                ('code', models.CharField(help_text='Unique district code', max_length=10, unique=True)),
+                ('department', models.CharField(max_length=20)),
+                ('address', models.TextField()),
+                ('city', models.CharField(max_length=100)),
+                ('state', models.CharField(max_length=50)),
+                ('zip_code', models.CharField(max_length=10)),
+                ('latitude', models.DecimalField(blank=True, decimal_places=8, max_digits=10, null=True)),
+                ('longitude', models.DecimalField(blank=True, decimal_places=8, max_digits=11, null=True)),
+                ('manager_id', models.UUIDField(blank=True, help_text='ID of district manager', null=True)),
+                ('phone', models.CharField(blank=True, max_length=17, validators=[django.core.validators.RegexValidator(regex='^\\+?1?\\d{9,15}$')])),
+                ('description', models.TextField(blank=True)),
+                ('coverage_area', models.TextField(blank=True, help_text='Description of coverage area')),
+                ('population_served', models.PositiveIntegerField(default=0)),
+                ('is_active', models.BooleanField(default=True)),
+                ('established_date', models.DateField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('created_by_id', models.UUIDField(blank=True, help_text='ID of user who created this district', null=True)),
+                ('region', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='districts', to='geography.region')),
+            ],
+            options={
+                'db_table': 'geography_districts',
+                'ordering': ['region__display_name', 'department', 'name'],
+                'unique_together': {('name', 'department', 'region')},
+            },
+        ),
+    ]
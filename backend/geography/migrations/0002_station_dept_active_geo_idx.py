@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geography', '0001_initial'),
+    ]
+
+    operations = [
+        # IF NOT EXISTS: databases whose station table was created by
+        # migrate --run-syncdb after the index was declared already have it
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(
+                    'CREATE INDEX IF NOT EXISTS station_dept_active_geo_idx '
+                    'ON geography_stations (department, is_active, latitude, longitude)',
+                    'DROP INDEX IF EXISTS station_dept_active_geo_idx',
+                ),
+            ],
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='station',
+                    index=models.Index(fields=['department', 'is_active', 'latitude', 'longitude'], name='station_dept_active_geo_idx'),
+                ),
+            ],
+        ),
+    ]
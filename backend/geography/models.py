@@ -125,6 +125,27 @@ class District(models.Model):
         return None
 
 
+class StationQuerySet(models.QuerySet):
+    def routable(self, department):
+        """Active stations of a department that have coordinates"""
+        return self.filter(
+            department=department,
+            is_active=True,
+            latitude__isnull=False,
+            longitude__isnull=False
+        )
+
+    def near(self, latitude, longitude, radius_km):
+        """Narrow to the lat/lng bounding box of a search radius (exact distance still needed)"""
+        from .distance import bounding_box
+
+        min_lat, max_lat, min_lng, max_lng = bounding_box(latitude, longitude, radius_km)
+        return self.filter(
+            latitude__range=(min_lat, max_lat),
+            longitude__range=(min_lng, max_lng)
+        )
+
+
 class Station(models.Model):
     """Model for emergency response stations"""
     STATION_TYPE_CHOICES = [
@@ -176,11 +197,17 @@ class Station(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     created_by_id = models.UUIDField(null=True, blank=True, help_text="ID of user who created this station")
+
+    objects = StationQuerySet.as_manager()
     
     class Meta:
         db_table = 'geography_stations'
         ordering = ['region', 'department', 'name']
         unique_together = ['name', 'department', 'region']
+        indexes = [
+            # Bounding-box prefilter for station routing queries
+            models.Index(fields=['department', 'is_active', 'latitude', 'longitude'], name='station_dept_active_geo_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} - {self.department} ({self.region})"
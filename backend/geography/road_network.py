@@ -0,0 +1,179 @@
+"""
+Offline road-network travel times.
+
+The road graph is a compact CSR adjacency saved as a NumPy .npz file
+(see the build_road_graph command):
+
+    node_coords  (n, 2) float64  latitude/longitude of each node, degrees
+    indptr       (n + 1,) int64  CSR row pointers
+    indices      (m,) int32      edge target nodes
+    weights      (m,) float32    edge travel time in seconds
+
+Per department, one multi-source Dijkstra rooted at every station gives each
+node its fastest station and ETA, so a lookup is a snap to the nearest node
+plus two array reads.
+"""
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+from sklearn.neighbors import BallTree
+
+from .distance import EARTH_RADIUS_KM
+from .models import Station
+
+logger = logging.getLogger(__name__)
+
+
+class RoadGraph:
+    """Directed road graph with travel-time edge weights"""
+
+    def __init__(self, node_coords: np.ndarray, indptr: np.ndarray, indices: np.ndarray, weights: np.ndarray):
+        self.node_coords = np.asarray(node_coords, dtype=np.float64).reshape(-1, 2)
+        node_count = len(self.node_coords)
+        self.matrix = csr_matrix((weights, indices, indptr), shape=(node_count, node_count))
+        self.tree = BallTree(np.radians(self.node_coords), metric='haversine')
+
+    @classmethod
+    def load(cls, path: str) -> 'RoadGraph':
+        with np.load(path) as data:
+            return cls(data['node_coords'], data['indptr'], data['indices'], data['weights'])
+
+    def __len__(self):
+        return len(self.node_coords)
+
+    def snap(self, points) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Nearest graph node for each (latitude, longitude) point.
+
+        Returns:
+            (node indices, snap distances in km)
+        """
+        distances, nodes = self.tree.query(np.radians(np.asarray(points, dtype=np.float64).reshape(-1, 2)), k=1)
+        return nodes[:, 0], distances[:, 0] * EARTH_RADIUS_KM
+
+
+class DepartmentTravelTimes:
+    """Fastest station and ETA in seconds for every node of the road graph"""
+
+    def __init__(self, graph: RoadGraph, department: str, stations: List[Station]):
+        self.graph = graph
+        self.department = department
+        self.built_at = time.monotonic()
+        self.stations = []
+        self.eta = None
+        self.source = None
+
+        if not stations:
+            return
+
+        nodes, snap_km = graph.snap([[float(station.latitude), float(station.longitude)] for station in stations])
+        reachable = snap_km <= settings.ROAD_GRAPH_MAX_SNAP_KM
+        self.stations = [station for station, keep in zip(stations, reachable) if keep]
+        station_nodes = nodes[reachable]
+        if not len(station_nodes):
+            return
+
+        # Station to incident: follow edges forward from every station at once
+        eta, _, sources = dijkstra(
+            graph.matrix, directed=True, indices=station_nodes, min_only=True, return_predecessors=True
+        )
+        self.eta = eta.astype(np.float32)
+        self.source = np.full(len(graph), -1, dtype=np.int32)
+        node_to_station = {int(node): position for position, node in enumerate(station_nodes)}
+        reached = sources >= 0
+        self.source[reached] = [node_to_station[int(node)] for node in sources[reached]]
+
+    def fastest(self, latitude: float, longitude: float) -> Optional[Tuple[Station, float]]:
+        """
+        Fastest station to a location over the road network.
+
+        Returns:
+            (station, eta_seconds), or None when the location is off the graph
+            or no station can reach it
+        """
+        if self.eta is None:
+            return None
+
+        nodes, snap_km = self.graph.snap([[latitude, longitude]])
+        node = int(nodes[0])
+        if snap_km[0] > settings.ROAD_GRAPH_MAX_SNAP_KM or self.source[node] < 0:
+            return None
+
+        # Last stretch from the road to the incident at off-road speed
+        off_road_seconds = snap_km[0] / settings.ROAD_GRAPH_OFF_ROAD_KMH * 3600
+        return self.stations[self.source[node]], float(self.eta[node] + off_road_seconds)
+
+
+class RoadNetwork:
+    """
+    Process-local road graph and per-department travel-time tables.
+
+    The graph is read once from ROAD_GRAPH_PATH; department tables are built
+    lazily and dropped with the spatial indexes whenever a station changes.
+    Everything is None when no graph file is configured, and callers fall
+    back to straight-line distance.
+    """
+
+    _graph: Optional[RoadGraph] = None
+    _graph_loaded = False
+    _tables: Dict[str, DepartmentTravelTimes] = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def graph(cls) -> Optional[RoadGraph]:
+        if not cls._graph_loaded:
+            with cls._lock:
+                if not cls._graph_loaded:
+                    cls._graph = cls._load_graph()
+                    cls._graph_loaded = True
+        return cls._graph
+
+    @classmethod
+    def _load_graph(cls) -> Optional[RoadGraph]:
+        path = settings.ROAD_GRAPH_PATH
+        if not path or not os.path.exists(path):
+            if path:
+                logger.warning(f"Road graph {path} not found, routing by straight-line distance")
+            return None
+
+        try:
+            graph = RoadGraph.load(path)
+        except Exception as e:
+            logger.error(f"Could not load road graph {path}: {e}")
+            return None
+        logger.info(f"Loaded road graph {path} with {len(graph)} nodes")
+        return graph
+
+    @classmethod
+    def for_department(cls, department: str) -> Optional[DepartmentTravelTimes]:
+        """Travel-time table of a department, or None without a road graph"""
+        graph = cls.graph()
+        if graph is None:
+            return None
+
+        table = cls._tables.get(department)
+        if table is not None and time.monotonic() - table.built_at < settings.STATION_INDEX_TTL:
+            return table
+
+        with cls._lock:
+            table = cls._tables.get(department)
+            if table is None or time.monotonic() - table.built_at >= settings.STATION_INDEX_TTL:
+                table = DepartmentTravelTimes(graph, department, list(Station.objects.routable(department)))
+                cls._tables[department] = table
+        return table
+
+    @classmethod
+    def invalidate(cls, department: Optional[str] = None):
+        """Drop the travel-time table of one department, or all of them"""
+        with cls._lock:
+            if department is None:
+                cls._tables.clear()
+            else:
+                cls._tables.pop(department, None)
@@ -0,0 +1,16 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Station
+from .road_network import RoadNetwork
+from .spatial_index import StationSpatialIndex
+from .station_grid import StationGridRegistry
+
+
+@receiver(post_save, sender=Station)
+@receiver(post_delete, sender=Station)
+def invalidate_station_index(sender, instance, **kwargs):
+    """Drop cached spatial indexes when a station changes"""
+    # A save may move a station between departments, so drop every index
+    StationSpatialIndex.invalidate()
+    RoadNetwork.invalidate()
+    StationGridRegistry.invalidate()
@@ -0,0 +1,156 @@
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+from sklearn.neighbors import BallTree
+
+from . import distance
+from .distance import EARTH_RADIUS_KM
+from .models import Station
+
+
+class DepartmentStationIndex:
+    """Ball tree (haversine metric) over the active stations of one department"""
+
+    def __init__(self, department: str, stations: List[Station]):
+        self.department = department
+        self.stations = list(stations)
+        self.built_at = time.monotonic()
+
+        # Coordinates kept as float64 degrees, the tree works in radians
+        self.coordinates = np.array(
+            [[float(station.latitude), float(station.longitude)] for station in self.stations],
+            dtype=np.float64
+        ).reshape(-1, 2)
+        self.tree = BallTree(np.radians(self.coordinates), metric='haversine') if self.stations else None
+
+    def __len__(self):
+        return len(self.stations)
+
+    def nearest(
+        self,
+        latitude: float,
+        longitude: float,
+        k: int = 1,
+        max_distance_km: Optional[float] = None
+    ) -> List[Tuple[Station, float]]:
+        """
+        Find the k nearest stations to the given coordinates.
+
+        Returns:
+            List of (station, distance_km) tuples sorted by distance
+        """
+        if self.tree is None:
+            return []
+
+        k = min(k, len(self.stations))
+        distances, indices = self.tree.query(np.radians([[latitude, longitude]]), k=k)
+
+        results = []
+        for station_distance, index in zip(distances[0] * EARTH_RADIUS_KM, indices[0]):
+            if max_distance_km is not None and station_distance > max_distance_km:
+                break
+            results.append((self.stations[index], float(station_distance)))
+        return results
+
+    def distances_from(self, latitude: float, longitude: float) -> np.ndarray:
+        """Distances in km from one point to every station, in index order"""
+        return distance.haversine_distances(latitude, longitude, self.coordinates)
+
+    def distance_matrix(self, points) -> np.ndarray:
+        """(n_points, n_stations) distance matrix in km, columns in index order"""
+        return distance.haversine_matrix(points, self.coordinates)
+
+    def nearest_many(
+        self,
+        points,
+        k: int = 1,
+        max_distance_km: Optional[float] = None
+    ) -> List[List[Tuple[Station, float]]]:
+        """
+        Find the k nearest stations for many points in one vectorized pass.
+
+        Returns:
+            One list of (station, distance_km) tuples per point, sorted by distance
+        """
+        points = distance.as_points(points)
+        if not self.stations:
+            return [[] for _ in range(len(points))]
+
+        matrix = self.distance_matrix(points)
+        nearest = distance.k_smallest_rows(matrix, k)
+
+        results = []
+        for row, indices in enumerate(nearest):
+            row_results = []
+            for index in indices:
+                station_distance = float(matrix[row, index])
+                if max_distance_km is not None and station_distance > max_distance_km:
+                    break
+                row_results.append((self.stations[index], station_distance))
+            results.append(row_results)
+        return results
+
+    def within_radius(self, latitude: float, longitude: float, radius_km: float) -> List[Tuple[Station, float]]:
+        """
+        Find all stations within radius_km of the given coordinates.
+
+        Returns:
+            List of (station, distance_km) tuples sorted by distance
+        """
+        if self.tree is None:
+            return []
+
+        indices, distances = self.tree.query_radius(
+            np.radians([[latitude, longitude]]),
+            r=radius_km / EARTH_RADIUS_KM,
+            return_distance=True,
+            sort_results=True
+        )
+        return [
+            (self.stations[index], float(station_distance))
+            for station_distance, index in zip(distances[0] * EARTH_RADIUS_KM, indices[0])
+        ]
+
+
+class StationSpatialIndex:
+    """
+    Process-local registry of per-department station indexes.
+
+    Indexes are built lazily from the database and dropped whenever a Station
+    is saved or deleted (see geography.signals). A TTL bounds staleness for
+    changes made by other processes.
+    """
+
+    _indexes: Dict[str, DepartmentStationIndex] = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def for_department(cls, department: str) -> DepartmentStationIndex:
+        """Get the index for a department, building it if missing or expired"""
+        index = cls._indexes.get(department)
+        if index is not None and time.monotonic() - index.built_at < settings.STATION_INDEX_TTL:
+            return index
+
+        with cls._lock:
+            index = cls._indexes.get(department)
+            if index is None or time.monotonic() - index.built_at >= settings.STATION_INDEX_TTL:
+                index = cls.build(department)
+                cls._indexes[department] = index
+        return index
+
+    @classmethod
+    def build(cls, department: str) -> DepartmentStationIndex:
+        """Build a fresh index from the active stations of a department"""
+        return DepartmentStationIndex(department, Station.objects.routable(department))
+
+    @classmethod
+    def invalidate(cls, department: Optional[str] = None):
+        """Drop the index of one department, or all indexes"""
+        with cls._lock:
+            if department is None:
+                cls._indexes.clear()
+            else:
+                cls._indexes.pop(department, None)
@@ -0,0 +1,161 @@
+"""
+Precomputed nearest-station rasters.
+
+build_station_grid writes, per department, a (rows, cols, 2) int16 array of
+the nearest and second-nearest station for the centre of every grid cell
+(<department>.npy), plus a JSON sidecar with the grid geometry and the
+station ids the array positions refer to (<department>.json).
+
+Workers memory-map the arrays, so a lookup is one array read and an exact
+Haversine check of the two candidate stations.
+"""
+import hashlib
+import json
+import logging
+import math
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+
+from . import distance
+from .models import Station
+from .spatial_index import DepartmentStationIndex, StationSpatialIndex
+
+logger = logging.getLogger(__name__)
+
+NO_STATION = -1
+
+
+def station_fingerprint(stations: List[Station]) -> str:
+    """Hash of station ids and positions, to spot grids built for another station set"""
+    source = ';'.join(
+        f'{station.station_id}:{float(station.latitude):.6f}:{float(station.longitude):.6f}'
+        for station in sorted(stations, key=lambda station: str(station.station_id))
+    )
+    return hashlib.sha1(source.encode()).hexdigest()
+
+
+def grid_paths(directory: str, department: str) -> Tuple[str, str]:
+    return os.path.join(directory, f'{department}.npy'), os.path.join(directory, f'{department}.json')
+
+
+class StationGrid:
+    """Memory-mapped nearest-station raster of one department"""
+
+    def __init__(self, cells: np.ndarray, meta: Dict, index: DepartmentStationIndex):
+        self.cells = cells
+        self.min_lat = meta['min_lat']
+        self.min_lng = meta['min_lng']
+        self.lat_step = meta['lat_step']
+        self.lng_step = meta['lng_step']
+        self.rows, self.cols = cells.shape[:2]
+        self.loaded_at = time.monotonic()
+
+        # Array positions refer to the station ids saved at build time
+        positions = {str(station.station_id): position for position, station in enumerate(index.stations)}
+        self.index = index
+        self.index_positions = np.array(
+            [positions.get(station_id, NO_STATION) for station_id in meta['station_ids']], dtype=np.int64
+        )
+
+    def candidates(self, latitude: float, longitude: float) -> Optional[np.ndarray]:
+        """Spatial index positions of the cell's two stations, or None outside the grid"""
+        # int() would truncate points just below or left of the grid into row/column 0
+        row_offset = (latitude - self.min_lat) / self.lat_step
+        col_offset = (longitude - self.min_lng) / self.lng_step
+        if not (0 <= row_offset <= self.rows and 0 <= col_offset <= self.cols):
+            return None
+
+        # A point on the far edge of the grid belongs to the last cell
+        row = min(math.floor(row_offset), self.rows - 1)
+        col = min(math.floor(col_offset), self.cols - 1)
+        cell = self.cells[row, col]
+        return self.index_positions[cell[cell != NO_STATION]]
+
+    def nearest(
+        self,
+        latitude: float,
+        longitude: float,
+        max_distance_km: Optional[float] = None
+    ) -> Optional[List[Tuple[Station, float]]]:
+        """
+        Nearest station from the raster, verified with exact distances.
+
+        Returns:
+            [(station, distance_km)], [] if it is out of range, or None when the
+            point is outside the grid and the caller should search normally
+        """
+        positions = self.candidates(latitude, longitude)
+        if positions is None:
+            return None
+        if not len(positions):
+            return []
+
+        distances = distance.haversine_distances(latitude, longitude, self.index.coordinates[positions])
+        best = int(np.argmin(distances))
+        station_distance = float(distances[best])
+        if max_distance_km is not None and station_distance > max_distance_km:
+            return []
+        return [(self.index.stations[positions[best]], station_distance)]
+
+
+class StationGridRegistry:
+    """
+    Process-local registry of memory-mapped station grids.
+
+    A grid is only used while it matches the department's current stations
+    (same fingerprint as the spatial index); otherwise lookups fall back to
+    the spatial index until the grid is rebuilt.
+    """
+
+    _grids: Dict[str, Optional[StationGrid]] = {}
+    _checked_at: Dict[str, float] = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def for_department(cls, department: str) -> Optional[StationGrid]:
+        checked_at = cls._checked_at.get(department)
+        if checked_at is not None and time.monotonic() - checked_at < settings.STATION_INDEX_TTL:
+            return cls._grids.get(department)
+
+        with cls._lock:
+            checked_at = cls._checked_at.get(department)
+            if checked_at is None or time.monotonic() - checked_at >= settings.STATION_INDEX_TTL:
+                cls._grids[department] = cls.load(department)
+                cls._checked_at[department] = time.monotonic()
+        return cls._grids.get(department)
+
+    @classmethod
+    def load(cls, department: str) -> Optional[StationGrid]:
+        directory = settings.STATION_GRID_DIR
+        if not directory:
+            return None
+
+        cells_path, meta_path = grid_paths(directory, department)
+        if not (os.path.exists(cells_path) and os.path.exists(meta_path)):
+            return None
+
+        try:
+            with open(meta_path) as meta_file:
+                meta = json.load(meta_file)
+            cells = np.load(cells_path, mmap_mode='r')
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not load station grid for {department}: {e}")
+            return None
+
+        index = StationSpatialIndex.for_department(department)
+        if meta.get('fingerprint') != station_fingerprint(index.stations):
+            logger.warning(f"Station grid for {department} is stale, run build_station_grid")
+            return None
+        return StationGrid(cells, meta, index)
+
+    @classmethod
+    def invalidate(cls):
+        """Re-check grids against the current stations on next use"""
+        with cls._lock:
+            cls._grids.clear()
+            cls._checked_at.clear()
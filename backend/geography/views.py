@@ -2,6 +2,7 @@ from rest_framework import status, generics, permissions
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from django.db.models import Sum
 from django.shortcuts import get_object_or_404
 from .models import Region, District, Station
 from .serializers import (
@@ -9,6 +10,23 @@ from .serializers import (
     StationSerializer, StationCreateSerializer, StationListSerializer
 )
 from accounts.models import User
+from utils.conditional import etag_matches, make_etag, not_modified, queryset_version, set_etag
+
+
+def active_alert_counts():
+    """Open alerts per department from the maintained counters, one small query"""
+    from alerts.models import AlertCounter
+    return tuple(
+        AlertCounter.objects.filter(status__in=['active', 'in_progress'])
+        .values_list('department')
+        .annotate(total=Sum('count'))
+        .order_by('department')
+    )
+
+
+def geography_versions(*querysets):
+    """Versions of the geography tables plus users (manager names and staff counts)"""
+    return tuple(queryset_version(queryset) for queryset in querysets) + (queryset_version(User.objects.all()),)
 
 
 class RegionListView(generics.ListAPIView):
@@ -17,6 +35,12 @@ class RegionListView(generics.ListAPIView):
     serializer_class = RegionSerializer
     permission_classes = [IsAuthenticated]
 
+    def list(self, request, *args, **kwargs):
+        etag = make_etag(request, *geography_versions(Region.objects.all(), District.objects.all()))
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        return set_etag(super().list(request, *args, **kwargs), etag)
+
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
@@ -24,6 +48,15 @@ def list_districts(request):
     """List districts - now accessible to all authenticated users"""
     user = request.user
 
+    # Districts carry station, staff and active alert counts, version all of them
+    etag = make_etag(
+        request,
+        *geography_versions(District.objects.all(), Region.objects.all(), Station.objects.all()),
+        active_alert_counts()
+    )
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
     # Allow all authenticated users to see districts
     # Prioritize user's own region/department but show all if needed
     if user.role == 'System Administrator':
@@ -45,7 +78,7 @@ def list_districts(request):
         districts = District.objects.filter(is_active=True)
 
     serializer = DistrictSerializer(districts, many=True)
-    return Response(serializer.data)
+    return set_etag(Response(serializer.data), etag)
 
 
 @api_view(['POST'])
@@ -91,6 +124,10 @@ def list_stations(request):
     user = request.user
     district_id = request.query_params.get('district_id')
     
+    etag = make_etag(request, *geography_versions(Station.objects.all()))
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
     # Allow all authenticated users to see stations
     stations = Station.objects.filter(is_active=True)
     if district_id:
@@ -108,7 +145,7 @@ def list_stations(request):
         pass
     
     serializer = StationListSerializer(stations, many=True)
-    return Response(serializer.data)
+    return set_etag(Response(serializer.data), etag)
 
 
 @api_view(['POST'])
@@ -0,0 +1,57 @@
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from rest_framework import status
+from rest_framework.response import Response
+
+
+def queryset_version(queryset, field='updated_at', count=True):
+    """
+    Cheap version of a set of rows: the newest timestamp, plus the row count.
+
+    The count catches deletions; leave it out for large tables whose
+    deletions are tracked some other way (e.g. alert tombstones).
+    """
+    aggregates = {'latest': Max(field)}
+    if count:
+        aggregates['count'] = Count('pk')
+    version = queryset.order_by().aggregate(**aggregates)
+    return tuple(str(version[key]) for key in sorted(version))
+
+
+def make_etag(request, *versions):
+    """
+    Strong ETag for a response built from the given versions.
+
+    The user and the full path (filters, cursor, page size) are part of the
+    tag, so every role scope and page gets its own.
+    """
+    user_id = getattr(request.user, 'pk', None)
+    source = repr((str(user_id), request.get_full_path(), versions))
+    return f'"{hashlib.sha1(source.encode()).hexdigest()}"'
+
+
+def etag_matches(request, etag):
+    """Whether If-None-Match lists this ETag (weak comparison, as RFC 9110 asks for If-None-Match)"""
+    header = request.META.get('HTTP_IF_NONE_MATCH')
+    if not header:
+        return False
+
+    tags = [tag.strip() for tag in header.split(',')]
+    if '*' in tags:
+        return True
+    return etag in [tag[2:] if tag.startswith('W/') else tag for tag in tags]
+
+
+def not_modified(etag):
+    """Empty 304 response for a matching ETag"""
+    return set_etag(Response(status=status.HTTP_304_NOT_MODIFIED), etag)
+
+
+def set_etag(response, etag):
+    """Attach the ETag and make clients revalidate instead of reusing blindly"""
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ['Authorization'])
+    return response
@@ -0,0 +1,67 @@
+import threading
+import time
+
+from django.conf import settings
+
+_MISSING = object()
+
+
+class LocalCache:
+    """
+    Process-local cache with a TTL for hot lookups that rarely change.
+
+    Entries expire after LOCAL_CACHE_TTL seconds so changes made by other
+    processes show up eventually; the owning app drops entries from model
+    signals for changes made in this process. Loaders returning None are not
+    cached, so new rows are found straight away.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, loader):
+        entry = self._entries.get(key, _MISSING)
+        if entry is not _MISSING and time.monotonic() < entry[1]:
+            return entry[0]
+
+        value = loader()
+        if value is not None:
+            with self._lock:
+                self._entries[key] = (value, time.monotonic() + settings.LOCAL_CACHE_TTL)
+        return value
+
+    def get_many(self, keys, loader):
+        """
+        Values for many keys; loader(missing_keys) returns {key: value} for the rest.
+
+        Returns:
+            {key: value} for every key found
+        """
+        now = time.monotonic()
+        found = {}
+        missing = []
+        for key in keys:
+            entry = self._entries.get(key, _MISSING)
+            if entry is not _MISSING and now < entry[1]:
+                found[key] = entry[0]
+            else:
+                missing.append(key)
+
+        if missing:
+            loaded = loader(missing)
+            expires = time.monotonic() + settings.LOCAL_CACHE_TTL
+            with self._lock:
+                for key, value in loaded.items():
+                    self._entries[key] = (value, expires)
+            found.update(loaded)
+        return found
+
+    def invalidate(self, key=_MISSING):
+        """Drop one entry, or all entries"""
+        with self._lock:
+            if key is _MISSING:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
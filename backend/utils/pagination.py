@@ -0,0 +1,163 @@
+import base64
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (seek) pagination over a unique ordering such as (-created_at, -id).
+
+    Pages are fetched with a WHERE on the last row's key instead of OFFSET,
+    and no COUNT(*) is issued, so the cost of a page does not grow with how
+    far back a client scrolls. Cursors are opaque and stay stable when new
+    rows are inserted at the head of the list.
+
+    Views set `keyset_ordering` to the ordering fields; the last field must
+    be unique (usually the primary key) and all fields share one direction.
+
+    A view whose scope is an OR across columns can also set `keyset_branches`
+    to one queryset per side of the OR. Each branch is then cut to the page
+    on its own index and the page is read from the union of the cut
+    branches, so no branch is read past page_size + 1 rows. The queryset
+    itself must still apply the whole scope: databases that cannot limit
+    the parts of a UNION (SQLite) page through it directly.
+    """
+    ordering = ('-created_at', '-id')
+    page_size = 20
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.ordering = tuple(getattr(view, 'keyset_ordering', self.ordering))
+        self.page_size = self.get_page_size(request)
+
+        cursor = self.decode_cursor(request)
+        reverse = False
+        keyset_filter = Q()
+        if cursor is not None:
+            values, reverse = cursor
+            keyset_filter = self.build_keyset_filter(values, reverse)
+
+        order_by = [self._flip(field) for field in self.ordering] if reverse else list(self.ordering)
+        branches = getattr(view, 'keyset_branches', None)
+        if branches and connections[queryset.db].features.supports_slicing_ordering_in_compound:
+            queryset = queryset.filter(pk__in=self.union_page_keys(branches, keyset_filter, order_by, self.page_size + 1))
+        else:
+            queryset = queryset.filter(keyset_filter)
+        try:
+            results = list(queryset.order_by(*order_by)[:self.page_size + 1])
+        except (DjangoValidationError, ValueError):
+            # Cursor values that do not fit the ordering fields
+            raise NotFound(self.invalid_cursor_message)
+
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+
+        self.has_next = has_more if not reverse else True
+        self.has_previous = cursor is not None if not reverse else has_more
+        self.first_key = self.get_key(results[0]) if results else None
+        self.last_key = self.get_key(results[-1]) if results else None
+        return results
+
+    @staticmethod
+    def union_page_keys(branches, keyset_filter, order_by, limit):
+        """Primary keys of the first `limit` rows of each branch after the keyset, as one UNION subquery"""
+        pages = [branch.filter(keyset_filter).order_by(*order_by).values('pk')[:limit] for branch in branches]
+        return pages[0].union(*pages[1:]) if len(pages) > 1 else pages[0]
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data)
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'previous': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def get_next_link(self):
+        if not self.has_next or self.last_key is None:
+            return None
+        return self.encode_cursor(self.last_key, reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or self.first_key is None:
+            return None
+        return self.encode_cursor(self.first_key, reverse=True)
+
+    def build_keyset_filter(self, values, reverse):
+        """Rows strictly after the key in page direction: (a < x) OR (a = x AND b < y) ..."""
+        keyset_filter = Q()
+        equal_prefix = Q()
+        for field, value in zip(self.ordering, values):
+            name = field.lstrip('-')
+            descending = field.startswith('-') != reverse
+            lookup = 'lt' if descending else 'gt'
+            keyset_filter |= equal_prefix & Q(**{f'{name}__{lookup}': value})
+            equal_prefix &= Q(**{name: value})
+        return keyset_filter
+
+    def get_key(self, instance):
+        key = []
+        for field in self.ordering:
+            value = getattr(instance, field.lstrip('-'))
+            if hasattr(value, 'isoformat'):
+                value = value.isoformat()
+            elif not isinstance(value, (int, float)):
+                value = str(value)
+            key.append(value)
+        return key
+
+    def encode_cursor(self, key, reverse):
+        payload = json.dumps({'k': key, 'r': int(reverse)}, separators=(',', ':'))
+        encoded = base64.urlsafe_b64encode(payload.encode()).decode()
+        url = remove_query_param(self.base_url, 'page')
+        return replace_query_param(url, self.cursor_query_param, encoded)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+            key = payload['k']
+            reverse = bool(payload.get('r'))
+        except (TypeError, ValueError, KeyError, AttributeError):
+            raise NotFound(self.invalid_cursor_message)
+
+        if not isinstance(key, list) or len(key) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return key, reverse
+
+    @staticmethod
+    def _flip(field):
+        return field[1:] if field.startswith('-') else f'-{field}'